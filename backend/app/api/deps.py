@@ -1,25 +1,33 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core import auth_cache
 from ..core.security import decode_token
-from ..db import get_db
+from ..db import get_async_db
 from ..repos import users as users_repo
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
+    # Validated tokens and their users are cached for AUTH_CACHE_TTL_SECONDS, so repeat requests skip the
+    # signature check and the users query; the returned User is detached and must not be mutated in place.
     try:
-        payload = decode_token(token)
-        username: str = payload.get("sub")  # subject is username
+        username = auth_cache.get_token(token)
         if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-        user = users_repo.get_by_username(db, username)
+            payload = decode_token(token)
+            username = payload.get("sub")  # subject is username
+            if username is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+            auth_cache.put_token(token, username, payload.get("exp"))
+        user = auth_cache.get_user(username)
         if user is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+            user = await users_repo.get_by_username_async(db, username)
+            if user is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+            auth_cache.put_user(user)
         return user
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-
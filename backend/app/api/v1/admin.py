@@ -1,17 +1,32 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 
+from ...core import auth_cache
+from ...core.config import settings
 from ...db import get_db
 from ...models.user import User
 from ...models.session import Session as SessionModel
 from ...models.dataset import Dataset
 from ...models.analysis_job import AnalysisJob
+from ...repos import jobs as jobs_repo
+from ...services.frame_cache import frame_cache
+from ...services.executor import compute_executor
+from ...services.tasks import task_runner
+from ...services import profiler
+from ...services.timing import metrics
 
 
 router = APIRouter()
 
+metrics.register("frame_cache", frame_cache.stats)
+metrics.register("tasks", task_runner.stats)
+metrics.register("compute", compute_executor.stats)
+metrics.register("auth_cache", auth_cache.stats)
+metrics.register("job_writes", lambda: {k: v for k, v in jobs_repo.write_behind.stats().items() if k != "mode"})
+
 
 @router.get("/debug/overview")
 def overview(db: Session = Depends(get_db)):
@@ -24,5 +39,37 @@ def overview(db: Session = Depends(get_db)):
             {"id": j.id, "type": j.type, "created_at": j.created_at.isoformat()}
             for j in db.query(AnalysisJob).order_by(AnalysisJob.created_at.desc()).limit(10)
         ],
+        "frame_cache": frame_cache.stats(),
+        "tasks": task_runner.stats(),
+        "compute": compute_executor.stats(),
+        "auth_cache": auth_cache.stats(),
+        "job_writes": jobs_repo.write_behind.stats(),
+        "db_pool": db.get_bind().pool.status(),
     }
 
+
+@router.get("/debug/memory")
+def memory_footprint(db: Session = Depends(get_db)):
+    footprint = frame_cache.footprint()
+    names = dict(db.query(Dataset.id, Dataset.name).filter(Dataset.id.in_(list(footprint))).all()) if footprint else {}
+    datasets = [{"dataset_id": k, "name": names.get(k), **v} for k, v in sorted(footprint.items(), key=lambda kv: -kv[1]["bytes"])]
+    return {"frame_cache": frame_cache.stats(), "datasets": datasets}
+
+
+@router.get("/debug/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/debug/profiles")
+def list_profiles():
+    return {"enabled": settings.profiling_enabled, "profiles": profiler.sampler.list()}
+
+
+@router.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    # Collapsed stacks ("frame;frame;frame count"), e.g. for flamegraph.pl or speedscope
+    profile = profiler.sampler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
@@ -1,155 +1,176 @@
 from __future__ import annotations
 
-import json
-from fastapi import APIRouter, HTTPException, Depends
-import pandas as pd
-import numpy as np
-from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...schemas.analysis import (
     TimeSeriesRequest,
     TimeSeriesResponse,
-    TimeSeriesSeries,
-    TimeSeriesStatistics,
     ParetoRequest,
     ParetoResponse,
-    ParetoItem,
-    ParetoItemMetadata,
     HistogramRequest,
     HistogramResponse,
-    HistogramFit,
+    SummaryRequest,
+    SummaryResponse,
+    BatchRequest,
+    BatchResponse,
+    BatchResult,
 )
-from ...db import get_db
+from ...db import get_async_db
+from ...models.analysis_job import AnalysisJob
+from ...models.dataset import Dataset
 from ...repos import datasets as datasets_repo
 from ...repos import jobs as jobs_repo
-from ...utils.dataframe import detect_date_and_store, display_name_for
+from ...services import analytics
+from ...services import encoding
+from ...services import timing
+from ...services.executor import compute_executor
+from ...services.tasks import task_runner
 
 
 router = APIRouter()
 
+Mode = Literal["sync", "async"]
 
-def _load_df(path: str) -> pd.DataFrame:
-    return pd.read_csv(path) if path.lower().endswith(".csv") else pd.read_excel(path)
+RESPONSES = {"timeseries": TimeSeriesResponse, "pareto": ParetoResponse, "histogram": HistogramResponse}
 
 
-@router.post("/timeseries", response_model=TimeSeriesResponse)
-def get_timeseries_data(payload: TimeSeriesRequest, db: Session = Depends(get_db)) -> TimeSeriesResponse:
-    ds = datasets_repo.get(db, payload.dataset_id) if payload.dataset_id else datasets_repo.latest_for_session(db, payload.session_id)
+async def _resolve_dataset(db: AsyncSession, session_id: int, dataset_id: Optional[int]) -> Dataset:
+    with timing.span("resolve"):
+        if dataset_id:
+            ds = await datasets_repo.get_async(db, dataset_id)
+        else:
+            ds = await datasets_repo.latest_for_session_async(db, session_id)
     if not ds:
         raise HTTPException(status_code=404, detail="Dataset not found for session")
+    return ds
 
-    params = {"store": payload.store, "target_column": payload.target_column, "aggregation": payload.aggregation, "date_range": payload.date_range}
-    params_json = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
-    cached = jobs_repo.find_cached(db, payload.session_id, ds.id, "timeseries", params_json)
+
+def _enqueue(type_: str, ds: Dataset, payload, params_json: str, cached: Optional[AnalysisJob]) -> JSONResponse:
     if cached:
-        return TimeSeriesResponse(**json.loads(cached.result_json))
-
-    df = _load_df(ds.path)
-    date_col, store_col = detect_date_and_store(df)
-    if date_col is None:
-        raise HTTPException(status_code=400, detail="Date column not found")
-    if payload.target_column not in df.columns:
-        raise HTTPException(status_code=400, detail=f"Target column not found: {payload.target_column}")
-
-    if payload.store and store_col and store_col in df.columns:
-        df = df[df[store_col] == payload.store]
-
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col]).sort_values(date_col)
-    if payload.date_range and len(payload.date_range) == 2:
-        start, end = payload.date_range
-        if start:
-            df = df[df[date_col] >= pd.to_datetime(start)]
-        if end:
-            df = df[df[date_col] <= pd.to_datetime(end)]
-
-    freq = {"daily": "D", "weekly": "W", "monthly": "M"}[payload.aggregation]
-    grouped = df.set_index(date_col)[payload.target_column].groupby(pd.Grouper(freq=freq)).sum().dropna()
-    values = grouped.values.astype(float)
-    timestamps = grouped.index.strftime("%Y-%m-%d").tolist()
-
-    if len(values) > 1:
-        mean = float(values.mean()); std = float(values.std(ddof=0)); min_v = float(values.min()); max_v = float(values.max())
-        w = min(3, len(values)); start_avg = float(values[:w].mean()); end_avg = float(values[-w:].mean())
-        trend = "increasing" if end_avg > start_avg * 1.05 else ("decreasing" if end_avg < start_avg * 0.95 else "flat")
+        task = task_runner.completed(type_, ds.id, payload.session_id, params_json, cached.id, cached.result_json)
     else:
-        mean = std = min_v = max_v = None; trend = "flat"
+        task = task_runner.submit(type_, ds, payload.session_id, params_json, payload.model_dump())
+    return JSONResponse(status_code=202, content=task.to_dict())
 
-    stats = TimeSeriesStatistics(mean=mean, std=std, min=min_v, max=max_v, trend=trend)
-    resp = TimeSeriesResponse(timestamp=timestamps, series=[TimeSeriesSeries(name=payload.target_column, values=values.tolist(), statistics=stats)], events=[])
-    jobs_repo.create(db, payload.session_id, ds.id, "timeseries", params_json, resp.model_dump_json())
-    return resp
 
+async def _find_cached(db: AsyncSession, ds: Dataset, type_: str, params_json: str) -> Optional[AnalysisJob]:
+    with timing.span("cache"):
+        return await jobs_repo.find_cached_async(db, ds.id, type_, params_json)
 
-@router.post("/pareto", response_model=ParetoResponse)
-def get_pareto_data(payload: ParetoRequest, db: Session = Depends(get_db)) -> ParetoResponse:
-    ds = datasets_repo.get(db, payload.dataset_id) if payload.dataset_id else datasets_repo.latest_for_session(db, payload.session_id)
-    if not ds:
-        raise HTTPException(status_code=404, detail="Dataset not found for session")
 
-    params = {"store": payload.store, "analysis_type": payload.analysis_type, "period": payload.period}
-    params_json = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
-    cached = jobs_repo.find_cached(db, payload.session_id, ds.id, "pareto", params_json)
+async def _save(db: AsyncSession, payload, ds: Dataset, type_: str, params_json: str, result_json: str) -> None:
+    with timing.span("cache_write"):
+        await jobs_repo.save_async(db, payload.session_id, ds.id, type_, params_json, result_json)
+
+
+def _serialize(resp: BaseModel) -> str:
+    with timing.span("serialize"):
+        return resp.model_dump_json()
+
+
+async def _timeseries_response(result_json: str, media_type: str):
+    # JSON is sent as stored; Arrow/typed encodings are built off the event loop
+    if media_type == encoding.JSON_MEDIA_TYPE:
+        return encoding.timeseries_response(result_json, media_type)
+    return await compute_executor.run(encoding.timeseries_response, result_json, media_type, stage="serialize")
+
+
+# Handlers are async: dataset lookup and cache hits are served on the event loop, and only the pandas
+# computation of a cache miss is dispatched to the compute executor.
+@router.post(
+    "/timeseries",
+    response_model=TimeSeriesResponse,
+    responses={200: {"content": {encoding.ARROW_MEDIA_TYPE: {}, encoding.TYPED_MEDIA_TYPE: {}}}},
+)
+async def get_timeseries_data(
+    payload: TimeSeriesRequest,
+    mode: Mode = "sync",
+    accept: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+) -> TimeSeriesResponse:
+    ds = await _resolve_dataset(db, payload.session_id, payload.dataset_id)
+    params_json = analytics.params_json(analytics.timeseries_params(payload))
+    cached = await _find_cached(db, ds, "timeseries", params_json)
+    if mode == "async":
+        return _enqueue("timeseries", ds, payload, params_json, cached)
     if cached:
-        return ParetoResponse(**json.loads(cached.result_json))
-
-    df = _load_df(ds.path)
-    date_col, store_col = detect_date_and_store(df)
-    if payload.period and date_col and date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-        df = df.dropna(subset=[date_col])
-        try:
-            period = pd.Period(payload.period)
-            df = df[df[date_col].dt.to_period("M") == period]
-        except Exception:
-            pass
-    if payload.store and store_col and store_col in df.columns:
-        df = df[df[store_col] == payload.store]
-
-    product_columns = [
-        "Mens_JACKETS&OUTER2","Mens_KNIT","Mens_PANTS","WOMEN'S_JACKETS2","WOMEN'S_TOPS","WOMEN'S_ONEPIECE","WOMEN'S_bottoms","WOMEN'S_SCARF & STOLES"
-    ]
-    present_cols = [c for c in product_columns if c in df.columns]
-    if not present_cols:
-        raise HTTPException(status_code=400, detail="No product category columns found in data")
-
-    totals = df[present_cols].sum(numeric_only=True)
-    pairs = [(col, float(totals[col])) for col in present_cols]
-    pairs.sort(key=lambda x: x[1], reverse=True)
-    total_sum = sum(v for _, v in pairs) or 0.0
-
-    items: list[ParetoItem] = []
-    cumulative = 0.0
-    vital_index = (len(pairs) - 1) if pairs else 0
-    for i, (cat, val) in enumerate(pairs):
-        pct = (val / total_sum * 100.0) if total_sum else 0.0
-        cumulative += pct
-        if cumulative >= 80.0 and vital_index == (len(pairs) - 1):
-            vital_index = i
-        items.append(ParetoItem(category=cat, value=val, metadata=ParetoItemMetadata(display_name=display_name_for(cat), percentage=pct, cumulative=cumulative)))
-    resp = ParetoResponse(data=items, total=total_sum, vital_few_threshold=vital_index + 1)
-    jobs_repo.create(db, payload.session_id, ds.id, "pareto", params_json, resp.model_dump_json())
-    return resp
+        return await _timeseries_response(cached.result_json, encoding.negotiate(accept))
 
+    resp = await compute_executor.run(analytics.compute_timeseries, ds, payload)
+    result_json = _serialize(resp)
+    await _save(db, payload, ds, "timeseries", params_json, result_json)
+    return await _timeseries_response(result_json, encoding.negotiate(accept))
 
-@router.post("/histogram", response_model=HistogramResponse)
-def get_histogram_data(payload: HistogramRequest, db: Session = Depends(get_db)) -> HistogramResponse:
-    ds = datasets_repo.get(db, payload.dataset_id) if payload.dataset_id else datasets_repo.latest_for_session(db, payload.session_id)
-    if not ds:
-        raise HTTPException(status_code=404, detail="Dataset not found for session")
 
-    params = {"column": payload.column, "bins": payload.bins}
-    params_json = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
-    cached = jobs_repo.find_cached(db, payload.session_id, ds.id, "histogram", params_json)
+@router.post("/pareto", response_model=ParetoResponse)
+async def get_pareto_data(payload: ParetoRequest, mode: Mode = "sync", db: AsyncSession = Depends(get_async_db)) -> ParetoResponse:
+    ds = await _resolve_dataset(db, payload.session_id, payload.dataset_id)
+    params_json = analytics.params_json(analytics.pareto_params(payload))
+    cached = await _find_cached(db, ds, "pareto", params_json)
+    if mode == "async":
+        return _enqueue("pareto", ds, payload, params_json, cached)
     if cached:
-        return HistogramResponse(**json.loads(cached.result_json))
+        return encoding.json_response(cached.result_json)
+
+    resp = await compute_executor.run(analytics.compute_pareto, ds, payload)
+    result_json = _serialize(resp)
+    await _save(db, payload, ds, "pareto", params_json, result_json)
+    return encoding.json_response(result_json)
 
-    df = _load_df(ds.path)
-    if payload.column not in df.columns:
-        raise HTTPException(status_code=400, detail=f"Column not found: {payload.column}")
-    series = pd.to_numeric(df[payload.column], errors="coerce").dropna()
-    counts, edges = np.histogram(series.values, bins=payload.bins or 20)
-    resp = HistogramResponse(bins=edges.astype(float).tolist(), counts=counts.astype(int).tolist(), fit=HistogramFit(), summary={"count": int(series.shape[0])})
-    jobs_repo.create(db, payload.session_id, ds.id, "histogram", params_json, resp.model_dump_json())
-    return resp
 
+@router.post("/histogram", response_model=HistogramResponse)
+async def get_histogram_data(payload: HistogramRequest, mode: Mode = "sync", db: AsyncSession = Depends(get_async_db)) -> HistogramResponse:
+    ds = await _resolve_dataset(db, payload.session_id, payload.dataset_id)
+    params_json = analytics.params_json(analytics.histogram_params(payload))
+    cached = await _find_cached(db, ds, "histogram", params_json)
+    if mode == "async":
+        return _enqueue("histogram", ds, payload, params_json, cached)
+    if cached:
+        return encoding.json_response(cached.result_json)
+
+    resp = await compute_executor.run(analytics.compute_histogram, ds, payload)
+    result_json = _serialize(resp)
+    await _save(db, payload, ds, "histogram", params_json, result_json)
+    return encoding.json_response(result_json)
+
+
+@router.post("/summary", response_model=SummaryResponse)
+async def get_summary(payload: SummaryRequest, db: AsyncSession = Depends(get_async_db)) -> SummaryResponse:
+    # Answered by merging the per-(store, day) column sketches; cheap enough that it is not cached as a job
+    ds = await _resolve_dataset(db, payload.session_id, payload.dataset_id)
+    return await compute_executor.run(analytics.compute_summary, ds, payload)
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(payload: BatchRequest, db: AsyncSession = Depends(get_async_db)) -> BatchResponse:
+    ds = await _resolve_dataset(db, payload.session_id, payload.dataset_id)
+    results: list[Optional[BatchResult]] = [None] * len(payload.specs)
+    misses: dict[tuple[str, str], list[int]] = {}
+    for i, spec in enumerate(payload.specs):
+        params_json = analytics.params_json(analytics.PARAMS[spec.type](spec))
+        cached = await _find_cached(db, ds, spec.type, params_json)
+        if cached:
+            results[i] = BatchResult(type=spec.type, cached=True, job_id=cached.id, result=RESPONSES[spec.type].model_validate_json(cached.result_json))
+        else:
+            misses.setdefault((spec.type, params_json), []).append(i)
+
+    keys = list(misses)
+    computed = await compute_executor.run(analytics.compute_batch, ds, [payload.specs[misses[k][0]] for k in keys]) if keys else []
+    ok = [(k, out) for k, out in zip(keys, computed) if not isinstance(out, HTTPException)]
+    # All computed results are stored in one transaction
+    rows = [jobs_repo.row(payload.session_id, ds.id, t, p, _serialize(out)) for (t, p), out in ok]
+    with timing.span("cache_write"):
+        jobs = await jobs_repo.create_many_async(db, rows) if rows else []
+    job_ids = {k: job.id for (k, _), job in zip(ok, jobs)}
+    for (type_, params_json), out in zip(keys, computed):
+        if isinstance(out, HTTPException):
+            item = BatchResult(type=type_, status_code=out.status_code, error=str(out.detail))
+        else:
+            item = BatchResult(type=type_, job_id=job_ids[(type_, params_json)], result=out)
+        for i in misses[(type_, params_json)]:
+            results[i] = item
+    return BatchResponse(dataset_id=ds.id, results=results)
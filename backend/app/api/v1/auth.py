@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, status
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...schemas.user import Token
-from ...core.security import verify_password, create_access_token
-from ...db import get_db
+from ...core.config import settings
+from ...core.security import verify_and_update, create_access_token
+from ...db import get_async_db
 from ...repos import users as users_repo
 from ...repos import sessions as sessions_repo
 
@@ -14,13 +16,15 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=Token, summary="Obtain access token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = users_repo.get_by_username(db, form_data.username)
-    if user is None or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await users_repo.get_by_username_async(db, form_data.username)
+    # bcrypt is deliberately slow; run it in the threadpool so other requests keep flowing on the event loop
+    valid, new_hash = await run_in_threadpool(verify_and_update, form_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect username or password")
+    if new_hash:
+        await users_repo.update_password_hash_async(db, user, new_hash)
     token = create_access_token(subject=user.username)
     # Create a server-side session row
-    from ...core.config import settings
-    sess = sessions_repo.create_for_user(db, user_id=user.id, minutes=settings.access_token_expire_minutes)
+    sess = await sessions_repo.create_for_user_async(db, user_id=user.id, minutes=settings.access_token_expire_minutes)
     return Token(access_token=token, session_id=str(sess.id))
-
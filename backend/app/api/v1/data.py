@@ -1,39 +1,92 @@
 from __future__ import annotations
 
 from typing import Optional
-import io
 import json
 import os
 from datetime import datetime
 
-import pandas as pd
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
+from ...core.config import settings
 from ...db import get_db
+from ...models.dataset import Dataset
 from ...repos import sessions as sessions_repo
 from ...repos import datasets as datasets_repo
+from ...repos import jobs as jobs_repo
+from ...schemas.analysis import TimeSeriesParams, TimeSeriesResponse
+from ...services import analytics
+from ...services import ingest
+from ...services.frame_cache import frame_cache
 
 
 router = APIRouter()
 
 
+def _commit_append(db: Session, target: Dataset, meta: dict, profile: dict) -> tuple[Dataset, list]:
+    """Save the appended dataset's meta and delete the cached jobs the new partition can change."""
+    ds = datasets_repo.update_meta(db, target, json.dumps(meta, ensure_ascii=False))
+    # Frames cached under the old file signature can no longer be hit; free them now rather than by LRU
+    frame_cache.invalidate(ds.id)
+    return ds, jobs_repo.invalidate(db, ds.id, lambda type_, params: analytics.affected_by(type_, params, profile))
+
+
+def _refresh_timeseries(db: Session, ds: Dataset, stale: list) -> int:
+    """Recompute the newest ``APPEND_REFRESH_MAX_JOBS`` invalidated timeseries results from the appended data.
+
+    Their events are updated incrementally: only periods whose windows reach the first changed period are re-detected.
+    """
+    rows = []
+    for job in [j for j in stale if j.type == "timeseries"][:settings.append_refresh_max_jobs]:
+        try:
+            previous = TimeSeriesResponse.model_validate_json(job.result_json)
+            resp = analytics.compute_timeseries(ds, TimeSeriesParams(**json.loads(job.params_json)), previous=previous)
+        except Exception:
+            continue  # stays invalidated; the next request computes it from scratch
+        rows.append(jobs_repo.row(job.session_id, ds.id, "timeseries", job.params_json, resp.model_dump_json()))
+    if not rows:
+        return 0
+    try:
+        jobs_repo.create_many(db, rows)
+    except Exception:
+        db.rollback()  # the append is already committed; a lost refresh only costs a recomputation
+        return 0
+    return len(rows)
+
+
+def _append(db: Session, target: Dataset, path: str, sheet_name: Optional[str]) -> tuple[dict, dict, Dataset, int, int]:
+    with ingest.append_lock(target.id):
+        # Another append to the dataset may have committed while this upload was spooling
+        db.refresh(target)
+        meta, summary, (ds, stale) = ingest.append_partition(target, path, lambda meta, profile: _commit_append(db, target, meta, profile), sheet_name)
+        # The derived files are published once append_partition returns, so the refresh reads the new partition
+        return meta, summary, ds, len(stale), _refresh_timeseries(db, ds, stale)
+
+
 @router.post("/upload", summary="Upload a CSV/XLSX file and create/update session")
 async def upload_data(
     file: UploadFile = File(...),
     session_id: Optional[int] = Form(default=None),
     sheet_name: Optional[str] = Form(default=None),
+    sheets: Optional[str] = Form(default=None, description="'*' for every sheet or a comma-separated list of sheet names (Excel only)"),
+    append_to: Optional[int] = Form(default=None),
     db: Session = Depends(get_db),
 ):
+    abs_path = None
     try:
         filename = file.filename or "uploaded"
-        content = await file.read()
-        if filename.lower().endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(content))
-        elif filename.lower().endswith((".xlsx", ".xls")):
-            df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_name or 0)
-        else:
+        if not filename.lower().endswith((".csv", ".xlsx", ".xls")):
             raise HTTPException(status_code=400, detail="Unsupported file type. Use CSV or Excel.")
+        if sheets and (append_to or filename.lower().endswith(".csv")):
+            raise HTTPException(status_code=400, detail="sheets applies to new Excel uploads only")
+
+        target = None
+        if append_to:
+            target = datasets_repo.get(db, append_to)
+            if not target:
+                raise HTTPException(status_code=404, detail="Dataset not found")
+            session_id = target.session_id
 
         # Ensure session record exists; if not provided, create anonymous session (user_id=0)
         if session_id:
@@ -44,7 +97,7 @@ async def upload_data(
             from ...core.config import settings  # to get expiry minutes
             sess = sessions_repo.create_for_user(db, user_id=0, minutes=settings.access_token_expire_minutes)
 
-        # Save file to storage path
+        # Spool the upload to storage in fixed-size chunks, then parse it off the event loop
         base_dir = os.path.join("backend", "storage", datetime.now().strftime("%Y%m%d"))
         os.makedirs(base_dir, exist_ok=True)
         ext = ".csv" if filename.lower().endswith(".csv") else ".xlsx"
@@ -52,25 +105,53 @@ async def upload_data(
         unique = datetime.now().strftime("%H%M%S%f")
         stored_name = f"{safe_name}_{unique}{ext}"
         abs_path = os.path.join(base_dir, stored_name)
-        with open(abs_path, "wb") as f:
-            f.write(content)
+        await run_in_threadpool(ingest.spool, file.file, abs_path)
+        if target:
+            meta, summary, ds, invalidated, refreshed = await run_in_threadpool(_append, db, target, abs_path, sheet_name)
+            return {
+                "session_id": str(sess.id),
+                "dataset_id": str(ds.id),
+                "rows": summary["rows"],
+                "columns": summary["columns"],
+                "preview": summary["preview"],
+                "partition": len(meta["partitions"]),
+                "invalidated_jobs": invalidated,
+                "refreshed_jobs": refreshed,
+            }
+        if sheets:
+            selected = None if sheets.strip() == "*" else [s.strip() for s in sheets.split(",") if s.strip()]
+            summary = await run_in_threadpool(ingest.ingest_workbook, abs_path, selected)
+            sheet_name = summary["sheets"][0]["name"]
+        else:
+            summary = await run_in_threadpool(ingest.ingest_file, abs_path, sheet_name)
 
         meta = {
             "original_name": filename,
             "sheet_name": sheet_name,
-            "columns": list(map(str, df.columns.tolist())),
+            "columns": summary["columns"],
+            "columnar": summary["columnar"],
+            "sketches": summary["sketches"],
+            "layout": summary["layout"],
+            "profile": summary["profile"],
         }
+        if sheets:
+            meta["sheets"] = [s["name"] for s in summary["sheets"]]
+            meta["partitions"] = summary["partitions"]
         ds = datasets_repo.create(db, session_id=sess.id, name=filename, path=abs_path, meta_json=json.dumps(meta, ensure_ascii=False))
 
         return {
             "session_id": str(sess.id),
             "dataset_id": str(ds.id),
-            "rows": int(len(df)),
+            "rows": summary["rows"],
             "columns": meta["columns"],
-            "preview": df.head(5).to_dict(orient="records"),
+            "preview": summary["preview"],
+            **({"sheets": summary["sheets"]} if sheets else {}),
         }
     except HTTPException:
+        if abs_path:
+            ingest.discard(abs_path)
         raise
     except Exception as e:
+        if abs_path:
+            ingest.discard(abs_path)
         raise HTTPException(status_code=500, detail=str(e))
-
@@ -1,63 +1,166 @@
 from __future__ import annotations
 
+import csv
 import io
 import json
+import tempfile
+from typing import Iterable, Iterator, Optional
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
 import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ...db import get_db
+from ...core.config import settings
+from ...db import get_async_db, get_db
+from ...repos import datasets as datasets_repo
 from ...repos import jobs as jobs_repo
+from ...services import partitioned
+from ...services import storage
+from ...services import timing
 
 
 router = APIRouter()
 
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_FLUSH_ROWS = 1000
+FILE_CHUNK_BYTES = 1024 * 1024
 
-@router.get("/{job_id}")
-def export_job(job_id: int, format: str = "csv", db: Session = Depends(get_db)):
-    job = jobs_repo.get(db, job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    payload = json.loads(job.result_json)
 
-    if job.type == "timeseries":
+def _job_table(job_type: str, payload: dict) -> tuple[list[str], Iterator[tuple]]:
+    if job_type == "timeseries":
         timestamps = payload.get("timestamp", [])
         series = payload.get("series", [])
-        name = series[0].get("name", "value") if series else "value"
-        values = series[0].get("values", []) if series else []
-        df = pd.DataFrame({"timestamp": timestamps, name: values})
-    elif job.type == "pareto":
-        rows = []
-        for item in payload.get("data", []):
-            meta = item.get("metadata", {})
-            rows.append({
-                "category": item.get("category"),
-                "value": item.get("value"),
-                "percentage": meta.get("percentage"),
-                "cumulative": meta.get("cumulative"),
-                "display_name": meta.get("display_name"),
-            })
-        df = pd.DataFrame(rows)
-    elif job.type == "histogram":
+        if not series:
+            return ["timestamp", "value"], ((t, None) for t in timestamps)
+        names = [s.get("name", "value") if s.get("store") is None else f"{s.get('name', 'value')}|{s['store']}" for s in series]
+        columns = [s.get("values", []) for s in series]
+        return ["timestamp", *names], ((t, *(col[i] if i < len(col) else None for col in columns)) for i, t in enumerate(timestamps))
+    if job_type == "pareto":
+        def items(data: list[dict]) -> Iterator[tuple]:
+            for item in data:
+                meta = item.get("metadata", {})
+                yield item.get("category"), item.get("value"), meta.get("percentage"), meta.get("cumulative"), meta.get("display_name")
+
+        header = ["category", "value", "percentage", "cumulative", "display_name"]
+        if payload.get("stores") is None:
+            return header, items(payload.get("data", []))
+        # by_store results: the all-stores rows (empty store) followed by each store's rows
+        groups = [(None, payload.get("data", [])), *((s["store"], s.get("data", [])) for s in payload["stores"])]
+        return ["store", *header], ((store, *row) for store, data in groups for row in items(data))
+    if job_type == "histogram":
         bins = payload.get("bins", [])
         counts = payload.get("counts", [])
-        rows = []
-        for i in range(max(0, len(bins) - 1)):
-            rows.append({"bin_start": bins[i], "bin_end": bins[i + 1], "count": counts[i] if i < len(counts) else None})
-        df = pd.DataFrame(rows)
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported job type")
-
-    if format == "csv":
-        buf = io.StringIO(); df.to_csv(buf, index=False); buf.seek(0)
-        return StreamingResponse(iter([buf.getvalue()]), media_type="text/csv", headers={"Content-Disposition": f"attachment; filename=job_{job_id}.csv"})
-    elif format == "xlsx":
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False)
-        buf.seek(0)
-        return StreamingResponse(iter([buf.getvalue()]), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": f"attachment; filename=job_{job_id}.xlsx"})
-    else:
+        rows = ((bins[i], bins[i + 1], counts[i] if i < len(counts) else None) for i in range(max(0, len(bins) - 1)))
+        return ["bin_start", "bin_end", "count"], rows
+    raise HTTPException(status_code=400, detail="Unsupported job type")
+
+
+def _stream_csv(header: list[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % CSV_FLUSH_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def _stream_frames_csv(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for frame in frames:
+        with timing.span("serialize"):
+            body = frame.to_csv(index=False, header=header).encode("utf-8")
+        yield body
+        header = False
+
+
+def _stream_xlsx(header: Optional[list[str]], rows: Iterable[tuple]) -> Iterator[bytes]:
+    # openpyxl's write-only mode spools rows to disk, and the finished workbook is sent from a temp file
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    if header is not None:
+        ws.append(header)
+    for row in rows:
+        ws.append(row)
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(FILE_CHUNK_BYTES):
+            yield chunk
+
+
+def _frame_rows(frames: Iterable[pd.DataFrame]) -> Iterator[tuple]:
+    first = True
+    for frame in frames:
+        if first:
+            yield tuple(map(str, frame.columns))
+            first = False
+        frame = frame.astype(object).where(frame.notna(), None)
+        yield from frame.itertuples(index=False, name=None)
+
+
+def _attachment(body: Iterator[bytes], format: str, stem: str) -> StreamingResponse:
+    media_type = CSV_MEDIA_TYPE if format == "csv" else XLSX_MEDIA_TYPE
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={stem}.{format}"})
+
+
+@router.get("/dataset/{dataset_id}", summary="Stream the raw rows of a dataset, optionally filtered by store and date range")
+def export_dataset(
+    dataset_id: int,
+    format: str = "csv",
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    if format not in ("csv", "xlsx"):
         raise HTTPException(status_code=400, detail="Invalid format. Use csv or xlsx")
+    with timing.span("resolve"):
+        ds = datasets_repo.get(db, dataset_id)
+        if not ds:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        date_col, store_col = storage.date_and_store(ds)
+    if store and not store_col:
+        raise HTTPException(status_code=400, detail="Store column not found")
+    if (start or end) and not date_col:
+        raise HTTPException(status_code=400, detail="Date column not found")
+    bounds = (pd.to_datetime(start) if start else None, pd.to_datetime(end) if end else None)
+
+    def frames() -> Iterator[pd.DataFrame]:
+        chunks = partitioned.scan(ds, store=store, start=start, end=end, batch_rows=settings.ingest_chunk_rows)
+        # Streamed after the headers are sent, so these spans only reach /admin/debug/metrics
+        for chunk in chunks if chunks is not None else storage.iter_frames(ds, storage.stored_columns(ds) or None, batch_rows=settings.ingest_chunk_rows):
+            with timing.span("filter"):
+                if store:
+                    chunk = chunk[chunk[store_col] == store]
+                if bounds[0] is not None or bounds[1] is not None:
+                    dates = storage.parsed_dates(chunk, date_col)
+                    mask = dates.notna()
+                    if bounds[0] is not None:
+                        mask &= dates >= bounds[0]
+                    if bounds[1] is not None:
+                        mask &= dates <= bounds[1]
+                    chunk = chunk[mask]
+            yield chunk.drop(columns=storage.PARSED_DATE, errors="ignore")
+
+    body = _stream_frames_csv(frames()) if format == "csv" else _stream_xlsx(None, _frame_rows(frames()))
+    return _attachment(body, format, f"dataset_{dataset_id}")
 
+
+@router.get("/{job_id}")
+async def export_job(job_id: int, format: str = "csv", db: AsyncSession = Depends(get_async_db)):
+    # The job lookup runs on the event loop; the rows are generated as the (sync) body is streamed from the threadpool
+    with timing.span("resolve"):
+        job = await jobs_repo.get_async(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use csv or xlsx")
+    header, rows = _job_table(job.type, json.loads(job.result_json))
+    body = _stream_csv(header, rows) if format == "csv" else _stream_xlsx(header, rows)
+    return _attachment(body, format, f"job_{job_id}")
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from ...services.tasks import task_runner
+
+
+router = APIRouter()
+
+
+@router.get("/{task_id}", summary="Poll the status of an async analysis task")
+def get_task(task_id: str):
+    task = task_runner.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task.to_dict()
+
+
+@router.get("/{task_id}/result", summary="Fetch the result of a finished analysis task")
+def get_task_result(task_id: str):
+    task = task_runner.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.status == "failed":
+        raise HTTPException(status_code=task.error["status_code"], detail=task.error["detail"])
+    if task.status == "cancelled":
+        raise HTTPException(status_code=410, detail="Task was cancelled")
+    if task.status != "done":
+        raise HTTPException(status_code=409, detail=f"Task is {task.status}")
+    return Response(content=task.result_json, media_type="application/json", headers={"X-Job-Id": str(task.job_id)})
+
+
+@router.delete("/{task_id}", summary="Cancel a queued or running analysis task")
+def cancel_task(task_id: str):
+    task = task_runner.cancel(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task.to_dict()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from sqlalchemy import event, inspect
+
+from ..models.user import User
+from .config import settings
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe LRU whose entries expire ``ttl`` seconds after insertion (or earlier, per entry)."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_values(self, value: Any) -> None:
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if v == value]:
+                del self._entries[key]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# token -> username (never beyond the token's own exp) and username -> User (detached, read-only)
+tokens = TTLCache(settings.auth_cache_ttl_seconds, settings.auth_cache_max_entries)
+users = TTLCache(settings.auth_cache_ttl_seconds, settings.auth_cache_max_entries)
+
+
+def get_token(token: str) -> Optional[str]:
+    username = tokens.get(token)
+    return None if username is _MISSING else username
+
+
+def put_token(token: str, username: str, exp: Optional[float]) -> None:
+    tokens.put(token, username, ttl=None if exp is None else exp - time.time())
+
+
+def get_user(username: str) -> Optional[User]:
+    user = users.get(username)
+    return None if user is _MISSING else user
+
+
+def put_user(user: User) -> None:
+    users.put(user.username, user)
+
+
+def invalidate_user(username: str) -> None:
+    """Drop a user and every cached token issued for them (call after a password change, deactivation, ...)."""
+    users.pop(username)
+    tokens.discard_values(username)
+
+
+def stats() -> dict[str, Any]:
+    return {"ttl_seconds": settings.auth_cache_ttl_seconds, "tokens": tokens.stats(), "users": users.stats()}
+
+
+def _on_user_change(_mapper, _connection, target: User) -> None:
+    invalidate_user(target.username)
+    for old in inspect(target).attrs.username.history.deleted or ():
+        invalidate_user(old)
+
+
+# Any ORM update/delete of a user (profile, password, is_active, rename) evicts it and its tokens
+event.listen(User, "after_update", _on_user_change)
+event.listen(User, "after_delete", _on_user_change)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import os
 import secrets
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,8 +13,36 @@ class Settings(BaseSettings):
     secret_key: str = secrets.token_urlsafe(32)
     access_token_expire_minutes: int = 60
     algorithm: str = "HS256"
+    bcrypt_rounds: int = 12
+    auth_cache_ttl_seconds: float = 60.0
+    auth_cache_max_entries: int = 10_000
     database_url: str = "sqlite:///./backend/app.db"
+    async_database_url: Optional[str] = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+    jobs_commit_mode: Literal["sync", "deferred"] = "sync"
+    jobs_commit_batch: int = 100
+    jobs_commit_interval_ms: int = 250
     cors_origins: list[str] = ["http://localhost:5173"]
+    frame_cache_max_mb: int = 1024
+    ingest_chunk_rows: int = 100_000
+    ingest_max_workers: int = min(4, os.cpu_count() or 1)
+    analysis_cache_ttl_minutes: int = 7 * 24 * 60
+    analysis_cache_max_entries: int = 10_000
+    task_max_workers: int = 2
+    task_max_pending: int = 32
+    compute_max_workers: int = min(8, os.cpu_count() or 1)
+    timeseries_max_events: int = 200
+    append_refresh_max_jobs: int = 20
+    profiling_enabled: bool = False
+    profile_interval_ms: float = 5.0
+    profile_keep: int = 20
 
 
 settings = Settings()
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, AsyncGenerator, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .core.config import settings
 
@@ -13,13 +16,87 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+def engine_options(url: str, is_async: bool = False) -> dict[str, Any]:
+    parsed = make_url(url)
+    pool = {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow, "pool_timeout": settings.db_pool_timeout}
+    if parsed.get_backend_name() == "sqlite":
+        options: dict[str, Any] = {"connect_args": {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}}
+        if parsed.database not in (None, "", ":memory:"):
+            options.update(pool)
+            if is_async:
+                # aiosqlite defaults to NullPool (a new connection per checkout)
+                options["poolclass"] = AsyncAdaptedQueuePool
+        return options
+    # Server databases (e.g. postgresql+psycopg://...): recycle idle connections and drop dead ones before use
+    return {**pool, "pool_recycle": settings.db_pool_recycle, "pool_pre_ping": True}
+
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_url(url: str) -> str:
+    """The async-driver form of ``url`` (``sqlite+aiosqlite``, ``postgresql+asyncpg``) unless one is already set."""
+    if settings.async_database_url:
+        return settings.async_database_url
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS or parsed.get_driver_name() in ("aiosqlite", "asyncpg", "psycopg"):
+        return url
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    # WAL lets readers proceed while a writer commits; NORMAL sync is durable across app crashes in WAL mode
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cur.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cur.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}")
+    cur.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cur.close()
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Request handlers that only touch the database (dataset lookup, cache hit) run on the event loop with these
+async_engine = create_async_engine(async_url(settings.database_url), **engine_options(settings.database_url, is_async=True))
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def init_db() -> None:
     from .models import user, session as sess, dataset, analysis_job  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    migrate_analysis_jobs(engine)
+
+
+def migrate_analysis_jobs(bind: Engine) -> None:
+    """Bring an ``analysis_jobs`` table created before ``cache_key`` up to date; a no-op once it is.
+
+    ``create_all`` skips existing tables, so the column is added and backfilled from ``type`` + ``params_json``,
+    rows that now share a key are reduced to the newest, and the unique index is created.
+    """
+    from .repos.jobs import cache_key
+
+    insp = inspect(bind)
+    if not insp.has_table("analysis_jobs"):
+        return
+    columns = {c["name"] for c in insp.get_columns("analysis_jobs")}
+    if "cache_key" in columns and any(ix["name"] == "ix_analysis_jobs_cache" for ix in insp.get_indexes("analysis_jobs")):
+        return
+    with bind.begin() as conn:
+        if "cache_key" not in columns:
+            conn.execute(text("ALTER TABLE analysis_jobs ADD COLUMN cache_key VARCHAR(64)"))
+        rows = conn.execute(text("SELECT id, type, params_json FROM analysis_jobs WHERE cache_key IS NULL")).all()
+        if rows:
+            conn.execute(text("UPDATE analysis_jobs SET cache_key = :key WHERE id = :id"),
+                         [{"id": r.id, "key": cache_key(r.type, r.params_json)} for r in rows])
+        conn.execute(text("DELETE FROM analysis_jobs WHERE id NOT IN "
+                          "(SELECT MAX(id) FROM analysis_jobs GROUP BY dataset_id, type, cache_key)"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_analysis_jobs_cache ON analysis_jobs (dataset_id, type, cache_key)"))
 
 
 def get_db() -> Generator:
@@ -29,3 +106,7 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
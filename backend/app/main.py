@@ -2,9 +2,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-from .api.v1 import health, auth, users, analysis, data, export, admin
+from .api.v1 import health, auth, users, analysis, data, export, admin, tasks
 from .core.config import settings
-from .db import init_db
+from .db import async_engine, init_db
+from .repos import jobs as jobs_repo
+from .services import ingest
+from .services.executor import compute_executor
+from .services.tasks import task_runner
+from .services.timing import TimingMiddleware
 
 
 def get_application() -> FastAPI:
@@ -19,6 +24,9 @@ def get_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Per-request stage timings (Server-Timing header, /api/v1/admin/debug/metrics) and opt-in profiling
+    app.add_middleware(TimingMiddleware)
+
     # Routers
     app.include_router(health.router, prefix="/api/v1/health", tags=["health"]) 
     app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"]) 
@@ -26,6 +34,7 @@ def get_application() -> FastAPI:
     app.include_router(analysis.router, prefix="/api/v1/analysis", tags=["analysis"]) 
     app.include_router(data.router, prefix="/api/v1/data", tags=["data"]) 
     app.include_router(export.router, prefix="/api/v1/export", tags=["export"]) 
+    app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["tasks"]) 
     app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"]) 
 
     # Startup tasks
@@ -34,6 +43,18 @@ def get_application() -> FastAPI:
         init_db()
         os.makedirs(os.path.join("backend", "storage"), exist_ok=True)
 
+    @app.on_event("shutdown")
+    def _shutdown():
+        task_runner.shutdown()
+        jobs_repo.write_behind.flush()
+        compute_executor.shutdown()
+        ingest.shutdown()
+
+    @app.on_event("shutdown")
+    async def _close_async_db():
+        # aiosqlite runs each pooled connection on its own non-daemon thread
+        await async_engine.dispose()
+
     return app
 
 
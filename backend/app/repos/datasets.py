@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 
 from ..models.dataset import Dataset
 
@@ -23,6 +24,15 @@ def latest_for_session(db: Session, session_id: int) -> Optional[Dataset]:
     return db.query(Dataset).filter(Dataset.session_id == session_id).order_by(desc(Dataset.created_at)).first()
 
 
+async def get_async(db: AsyncSession, dataset_id: int) -> Optional[Dataset]:
+    return await db.get(Dataset, dataset_id)
+
+
+async def latest_for_session_async(db: AsyncSession, session_id: int) -> Optional[Dataset]:
+    stmt = select(Dataset).where(Dataset.session_id == session_id).order_by(desc(Dataset.created_at)).limit(1)
+    return (await db.execute(stmt)).scalars().first()
+
+
 def list_for_session(db: Session, session_id: int) -> list[Dataset]:
     return db.query(Dataset).filter(Dataset.session_id == session_id).order_by(desc(Dataset.created_at)).all()
 
@@ -46,6 +56,14 @@ def update_name(db: Session, dataset_id: int, name: str) -> Dataset:
     return ds
 
 
+def update_meta(db: Session, ds: Dataset, meta_json: str) -> Dataset:
+    ds.meta_json = meta_json
+    db.add(ds)
+    db.commit()
+    db.refresh(ds)
+    return ds
+
+
 def exists_name(db: Session, session_id: int, name: str, exclude_id: Optional[int] = None) -> bool:
     q = db.query(Dataset).filter(Dataset.session_id == session_id, Dataset.name == name)
     if exclude_id is not None:
@@ -1,33 +1,241 @@
 from __future__ import annotations
 
-from typing import Optional
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+import json
+from typing import Callable, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..core.config import settings
 from ..models.analysis_job import AnalysisJob
 
 
-def find_cached(db: Session, session_id: int, dataset_id: int, type_: str, params_json: str) -> Optional[AnalysisJob]:
-    return (
-        db.query(AnalysisJob)
-        .filter(
-            AnalysisJob.session_id == session_id,
-            AnalysisJob.dataset_id == dataset_id,
-            AnalysisJob.type == type_,
-            AnalysisJob.params_json == params_json,
+# Cache rows upserted between evictions
+EVICT_EVERY = 100
+
+_written = 0
+_written_lock = threading.Lock()
+
+
+def cache_key(type_: str, params_json: str) -> str:
+    return hashlib.sha256(f"{type_}\n{params_json}".encode("utf-8")).hexdigest()
+
+
+def _cutoff() -> Optional[datetime]:
+    if settings.analysis_cache_ttl_minutes <= 0:
+        return None
+    return datetime.now(tz=timezone.utc) - timedelta(minutes=settings.analysis_cache_ttl_minutes)
+
+
+def _cached_stmt(dataset_id: int, type_: str, key: str):
+    stmt = select(AnalysisJob).where(AnalysisJob.dataset_id == dataset_id, AnalysisJob.type == type_, AnalysisJob.cache_key == key)
+    cutoff = _cutoff()
+    if cutoff is not None:
+        stmt = stmt.where(AnalysisJob.created_at >= cutoff)
+    return stmt.limit(1)
+
+
+async def find_cached_async(db: AsyncSession, dataset_id: int, type_: str, params_json: str) -> Optional[AnalysisJob]:
+    key = cache_key(type_, params_json)
+    pending = write_behind.get(dataset_id, type_, key)
+    if pending is not None:
+        return AnalysisJob(**pending)
+    return (await db.execute(_cached_stmt(dataset_id, type_, key))).scalars().first()
+
+
+def row(session_id: int, dataset_id: int, type_: str, params_json: str, result_json: str) -> dict:
+    return {
+        "session_id": session_id,
+        "dataset_id": dataset_id,
+        "type": type_,
+        "cache_key": cache_key(type_, params_json),
+        "params_json": params_json,
+        "result_json": result_json,
+        "created_at": datetime.now(tz=timezone.utc),
+    }
+
+
+def _upsert(db: Session, rows: list[dict]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(AnalysisJob)
+        # Identical concurrent requests collapse onto one row; a recomputed (e.g. expired) result replaces it
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["dataset_id", "type", "cache_key"],
+            set_={k: stmt.excluded[k] for k in ("session_id", "params_json", "result_json", "created_at")},
         )
-        .order_by(AnalysisJob.created_at.desc())
-        .first()
-    )
+        db.execute(stmt, rows)
+        db.commit()
+    else:
+        for values in rows:
+            try:
+                db.add(AnalysisJob(**values))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+
+
+def _count_writes(n: int) -> bool:
+    """Add ``n`` upserted rows; true once every ``EVICT_EVERY`` rows, whatever ids they got."""
+    global _written
+    with _written_lock:
+        _written += n
+        if _written < EVICT_EVERY:
+            return False
+        _written = 0
+        return True
+
+
+def create_many(db: Session, rows: list[dict]) -> list[AnalysisJob]:
+    """Upsert several cache rows in one transaction and return them in input order."""
+    unique = list({(r["dataset_id"], r["type"], r["cache_key"]): r for r in rows}.values())
+    _upsert(db, unique)
+    jobs = db.execute(
+        select(AnalysisJob).where(
+            AnalysisJob.dataset_id.in_({r["dataset_id"] for r in unique}),
+            AnalysisJob.type.in_({r["type"] for r in unique}),
+            AnalysisJob.cache_key.in_({r["cache_key"] for r in unique}),
+        )
+    ).scalars().all()
+    by_key = {(j.dataset_id, j.type, j.cache_key): j for j in jobs}
+    out = [by_key[(r["dataset_id"], r["type"], r["cache_key"])] for r in rows]
+    if _count_writes(len(unique)):
+        evict(db)
+    return out
 
 
 def create(db: Session, session_id: int, dataset_id: int, type_: str, params_json: str, result_json: str) -> AnalysisJob:
-    job = AnalysisJob(session_id=session_id, dataset_id=dataset_id, type=type_, params_json=params_json, result_json=result_json)
-    db.add(job)
+    return create_many(db, [row(session_id, dataset_id, type_, params_json, result_json)])[0]
+
+
+class WriteBehind:
+    """Buffers cache rows and upserts them in one transaction per batch or interval.
+
+    Used by ``save_async`` when ``JOBS_COMMIT_MODE=deferred`` so requests don't wait on the database
+    write lock; pending rows are still visible to ``find_cached_async``.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, dict] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows = 0
+
+    def put(self, values: dict) -> None:
+        with self._cond:
+            self._pending[(values["dataset_id"], values["type"], values["cache_key"])] = values
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="jobs-write-behind", daemon=True)
+                self._thread.start()
+            if len(self._pending) >= settings.jobs_commit_batch:
+                self._cond.notify()
+
+    def get(self, dataset_id: int, type_: str, key: str) -> Optional[dict]:
+        with self._cond:
+            return self._pending.get((dataset_id, type_, key))
+
+    def discard(self, dataset_id: int, affected: Callable[[str, dict], bool]) -> None:
+        with self._cond:
+            for k, v in list(self._pending.items()):
+                if k[0] == dataset_id and affected(v["type"], json.loads(v["params_json"] or "{}")):
+                    del self._pending[k]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=settings.jobs_commit_interval_ms / 1000)
+            try:
+                self.flush()
+            except Exception:
+                pass  # rows stay pending and are retried on the next tick
+
+    def flush(self) -> int:
+        with self._cond:
+            rows = list(self._pending.values())
+        if not rows:
+            return 0
+        from ..db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            _upsert(db, rows)
+            if _count_writes(len(rows)):
+                evict(db)
+        finally:
+            db.close()
+        with self._cond:
+            for r in rows:
+                k = (r["dataset_id"], r["type"], r["cache_key"])
+                if self._pending.get(k) is r:
+                    del self._pending[k]
+            self.flushes += 1
+            self.rows += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"mode": settings.jobs_commit_mode, "pending": len(self._pending), "flushes": self.flushes, "rows": self.rows}
+
+
+write_behind = WriteBehind()
+
+
+async def save_async(db: AsyncSession, session_id: int, dataset_id: int, type_: str, params_json: str, result_json: str) -> Optional[AnalysisJob]:
+    """Store a cache row when the caller does not need its id; deferred to ``write_behind`` if configured."""
+    values = row(session_id, dataset_id, type_, params_json, result_json)
+    if settings.jobs_commit_mode == "deferred":
+        write_behind.put(values)
+        return None
+    return (await create_many_async(db, [values]))[0]
+
+
+async def create_many_async(db: AsyncSession, rows: list[dict]) -> list[AnalysisJob]:
+    return await db.run_sync(create_many, rows)
+
+
+def evict(db: Session) -> int:
+    removed = 0
+    cutoff = _cutoff()
+    # Bulk deletes: the session's loaded jobs are not matched in Python (SQLite returns naive datetimes)
+    options = {"synchronize_session": False}
+    if cutoff is not None:
+        removed += db.execute(delete(AnalysisJob).where(AnalysisJob.created_at < cutoff), execution_options=options).rowcount or 0
+    max_entries = settings.analysis_cache_max_entries
+    if max_entries > 0:
+        boundary = db.execute(
+            select(AnalysisJob.created_at).order_by(AnalysisJob.created_at.desc()).offset(max_entries - 1).limit(1)
+        ).scalar()
+        if boundary is not None:
+            removed += db.execute(delete(AnalysisJob).where(AnalysisJob.created_at < boundary), execution_options=options).rowcount or 0
     db.commit()
-    db.refresh(job)
-    return job
+    return removed
+
+
+def invalidate(db: Session, dataset_id: int, affected: Callable[[str, dict], bool]) -> list:
+    """Delete the cached jobs of a dataset for which ``affected(type, params)`` is true; returns them, newest first."""
+    write_behind.discard(dataset_id, affected)
+    rows = db.execute(
+        select(AnalysisJob.id, AnalysisJob.session_id, AnalysisJob.type, AnalysisJob.params_json, AnalysisJob.result_json)
+        .where(AnalysisJob.dataset_id == dataset_id)
+        .order_by(AnalysisJob.created_at.desc())
+    ).all()
+    stale = [r for r in rows if affected(r.type, json.loads(r.params_json or "{}"))]
+    if stale:
+        db.execute(delete(AnalysisJob).where(AnalysisJob.id.in_([r.id for r in stale])))
+        db.commit()
+    return stale
 
 
 def get(db: Session, job_id: int) -> Optional[AnalysisJob]:
     return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
 
+
+async def get_async(db: AsyncSession, job_id: int) -> Optional[AnalysisJob]:
+    return await db.get(AnalysisJob, job_id)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..models.session import Session as SessionModel
@@ -15,6 +16,18 @@ def create_for_user(db: Session, user_id: int, minutes: int) -> SessionModel:
     return sess
 
 
+async def create_for_user_async(db: AsyncSession, user_id: int, minutes: int) -> SessionModel:
+    now = datetime.now(tz=timezone.utc)
+    sess = SessionModel(user_id=user_id, created_at=now, expires_at=now + timedelta(minutes=minutes))
+    db.add(sess)
+    await db.commit()
+    await db.refresh(sess)
+    return sess
+
+
 def get(db: Session, session_id: int) -> SessionModel | None:
     return db.query(SessionModel).filter(SessionModel.id == session_id).first()
 
+
+async def get_async(db: AsyncSession, session_id: int) -> SessionModel | None:
+    return await db.get(SessionModel, session_id)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..models.user import User
@@ -10,6 +12,16 @@ def get_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
+async def get_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.username == username).limit(1))).scalars().first()
+
+
+async def update_password_hash_async(db: AsyncSession, user: User, password_hash: str) -> User:
+    user.password_hash = password_hash
+    await db.commit()
+    return user
+
+
 def get_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
@@ -1,10 +1,23 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
-from pydantic import BaseModel, Field
+import math
+from typing import Annotated, List, Literal, Optional, Union
+from pydantic import BaseModel, Field, model_validator
 
 
 Aggregation = Literal["daily", "weekly", "monthly"]
+HistogramStrategy = Literal["fixed", "auto", "fd", "quantile"]
+ParetoType = Literal["product_category", "columns", "category"]
+AbcClass = Literal["A", "B", "C"]
+EventType = Literal["spike", "drop", "level_shift", "yoy"]
+
+MAX_BINS = 10_000
+
+
+def quantile_key(q: float) -> str:
+    """Response key of a quantile: ``p05``/``p50`` for whole percentiles, ``p99.5``/``p0.1`` otherwise."""
+    pct = f"{q * 100:.10g}"
+    return f"p{int(pct):02d}" if pct.isdigit() else f"p{pct}"
 
 
 class TimeSeriesStatistics(BaseModel):
@@ -17,23 +30,45 @@ class TimeSeriesStatistics(BaseModel):
 
 class TimeSeriesSeries(BaseModel):
     name: str
+    store: Optional[str] = None
     values: List[float]
     statistics: Optional[TimeSeriesStatistics] = None
 
 
-class TimeSeriesRequest(BaseModel):
-    session_id: int
-    dataset_id: Optional[int] = None
+class TimeSeriesParams(BaseModel):
     store: Optional[str] = None
-    target_column: str
+    target_column: Optional[str] = None
+    target_columns: Optional[List[str]] = Field(default=None, description="Several target columns aggregated in one pass")
+    split_by_store: bool = False
     aggregation: Aggregation = "monthly"
     date_range: Optional[List[str]] = Field(default=None, description="[start, end] as YYYY-MM-DD")
 
+    @model_validator(mode="after")
+    def _require_target(self):
+        if not self.target_column and not self.target_columns:
+            raise ValueError("target_column or target_columns is required")
+        return self
+
+
+class TimeSeriesRequest(TimeSeriesParams):
+    session_id: int
+    dataset_id: Optional[int] = None
+
+
+class TimeSeriesEvent(BaseModel):
+    type: EventType
+    timestamp: str
+    name: str
+    store: Optional[str] = None
+    value: float
+    expected: float = Field(description="Trailing mean (spike/drop), mean before the shift (level_shift) or year-ago value at the median growth (yoy)")
+    score: float = Field(description="Signed z-score of the deviation")
+
 
 class TimeSeriesResponse(BaseModel):
     timestamp: List[str]
     series: List[TimeSeriesSeries]
-    events: Optional[List[dict]] = None
+    events: Optional[List[TimeSeriesEvent]] = None
 
 
 class ParetoItemMetadata(BaseModel):
@@ -48,25 +83,72 @@ class ParetoItem(BaseModel):
     metadata: ParetoItemMetadata = ParetoItemMetadata()
 
 
-class ParetoRequest(BaseModel):
-    session_id: int
-    dataset_id: Optional[int] = None
+class ParetoParams(BaseModel):
     store: Optional[str] = None
-    analysis_type: Literal["product_category"] = "product_category"
+    analysis_type: ParetoType = "product_category"
     period: Optional[str] = None
+    columns: Optional[List[str]] = Field(default=None, description="Value columns to rank (analysis_type=columns)")
+    category_column: Optional[str] = Field(default=None, description="Long-format category column (analysis_type=category)")
+    value_column: Optional[str] = Field(default=None, description="Value summed per category (analysis_type=category)")
+    top_n: Optional[int] = Field(default=None, ge=1, description="Keep the N largest categories and fold the rest into an \"Other\" item")
+    by_store: bool = Field(default=False, description="Also return a Pareto per store and an ABC ranking of the stores")
+
+    @model_validator(mode="after")
+    def _require_source(self):
+        if self.analysis_type == "columns" and not self.columns:
+            raise ValueError("columns is required for analysis_type=columns")
+        if self.analysis_type == "category" and not (self.category_column and self.value_column):
+            raise ValueError("category_column and value_column are required for analysis_type=category")
+        if self.by_store and self.store:
+            raise ValueError("store cannot be combined with by_store")
+        return self
+
+
+class ParetoRequest(ParetoParams):
+    session_id: int
+    dataset_id: Optional[int] = None
+
+
+class StorePareto(BaseModel):
+    store: str
+    data: List[ParetoItem]
+    total: float
+    vital_few_threshold: int
+
+
+class StoreRank(BaseModel):
+    store: str
+    rank: int
+    total: float
+    percentage: float
+    cumulative: float
+    abc_class: AbcClass
 
 
 class ParetoResponse(BaseModel):
     data: List[ParetoItem]
     total: float
     vital_few_threshold: int
+    stores: Optional[List[StorePareto]] = None
+    store_ranking: Optional[List[StoreRank]] = None
+
+
+class HistogramParams(BaseModel):
+    column: str
+    bins: Optional[int] = Field(default=20, ge=1, le=MAX_BINS)
+    strategy: HistogramStrategy = "fixed"
+    range: Optional[List[float]] = Field(default=None, min_length=2, max_length=2, description="[min, max] for fixed-width bins")
+
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.range is not None and not (math.isfinite(self.range[0]) and math.isfinite(self.range[1]) and self.range[0] < self.range[1]):
+            raise ValueError("range must be two finite numbers with min < max")
+        return self
 
 
-class HistogramRequest(BaseModel):
+class HistogramRequest(HistogramParams):
     session_id: int
     dataset_id: Optional[int] = None
-    column: str
-    bins: Optional[int] = 20
 
 
 class HistogramFit(BaseModel):
@@ -80,3 +162,67 @@ class HistogramResponse(BaseModel):
     fit: Optional[HistogramFit] = None
     summary: Optional[dict] = None
 
+
+class SummaryRequest(BaseModel):
+    session_id: int
+    dataset_id: Optional[int] = None
+    columns: Optional[List[str]] = Field(default=None, description="Numeric columns to summarize (default: all)")
+    store: Optional[str] = None
+    date_range: Optional[List[str]] = Field(default=None, description="[start, end] as YYYY-MM-DD")
+    quantiles: List[Annotated[float, Field(ge=0, le=1)]] = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+    @model_validator(mode="after")
+    def _distinct_quantiles(self):
+        if len({quantile_key(q) for q in self.quantiles}) != len(self.quantiles):
+            raise ValueError("quantiles must be distinct")
+        return self
+
+
+class ColumnSummary(BaseModel):
+    column: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    quantiles: Optional[dict] = None
+    histogram: Optional[dict] = None
+
+
+class SummaryResponse(BaseModel):
+    columns: List[ColumnSummary]
+
+
+class TimeSeriesSpec(TimeSeriesParams):
+    type: Literal["timeseries"] = "timeseries"
+
+
+class ParetoSpec(ParetoParams):
+    type: Literal["pareto"] = "pareto"
+
+
+class HistogramSpec(HistogramParams):
+    type: Literal["histogram"] = "histogram"
+
+
+AnalysisSpec = Annotated[Union[TimeSeriesSpec, ParetoSpec, HistogramSpec], Field(discriminator="type")]
+
+
+class BatchRequest(BaseModel):
+    session_id: int
+    dataset_id: Optional[int] = None
+    specs: List[AnalysisSpec] = Field(..., min_length=1, max_length=500)
+
+
+class BatchResult(BaseModel):
+    type: str
+    status_code: int = 200
+    cached: bool = False
+    job_id: Optional[int] = None
+    result: Optional[Union[TimeSeriesResponse, ParetoResponse, HistogramResponse]] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    dataset_id: int
+    results: List[BatchResult]
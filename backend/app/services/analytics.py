@@ -0,0 +1,592 @@
+from __future__ import annotations
+
+import json
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from ..core.config import settings
+from ..models.dataset import Dataset
+from ..schemas.analysis import (
+    TimeSeriesParams,
+    TimeSeriesRequest,
+    TimeSeriesResponse,
+    TimeSeriesSeries,
+    TimeSeriesStatistics,
+    ParetoRequest,
+    ParetoResponse,
+    ParetoItem,
+    ParetoItemMetadata,
+    StorePareto,
+    StoreRank,
+    HistogramRequest,
+    HistogramResponse,
+    HistogramFit,
+    SummaryRequest,
+    SummaryResponse,
+    ColumnSummary,
+    AnalysisSpec,
+)
+from ..utils.dataframe import detect_date_and_store, display_name_for
+from . import cube as cube_mod
+from . import events as events_mod
+from . import histogram
+from . import partitioned
+from . import sketches
+from . import storage
+from . import timing
+
+
+def load_df(ds: Dataset, columns: Optional[Sequence[Optional[str]]] = None) -> pd.DataFrame:
+    if columns is not None:
+        columns = [c for c in columns if c]
+        if not storage.dataset_columns(ds):
+            columns = None
+    return storage.load_frame(ds, columns)
+
+
+def params_json(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def timeseries_params(payload: TimeSeriesRequest) -> dict:
+    params = {"store": payload.store, "target_column": payload.target_column, "aggregation": payload.aggregation, "date_range": payload.date_range}
+    if payload.target_columns:
+        params["target_columns"] = payload.target_columns
+    if payload.split_by_store:
+        params["split_by_store"] = True
+    return params
+
+
+def pareto_params(payload: ParetoRequest) -> dict:
+    params = {"store": payload.store, "analysis_type": payload.analysis_type, "period": payload.period}
+    for key in ("columns", "category_column", "value_column", "top_n", "by_store"):
+        if getattr(payload, key):
+            params[key] = getattr(payload, key)
+    return params
+
+
+def histogram_params(payload: HistogramRequest) -> dict:
+    params = {"column": payload.column, "bins": payload.bins}
+    if payload.strategy != "fixed":
+        params["strategy"] = payload.strategy
+    if payload.range:
+        params["range"] = payload.range
+    return params
+
+
+class FrameSource:
+    """Per-request view of a dataset that loads and normalizes it at most once.
+
+    Single requests and batches share the same code path; a batch simply asks one
+    source for several slices, so the parse, column detection, datetime conversion
+    and filtered intermediates are reused across specs.
+    """
+
+    def __init__(self, ds: Dataset, columns: Optional[Sequence[Optional[str]]] = None):
+        self.ds = ds
+        self.columns = storage.dataset_columns(ds)
+        # Profiled datasets carry their date/store columns, parsed dates and date order from ingest
+        self.profile = storage.dataset_profile(ds)
+        self.date_col, self.store_col = storage.date_and_store(ds)
+        self.sorted = bool(self.profile.get("sorted"))
+        self._wanted = [c for c in columns if c] if columns is not None else None
+        self._cube: Optional[pd.DataFrame] = None
+        self._cube_loaded = False
+        self._raw: Optional[pd.DataFrame] = None
+        self._parsed: Optional[pd.DataFrame] = None
+        self._slices: dict[tuple, pd.DataFrame] = {}
+
+    def cube(self) -> Optional[pd.DataFrame]:
+        if not self._cube_loaded:
+            with timing.span("load"):
+                self._cube = cube_mod.get_cube(self.ds) if self.date_col else None
+            self._cube_loaded = True
+        return self._cube
+
+    def cube_has(self, columns: Sequence[str]) -> bool:
+        cube = self.cube()
+        return cube is not None and all(c in cube_mod.numeric_columns(cube) for c in columns)
+
+    def keys(self, df: pd.DataFrame) -> tuple[Optional[str], Optional[str]]:
+        if not self.profile:
+            return detect_date_and_store(df)
+        return tuple(c if c in df.columns else None for c in (self.date_col, self.store_col))
+
+    @staticmethod
+    def _dated(df: pd.DataFrame, date_col: Optional[str]) -> pd.DataFrame:
+        # Loaded frames are compacted, so the date column is normally datetime64 already
+        if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+            with timing.span("parse"):
+                return df.assign(**{date_col: pd.to_datetime(df[date_col], errors="coerce")})
+        return df
+
+    def raw(self, columns: Sequence[Optional[str]]) -> pd.DataFrame:
+        needed = [c for c in columns if c]
+        if self.profile and self.date_col in needed:
+            needed.append(storage.PARSED_DATE)
+        if self._raw is None or any(c not in self._raw.columns for c in needed if c in self.columns):
+            self._wanted = list(dict.fromkeys([*(self._wanted or []), *needed]))
+            with timing.span("load"):
+                self._raw = load_df(self.ds, self._wanted)
+            self._parsed = None
+            self._slices.clear()
+        return self._raw
+
+    def parsed(self, columns: Sequence[Optional[str]]) -> tuple[pd.DataFrame, Optional[str], Optional[str]]:
+        df = self.raw(columns)
+        date_col, store_col = self.keys(df)
+        if self._parsed is None:
+            self._parsed = self._dated(df, date_col)
+        return self._parsed, date_col, store_col
+
+    def pushed(
+        self,
+        columns: Sequence[Optional[str]],
+        store: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = None,
+    ) -> tuple[pd.DataFrame, Optional[str], Optional[str]]:
+        """Like ``parsed`` but, for filtered requests, reads only the store/month partitions that can match.
+
+        The result may hold extra rows (filters are applied at day granularity); callers keep their exact filters.
+        """
+        if self._parsed is None and (store or start or end or period):
+            wanted = [c for c in columns if c]
+            if self.profile and self.date_col in wanted:
+                wanted.append(storage.PARSED_DATE)
+            df = self.memo(("pushed", tuple(wanted), store, start, end, period), lambda: partitioned.read(self.ds, wanted, store, start, end, period), "load")
+            if df is not None:
+                date_col, store_col = self.keys(df)
+                return self._dated(df, date_col), date_col, store_col
+        return self.parsed(columns)
+
+    def memo(self, key: tuple, build, stage: str = "filter") -> pd.DataFrame:
+        if key not in self._slices:
+            with timing.span(stage):
+                self._slices[key] = build()
+        return self._slices[key]
+
+
+def _date_bounds(date_range: Optional[list[str]]) -> tuple[Optional[str], Optional[str]]:
+    return tuple(date_range) if date_range and len(date_range) == 2 else (None, None)
+
+
+def affected_by(type_: str, params: dict, partition: dict) -> bool:
+    """Whether a cached result with ``params`` can change when ``partition`` is appended."""
+    if type_ not in ("timeseries", "pareto"):
+        return True
+    store = params.get("store")
+    if store and partition.get("stores") is not None and store not in partition["stores"]:
+        return False
+    try:
+        if type_ == "timeseries":
+            start, end = _date_bounds(params.get("date_range"))
+        elif params.get("period"):
+            month = pd.Period(params["period"], freq="M")
+            start, end = str(month.start_time.date()), str(month.end_time.date())
+        else:
+            start = end = None
+        if start is None and end is None:
+            return True
+        if partition.get("date_range") is None:
+            return False
+        lo, hi = (pd.Timestamp(d) for d in partition["date_range"])
+        return not ((end and pd.Timestamp(end) < lo) or (start and pd.Timestamp(start) > hi))
+    except (ValueError, TypeError):
+        return True
+
+
+def timeseries_frame(src: FrameSource, store: Optional[str], date_range: Optional[list[str]], targets: Sequence[str]) -> tuple[pd.DataFrame, str]:
+    start, end = _date_bounds(date_range)
+    if src.date_col and src.cube_has(targets):
+        # Roll up the daily store cube instead of scanning raw rows
+        df = src.memo(("ts-cube", store, start, end), lambda: cube_mod.slice_cube(src.cube(), store=store, start=start, end=end).dropna(subset=[cube_mod.CUBE_DATE]))
+        return df, cube_mod.CUBE_DATE
+
+    df, date_col, store_col = src.pushed([src.date_col, src.store_col, *targets], store=store, start=start, end=end)
+    if date_col is None:
+        raise HTTPException(status_code=400, detail="Date column not found")
+    for target in targets:
+        if target not in df.columns:
+            raise HTTPException(status_code=400, detail=f"Target column not found: {target}")
+
+    def build() -> pd.DataFrame:
+        out = df
+        if store and store_col and store_col in out.columns:
+            out = out[out[store_col] == store]
+        out = out.dropna(subset=[date_col])
+        if not src.sorted:
+            out = out.sort_values(date_col)
+        if start:
+            out = out[out[date_col] >= pd.to_datetime(start)]
+        if end:
+            out = out[out[date_col] <= pd.to_datetime(end)]
+        return out
+
+    return src.memo(("ts-raw", tuple(df.columns), store, start, end), build), date_col
+
+
+FREQ = {"daily": "D", "weekly": "W", "monthly": "M"}
+
+
+def timeseries_targets(payload: TimeSeriesRequest) -> list[str]:
+    return list(dict.fromkeys([*([payload.target_column] if payload.target_column else []), *(payload.target_columns or [])]))
+
+
+def aggregate_timeseries(df: pd.DataFrame, date_col: str, targets: Sequence[str], aggregation: str) -> pd.DataFrame:
+    return df.set_index(date_col)[list(targets)].groupby(pd.Grouper(freq=FREQ[aggregation])).sum()
+
+
+def aggregate_by_store(df: pd.DataFrame, date_col: str, store_col: str, targets: Sequence[str], aggregation: str) -> pd.DataFrame:
+    """Periods x (target, store) sums from a single groupby, on one contiguous period axis (gaps are 0)."""
+    freq = FREQ[aggregation]
+    grouped = df.groupby([store_col, pd.Grouper(key=date_col, freq=freq)], observed=True)[list(targets)].sum()
+    wide = grouped.unstack(level=0)
+    if len(wide.index):
+        wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq=freq))
+    return wide.fillna(0.0)
+
+
+def bulk_statistics(values: np.ndarray) -> list[TimeSeriesStatistics]:
+    """Statistics for every row of a (series x periods) matrix in one set of NumPy reductions."""
+    n_series, n_periods = values.shape
+    if n_periods <= 1:
+        return [TimeSeriesStatistics(mean=None, std=None, min=None, max=None, trend="flat") for _ in range(n_series)]
+    values = np.ascontiguousarray(values, dtype=float)
+    mean = values.mean(axis=1); std = values.std(axis=1, ddof=0); min_v = values.min(axis=1); max_v = values.max(axis=1)
+    w = min(3, n_periods); start_avg = values[:, :w].mean(axis=1); end_avg = values[:, -w:].mean(axis=1)
+    trend = np.where(end_avg > start_avg * 1.05, "increasing", np.where(end_avg < start_avg * 0.95, "decreasing", "flat"))
+    return [
+        TimeSeriesStatistics(mean=float(a), std=float(b), min=float(c), max=float(d), trend=str(t))
+        for a, b, c, d, t in zip(mean, std, min_v, max_v, trend)
+    ]
+
+
+def first_changed(previous: TimeSeriesResponse, labels: Sequence[str], values: np.ndarray, names: Sequence[str], stores: Sequence[Optional[str]]) -> Optional[int]:
+    """Index of the first period whose value differs from ``previous`` (its length if only periods were added);
+    None when the series or the earlier periods do not line up."""
+    n = len(previous.timestamp)
+    if [(s.name, s.store) for s in previous.series] != list(zip(names, stores)) or list(labels[:n]) != previous.timestamp:
+        return None
+    old = np.array([s.values for s in previous.series], dtype=float).reshape(len(names), n)
+    changed = np.flatnonzero((old != values[:, :n]).any(axis=0))
+    return int(changed[0]) if changed.size else n
+
+
+def timeseries_response(
+    index: pd.DatetimeIndex,
+    values: np.ndarray,
+    names: Sequence[str],
+    stores: Sequence[Optional[str]],
+    aggregation: str,
+    previous: Optional[TimeSeriesResponse] = None,
+) -> TimeSeriesResponse:
+    """``previous`` is the same request's result before an append; its events up to the first changed period are kept."""
+    stats = bulk_statistics(values)
+    series = [
+        TimeSeriesSeries(name=name, store=store, values=row.tolist(), statistics=st)
+        for name, store, row, st in zip(names, stores, values, stats)
+    ]
+    labels = index.strftime("%Y-%m-%d")
+    with timing.span("events"):
+        first_new = first_changed(previous, labels, values, names, stores) if previous and previous.events is not None else None
+        if first_new is None:
+            found = events_mod.detect(index, values, names, stores, aggregation)
+        else:
+            found = events_mod.update(previous.events, index, values, names, stores, aggregation, first_new)
+    return TimeSeriesResponse(timestamp=labels.tolist(), series=series, events=found)
+
+
+def grouped_response(grouped: pd.DataFrame, targets: Sequence[str], aggregation: str, previous: Optional[TimeSeriesResponse] = None) -> TimeSeriesResponse:
+    grouped = grouped[list(targets)].dropna()
+    return timeseries_response(grouped.index, grouped.to_numpy(dtype=float).T, targets, [None] * len(targets), aggregation, previous)
+
+
+def compute_timeseries(
+    ds: Dataset,
+    payload: TimeSeriesParams,
+    src: Optional[FrameSource] = None,
+    previous: Optional[TimeSeriesResponse] = None,
+) -> TimeSeriesResponse:
+    src = src or FrameSource(ds)
+    targets = timeseries_targets(payload)
+    df, date_col = timeseries_frame(src, payload.store, payload.date_range, targets)
+    if not payload.split_by_store:
+        with timing.span("aggregate"):
+            return grouped_response(aggregate_timeseries(df, date_col, targets, payload.aggregation), targets, payload.aggregation, previous)
+
+    store_col = cube_mod.CUBE_STORE if date_col == cube_mod.CUBE_DATE else src.store_col
+    if not store_col or store_col not in df.columns:
+        raise HTTPException(status_code=400, detail="Store column not found")
+    with timing.span("aggregate"):
+        wide = aggregate_by_store(df, date_col, store_col, targets, payload.aggregation)
+    names = [str(t) for t, _ in wide.columns]
+    stores = [str(s) for _, s in wide.columns]
+    return timeseries_response(wide.index, wide.to_numpy(dtype=float).T, names, stores, payload.aggregation, previous)
+
+
+PRODUCT_COLUMNS = [
+    "Mens_JACKETS&OUTER2","Mens_KNIT","Mens_PANTS","WOMEN'S_JACKETS2","WOMEN'S_TOPS","WOMEN'S_ONEPIECE","WOMEN'S_bottoms","WOMEN'S_SCARF & STOLES"
+]
+
+
+OTHER_CATEGORY = "Other"
+
+
+def pareto_frame(src: FrameSource, store: Optional[str], period: Optional[str], columns: Sequence[str] = PRODUCT_COLUMNS, use_cube: bool = True) -> pd.DataFrame:
+    if use_cube and src.date_col and src.cube_has([c for c in columns if c in src.columns]):
+        return src.memo(("pareto-cube", store, period), lambda: cube_mod.slice_cube(src.cube(), store=store, period=period))
+
+    df, date_col, store_col = src.pushed([src.date_col, src.store_col, *columns], store=store, period=period)
+
+    def build() -> pd.DataFrame:
+        out = df
+        if period and date_col and date_col in out.columns:
+            out = out.dropna(subset=[date_col])
+            try:
+                out = out[out[date_col].dt.to_period("M") == pd.Period(period)]
+            except Exception:
+                pass
+        if store and store_col and store_col in out.columns:
+            out = out[out[store_col] == store]
+        return out
+
+    return src.memo(("pareto-raw", tuple(df.columns), store, period), build)
+
+
+def pareto_totals(src: FrameSource, payload: ParetoRequest) -> pd.Series:
+    if payload.analysis_type == "category":
+        cat, val = payload.category_column, payload.value_column
+        # The cube has already summed every numeric column away, so long-format categories always read raw rows
+        df = pareto_frame(src, payload.store, payload.period, [cat, val], use_cube=False)
+        for col in (cat, val):
+            if col not in df.columns:
+                raise HTTPException(status_code=400, detail=f"Column not found: {col}")
+        values = pd.to_numeric(df[val], errors="coerce")
+        return values.groupby(df[cat], sort=False, observed=True).sum()
+
+    columns = PRODUCT_COLUMNS if payload.analysis_type == "product_category" else list(dict.fromkeys(payload.columns))
+    df = pareto_frame(src, payload.store, payload.period, columns)
+    present = [c for c in columns if c in df.columns]
+    if payload.analysis_type == "columns" and len(present) < len(columns):
+        raise HTTPException(status_code=400, detail=f"Column not found: {next(c for c in columns if c not in df.columns)}")
+    if not present:
+        raise HTTPException(status_code=400, detail="No product category columns found in data")
+    return df[present].sum(numeric_only=True).reindex(present).dropna()
+
+
+def store_totals(src: FrameSource, payload: ParetoRequest) -> pd.DataFrame:
+    """Stores x categories totals from one groupby over the store column (rows without a store are left out)."""
+    if payload.analysis_type == "category":
+        cat, val = payload.category_column, payload.value_column
+        df = pareto_frame(src, None, payload.period, [cat, val], use_cube=False)
+        store_col = src.store_col
+        if not store_col or store_col not in df.columns:
+            raise HTTPException(status_code=400, detail="Store column not found")
+        values = pd.to_numeric(df[val], errors="coerce")
+        totals = values.groupby([df[store_col], df[cat]], observed=True).sum().unstack(fill_value=0.0)
+        totals.columns = totals.columns.astype(str)
+        return totals
+
+    columns = PRODUCT_COLUMNS if payload.analysis_type == "product_category" else list(dict.fromkeys(payload.columns))
+    df = pareto_frame(src, None, payload.period, columns)
+    store_col = cube_mod.CUBE_STORE if cube_mod.CUBE_DATE in df.columns else src.store_col
+    if not store_col or store_col not in df.columns:
+        raise HTTPException(status_code=400, detail="Store column not found")
+    present = [c for c in columns if c in df.columns]
+    if payload.analysis_type == "columns" and len(present) < len(columns):
+        raise HTTPException(status_code=400, detail=f"Column not found: {next(c for c in columns if c not in df.columns)}")
+    if not present:
+        raise HTTPException(status_code=400, detail="No product category columns found in data")
+    return df.groupby(store_col, observed=True)[present].sum(numeric_only=True).reindex(columns=present)
+
+
+ABC_THRESHOLDS = (80.0, 95.0)
+
+
+def store_paretos(totals: pd.DataFrame, top_n: Optional[int] = None) -> tuple[list[StorePareto], list[StoreRank]]:
+    """Per-store Paretos (same ordering, shares and thresholds as a single-store request) and an ABC store ranking.
+
+    Sorting, shares and vital-few thresholds are computed for all stores at once on the stores x categories matrix.
+    """
+    stores = totals.index.astype(str).to_numpy(dtype=object)
+    labels = totals.columns.astype(str).to_numpy(dtype=object)
+    values = np.nan_to_num(totals.to_numpy(dtype=float))
+    n_stores, n_cats = values.shape
+    order = np.argsort(-values, axis=1, kind="stable")
+    ranked = np.take_along_axis(values, order, axis=1)
+    running = np.cumsum(ranked, axis=1)
+    total = running[:, -1] if n_cats else np.zeros(n_stores)
+    shown_n = min(top_n, n_cats) if top_n else n_cats
+    if shown_n < n_cats:
+        total = values.sum(axis=1)
+    safe = np.where(total != 0, total, 1.0)[:, None]
+    pct = np.where(total[:, None] != 0, ranked / safe * 100.0, 0.0)
+    cumulative = np.cumsum(pct, axis=1)
+    # First position whose running share reaches 80% (over every category when the shown ones stay below it)
+    reached = np.maximum.accumulate(cumulative, axis=1) >= 80.0
+    vital = np.where(reached.any(axis=1), reached.argmax(axis=1), n_cats - 1) + 1
+    shown_reached = reached[:, :shown_n]
+    vital = np.where(shown_reached.any(axis=1), shown_reached.argmax(axis=1) + 1, vital if shown_n < n_cats else np.maximum(shown_n, 1))
+
+    paretos = []
+    for i in range(n_stores):
+        top = order[i, :shown_n]
+        items = [
+            ParetoItem(category=cat, value=val, metadata=ParetoItemMetadata(display_name=display_name_for(cat), percentage=p, cumulative=cum))
+            for cat, val, p, cum in zip(labels[top].tolist(), ranked[i, :shown_n].tolist(), pct[i, :shown_n].tolist(), cumulative[i, :shown_n].tolist())
+        ]
+        if shown_n < n_cats:
+            other = float(total[i]) - float(ranked[i, :shown_n].sum())
+            items.append(ParetoItem(
+                category=OTHER_CATEGORY,
+                value=other,
+                metadata=ParetoItemMetadata(display_name=f"{OTHER_CATEGORY} ({n_cats - shown_n})", percentage=other / total[i] * 100.0 if total[i] else 0.0, cumulative=100.0 if total[i] else 0.0),
+            ))
+        paretos.append(StorePareto(store=stores[i], data=items, total=float(total[i]), vital_few_threshold=int(vital[i])))
+
+    store_total = values.sum(axis=1)
+    rank = np.argsort(-store_total, kind="stable")
+    grand = float(store_total.sum())
+    share = store_total[rank] / grand * 100.0 if grand else np.zeros(n_stores)
+    running_share = np.cumsum(share)
+    # A store's class is set by the share of the stores ranked above it: A until 80%, B until 95%, then C
+    before = running_share - share
+    classes = np.where(before < ABC_THRESHOLDS[0], "A", np.where(before < ABC_THRESHOLDS[1], "B", "C"))
+    ranking = [
+        StoreRank(store=stores[j], rank=k + 1, total=float(store_total[j]), percentage=float(p), cumulative=float(c), abc_class=str(cls))
+        for k, (j, p, c, cls) in enumerate(zip(rank.tolist(), share.tolist(), running_share.tolist(), classes.tolist()))
+    ]
+    return paretos, ranking
+
+
+def _vital_few(cumulative: np.ndarray) -> int:
+    # First position whose running cumulative share reaches 80%, else every category
+    reached = np.searchsorted(np.maximum.accumulate(cumulative), 80.0, side="left")
+    return int(min(reached, cumulative.size - 1)) + 1 if cumulative.size else 1
+
+
+def pareto_response(totals: pd.Series, top_n: Optional[int] = None) -> ParetoResponse:
+    labels = totals.index.astype(str).to_numpy(dtype=object)
+    values = totals.to_numpy(dtype=float)
+    if top_n and top_n < values.size:
+        # Partial sort: only the top-N are ordered, the remainder becomes one "Other" bucket
+        top = np.argpartition(-values, top_n - 1)[:top_n]
+        top = top[np.lexsort((top, -values[top]))]
+        total = float(values.sum())
+    else:
+        top = np.argsort(-values, kind="stable")
+        total = float(np.cumsum(values[top])[-1]) if top.size else 0.0
+    shown = values[top]
+    pct = shown / total * 100.0 if total else np.zeros_like(shown)
+    cumulative = np.cumsum(pct)
+    vital = _vital_few(cumulative)
+    if top.size < values.size and (not cumulative.size or np.max(cumulative) < 80.0):
+        ranked = np.sort(values)[::-1]
+        vital = _vital_few(np.cumsum(ranked / total * 100.0 if total else np.zeros_like(ranked)))
+
+    items = [
+        ParetoItem(category=cat, value=val, metadata=ParetoItemMetadata(display_name=display_name_for(cat), percentage=p, cumulative=cum))
+        for cat, val, p, cum in zip(labels[top].tolist(), shown.tolist(), pct.tolist(), cumulative.tolist())
+    ]
+    if top.size < values.size:
+        other = total - float(shown.sum())
+        rest = values.size - top.size
+        items.append(ParetoItem(
+            category=OTHER_CATEGORY,
+            value=other,
+            metadata=ParetoItemMetadata(display_name=f"{OTHER_CATEGORY} ({rest})", percentage=other / total * 100.0 if total else 0.0, cumulative=100.0 if total else 0.0),
+        ))
+    return ParetoResponse(data=items, total=total, vital_few_threshold=vital)
+
+
+def compute_pareto(ds: Dataset, payload: ParetoRequest, src: Optional[FrameSource] = None) -> ParetoResponse:
+    src = src or FrameSource(ds)
+    totals = pareto_totals(src, payload)
+    with timing.span("aggregate"):
+        resp = pareto_response(totals, payload.top_n)
+    if getattr(payload, "by_store", False):
+        by_store = store_totals(src, payload)
+        with timing.span("aggregate"):
+            resp.stores, resp.store_ranking = store_paretos(by_store, payload.top_n)
+    return resp
+
+
+def compute_histogram(ds: Dataset, payload: HistogramRequest, src: Optional[FrameSource] = None) -> HistogramResponse:
+    src = src or FrameSource(ds)
+    columns = src.columns or list(src.raw([payload.column]).columns)
+    if payload.column not in columns:
+        raise HTTPException(status_code=400, detail=f"Column not found: {payload.column}")
+    chunks = histogram.column_chunks(ds, payload.column, settings.ingest_chunk_rows)
+    result = histogram.compute(chunks, bins=payload.bins or 20, strategy=payload.strategy, value_range=payload.range)
+    fits = histogram.fit_distributions(result)
+    fit = HistogramFit(distribution=fits[0]["distribution"], params={**fits[0]["params"], "aic": fits[0]["aic"]}) if fits else HistogramFit()
+    summary = histogram.summary(result)
+    if fits:
+        summary["fits"] = fits
+    return HistogramResponse(bins=result.edges.astype(float).tolist(), counts=result.counts.astype(int).tolist(), fit=fit, summary=summary)
+
+
+def compute_summary(ds: Dataset, payload: SummaryRequest) -> SummaryResponse:
+    with timing.span("load"):
+        sk = sketches.get_sketches(ds)
+    columns = payload.columns or sk.columns
+    for col in columns:
+        if col not in sk.columns:
+            raise HTTPException(status_code=400, detail=f"Numeric column not found: {col}")
+    start, end = _date_bounds(payload.date_range)
+    items = sketches.summarize(sk, columns, store=payload.store, start=start, end=end, quantiles=payload.quantiles)
+    return SummaryResponse(columns=[ColumnSummary(**item) for item in items])
+
+
+PARAMS = {"timeseries": timeseries_params, "pareto": pareto_params, "histogram": histogram_params}
+COMPUTE = {"timeseries": compute_timeseries, "pareto": compute_pareto, "histogram": compute_histogram}
+
+
+def compute_batch(ds: Dataset, specs: Sequence[AnalysisSpec]) -> list[Union[BaseModel, HTTPException]]:
+    src = FrameSource(ds)
+    ts_targets = [t for s in specs if s.type == "timeseries" for t in timeseries_targets(s)]
+    wanted: list[Optional[str]] = []
+    if ts_targets and not src.cube_has(ts_targets):
+        wanted += [src.date_col, src.store_col, *ts_targets]
+    if any(s.type == "pareto" for s in specs) and not src.cube_has([c for c in PRODUCT_COLUMNS if c in src.columns]):
+        wanted += [src.date_col, src.store_col, *PRODUCT_COLUMNS]
+    if wanted:
+        src.raw(wanted)
+
+    results: list[Union[BaseModel, HTTPException, None]] = [None] * len(specs)
+    groups: dict[tuple, list[int]] = {}
+    for i, spec in enumerate(specs):
+        if spec.type == "timeseries" and not spec.target_columns and not spec.split_by_store:
+            groups.setdefault((spec.store, tuple(spec.date_range or ()), spec.aggregation), []).append(i)
+
+    # All target columns sharing a store/date filter and aggregation are summed in one groupby
+    for (store, date_range, aggregation), idxs in groups.items():
+        targets = list(dict.fromkeys(specs[i].target_column for i in idxs))
+        try:
+            df, date_col = timeseries_frame(src, store, list(date_range) or None, targets)
+            grouped = aggregate_timeseries(df, date_col, targets, aggregation)
+        except HTTPException:
+            grouped = None
+        for i in idxs:
+            if grouped is None:
+                results[i] = _guarded(compute_timeseries, ds, specs[i], src)
+                continue
+            results[i] = grouped_response(grouped, [specs[i].target_column], aggregation)
+
+    for i, spec in enumerate(specs):
+        if results[i] is None:
+            results[i] = _guarded(COMPUTE[spec.type], ds, spec, src)
+    return results
+
+
+def _guarded(compute, ds: Dataset, spec, src: FrameSource) -> Union[BaseModel, HTTPException]:
+    try:
+        return compute(ds, spec, src)
+    except HTTPException as e:
+        return e
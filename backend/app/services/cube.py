@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from ..models.dataset import Dataset
+from . import storage
+from .frame_cache import frame_cache
+
+
+# Daily per-store sums of every numeric column: one row per (store, day) cell.
+# Rows whose date does not parse are kept as a NaT cell so unfiltered totals still match the raw data.
+CUBE_STORE = "__store"
+CUBE_DATE = "__date"
+
+
+def cube_path_for(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".cube.parquet"
+
+
+def build_cube(df: pd.DataFrame, date_col: str, store_col: Optional[str]) -> pd.DataFrame:
+    numeric = [c for c in df.columns if c not in (date_col, store_col, storage.PARSED_DATE) and pd.api.types.is_numeric_dtype(df[c])]
+    keys = {CUBE_DATE: storage.parsed_dates(df, date_col).dt.floor("D")}
+    if store_col:
+        # Plain values: a categorical would be saved as a dictionary column whose category order is not sorted
+        keys[CUBE_STORE] = df[store_col].astype(object) if isinstance(df[store_col].dtype, pd.CategoricalDtype) else df[store_col]
+    frame = df[numeric].assign(**keys)
+    return frame.groupby(list(keys)[::-1], dropna=False, sort=True)[numeric].sum().reset_index()
+
+
+def merge_cubes(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    keys = [k for k in (CUBE_STORE, CUBE_DATE) if k in a.columns]
+    return pd.concat([a, b], ignore_index=True).groupby(keys, dropna=False, sort=True).sum().reset_index()
+
+
+def append_cube(ds: Dataset, batches: Iterable[pd.DataFrame], fresh_after: int, dest: str) -> Optional[int]:
+    """Write the saved cube with an appended partition (given as row batches) folded in to ``dest``; only the
+    partition's (store, day) cells change. Returns the mtime of the cube it was derived from, or None when there is
+    no usable cube yet (the next get_cube builds it from every partition)."""
+    date_col, store_col = storage.date_and_store(ds)
+    path = cube_path_for(ds.path)
+    if date_col is None or not os.path.exists(path) or os.stat(path).st_mtime_ns < fresh_after:
+        return None
+    based_on = os.stat(path).st_mtime_ns
+    cube = pd.read_parquet(path)
+    cells = [build_cube(batch, date_col, store_col) for batch in batches]
+    if cells:
+        cube = merge_cubes(cube, pd.concat(cells, ignore_index=True))
+    pq.write_table(storage.to_arrow(cube), dest)
+    return based_on
+
+
+def get_cube(ds: Dataset) -> Optional[pd.DataFrame]:
+    date_col, store_col = storage.date_and_store(ds)
+    if date_col is None:
+        return None
+    sig = storage.signature(ds)
+    path = cube_path_for(ds.path)
+
+    def loader() -> pd.DataFrame:
+        if os.path.exists(path) and os.stat(path).st_mtime_ns >= sig[1]:
+            return pd.read_parquet(path)
+        cube = build_cube(storage.load_frame(ds), date_col, store_col)
+        pq.write_table(storage.to_arrow(cube), path)
+        return cube
+
+    return frame_cache.get_or_load(ds.id, sig, loader, variant="cube")
+
+
+def slice_cube(
+    cube: pd.DataFrame,
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period: Optional[str] = None,
+) -> pd.DataFrame:
+    if store and CUBE_STORE in cube.columns:
+        cube = cube[cube[CUBE_STORE] == store]
+    if start or end or period:
+        cube = cube.dropna(subset=[CUBE_DATE])
+    if start:
+        cube = cube[cube[CUBE_DATE] >= pd.to_datetime(start)]
+    if end:
+        cube = cube[cube[CUBE_DATE] <= pd.to_datetime(end)]
+    if period:
+        try:
+            cube = cube[cube[CUBE_DATE].dt.to_period("M") == pd.Period(period)]
+        except Exception:
+            pass
+    return cube
+
+
+def numeric_columns(cube: pd.DataFrame) -> list[str]:
+    return [c for c in cube.columns if c not in (CUBE_STORE, CUBE_DATE)]
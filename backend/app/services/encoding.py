@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+from fastapi.responses import Response
+
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+TYPED_MEDIA_TYPE = "application/vnd.qstorm.typed+json"
+TIMESERIES_MEDIA_TYPES = (JSON_MEDIA_TYPE, ARROW_MEDIA_TYPE, TYPED_MEDIA_TYPE)
+
+
+def negotiate(accept: Optional[str], offered: tuple[str, ...] = TIMESERIES_MEDIA_TYPES) -> str:
+    for part in (accept or "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in offered:
+            return media
+    return JSON_MEDIA_TYPE
+
+
+def json_response(result_json: str) -> Response:
+    # Cached/just-serialized results are sent as-is instead of being re-validated through the pydantic model
+    return Response(content=result_json, media_type=JSON_MEDIA_TYPE)
+
+
+def _series_label(series: dict) -> str:
+    return series["name"] if series.get("store") is None else f"{series['name']}|{series['store']}"
+
+
+def timeseries_to_arrow(data: dict) -> bytes:
+    days = np.array(data.get("timestamp", []), dtype="datetime64[D]")
+    fields = [pa.field("timestamp", pa.date32())]
+    arrays = [pa.array(days, type=pa.date32())]
+    for series in data.get("series", []):
+        meta = {"name": series["name"], "store": series.get("store") or "", "statistics": json.dumps(series.get("statistics"), ensure_ascii=False)}
+        fields.append(pa.field(_series_label(series), pa.float64(), metadata=meta))
+        arrays.append(pa.array(np.asarray(series.get("values", []), dtype=np.float64)))
+    schema = pa.schema(fields, metadata={"events": json.dumps(data.get("events"), ensure_ascii=False)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+    return sink.getvalue().to_pybytes()
+
+
+def _typed(values, dtype: str) -> dict:
+    arr = np.asarray(values, dtype=dtype)
+    return {"dtype": arr.dtype.str, "length": int(arr.shape[0]), "data": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+
+def timeseries_to_typed(data: dict) -> bytes:
+    days = np.array(data.get("timestamp", []), dtype="datetime64[D]").astype("<i4")
+    out = {
+        "timestamp": {**_typed(days, "<i4"), "unit": "days_since_epoch"},
+        "series": [
+            {"name": s["name"], "store": s.get("store"), "values": _typed(s.get("values", []), "<f8"), "statistics": s.get("statistics")}
+            for s in data.get("series", [])
+        ],
+        "events": data.get("events"),
+    }
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def timeseries_response(result_json: str, media_type: str) -> Response:
+    if media_type == ARROW_MEDIA_TYPE:
+        content = timeseries_to_arrow(json.loads(result_json))
+    elif media_type == TYPED_MEDIA_TYPE:
+        content = timeseries_to_typed(json.loads(result_json))
+    else:
+        content = result_json
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
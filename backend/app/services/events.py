@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..core.config import settings
+from ..schemas.analysis import TimeSeriesEvent
+
+
+# Every detector works on a (series x periods) matrix of contiguous periods, so all stores and metrics of a
+# response are scanned with the same handful of NumPy operations; Python only builds the reported events.
+WINDOWS = {"daily": 28, "weekly": 13, "monthly": 12}
+YEAR_LAGS = {"daily": 364, "weekly": 52, "monthly": 12}
+SPIKE_Z = 3.5
+SHIFT_Z = 3.0
+YOY_Z = 3.5
+# Statistically significant but tiny deviations (very regular series, slow trends) are not reported
+MIN_CHANGE = 0.1
+MAD_SCALE = 1.4826
+
+TYPES = np.array(["spike", "drop", "level_shift", "yoy"], dtype=object)
+SPIKE, DROP, SHIFT, YOY = range(4)
+
+
+def spikes(values: np.ndarray, window: int, start: int = 0) -> tuple[np.ndarray, ...]:
+    """Periods more than ``SPIKE_Z`` standard deviations away from the mean of the ``window`` periods before them."""
+    first = max(start, window)
+    if values.shape[1] <= first:
+        return _empty()
+    trailing = sliding_window_view(values[:, first - window:-1], window, axis=1)
+    mean, std = trailing.mean(axis=2), trailing.std(axis=2)
+    x = values[:, first:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (x - mean) / std, 0.0)
+    s, i = np.nonzero((np.abs(z) >= SPIKE_Z) & _material(x, mean))
+    return s, i + first, np.where(z[s, i] > 0, SPIKE, DROP), x[s, i], mean[s, i], z[s, i]
+
+
+def level_shifts(values: np.ndarray, window: int, start: int = 0) -> tuple[np.ndarray, ...]:
+    """Periods where the mean of the next ``window`` periods differs from the previous ``window`` by ``SHIFT_Z``
+    pooled standard deviations; of adjacent candidates only the strongest within half a window is kept."""
+    n = values.shape[1]
+    if n < 2 * window:
+        return _empty()
+    windows = sliding_window_view(values, window, axis=1)
+    mean, var = windows.mean(axis=2), windows.var(axis=2)
+    before, after = slice(0, n - 2 * window + 1), slice(window, n - window + 1)
+    pooled = np.sqrt((var[:, before] + var[:, after]) / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.where(pooled > 0, (mean[:, after] - mean[:, before]) / pooled, 0.0)
+    strength = np.abs(d)
+    r = max(window // 2, 1)
+    padded = np.pad(strength, ((0, 0), (r, r)), constant_values=-np.inf)
+    peak = strength >= sliding_window_view(padded, 2 * r + 1, axis=1).max(axis=2)
+    t = np.arange(window, n - window + 1)
+    s, i = np.nonzero((strength >= SHIFT_Z) & peak & _material(mean[:, after], mean[:, before]) & (t >= start - window + 1))
+    return s, t[i], np.full(s.size, SHIFT), mean[:, after][s, i], mean[:, before][s, i], d[s, i]
+
+
+def yoy_anomalies(values: np.ndarray, lag: int, start: int = 0) -> tuple[np.ndarray, ...]:
+    """Periods whose growth over the same period a year earlier is a ``YOY_Z`` robust z-score outlier among the
+    series' own year-over-year growth rates (median / MAD, so a few anomalies do not mask each other)."""
+    if values.shape[1] <= lag:
+        return _empty()
+    prev, x = values[:, :-lag], values[:, lag:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(prev != 0, (x - prev) / np.abs(prev), np.nan)
+    valid = ~np.isnan(growth)
+    # Series with fewer than three comparable periods have no meaningful spread
+    enough = valid.sum(axis=1) >= 3
+    median = np.full(len(values), np.nan)
+    median[enough] = np.nanmedian(growth[enough], axis=1)
+    mad = np.full(len(values), np.nan)
+    mad[enough] = np.nanmedian(np.abs(growth[enough] - median[enough, None]), axis=1) * MAD_SCALE
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(valid & (mad[:, None] > 0), (growth - median[:, None]) / mad[:, None], 0.0)
+    expected = prev * (1 + np.nan_to_num(median)[:, None])
+    t = np.arange(lag, values.shape[1])
+    s, i = np.nonzero((np.abs(z) >= YOY_Z) & _material(x, expected) & (t >= start))
+    return s, t[i], np.full(s.size, YOY), x[s, i], expected[s, i], z[s, i]
+
+
+def _material(value: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    return np.abs(value - expected) >= MIN_CHANGE * np.abs(expected)
+
+
+def _empty() -> tuple[np.ndarray, ...]:
+    e = np.array([], dtype=np.int64)
+    f = np.array([], dtype=float)
+    return e, e, e, f, f, f
+
+
+def detect(
+    index: pd.DatetimeIndex,
+    values: np.ndarray,
+    names: Sequence[str],
+    stores: Sequence[Optional[str]],
+    aggregation: str,
+    start: int = 0,
+    limit: Optional[int] = None,
+) -> list[TimeSeriesEvent]:
+    """Events of every series at periods ``>= start`` (level shifts: whose after-window reaches ``start``).
+
+    The strongest ``limit`` events (``TIMESERIES_MAX_EVENTS`` by default) are returned in period order.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float).reshape(len(names), -1))
+    window = WINDOWS[aggregation]
+    found = [spikes(values, window, start), level_shifts(values, window, start), yoy_anomalies(values, YEAR_LAGS[aggregation], start)]
+    series, t, kind, value, expected, score = (np.concatenate(parts) for parts in zip(*found))
+    limit = settings.timeseries_max_events if limit is None else limit
+    if series.size > limit:
+        keep = np.argpartition(-np.abs(score), limit - 1)[:limit]
+        series, t, kind, value, expected, score = (a[keep] for a in (series, t, kind, value, expected, score))
+    order = np.lexsort((kind, series, t))
+    labels = index.strftime("%Y-%m-%d")
+    return [
+        TimeSeriesEvent(type=TYPES[k], timestamp=labels[p], name=names[s], store=stores[s], value=v, expected=e, score=z)
+        for s, p, k, v, e, z in zip(series[order].tolist(), t[order].tolist(), kind[order].tolist(), value[order].tolist(), expected[order].tolist(), score[order].tolist())
+    ]
+
+
+def update(
+    events: Sequence[TimeSeriesEvent],
+    index: pd.DatetimeIndex,
+    values: np.ndarray,
+    names: Sequence[str],
+    stores: Sequence[Optional[str]],
+    aggregation: str,
+    first_new: int,
+) -> list[TimeSeriesEvent]:
+    """Events after periods ``first_new..`` were appended to series whose earlier events are ``events``.
+
+    Only the periods whose windows reach the new data are re-evaluated; events before them are kept as they were
+    (YoY scores use the robust spread of the full history, so they are recomputed for the new periods only).
+    """
+    labels = index.strftime("%Y-%m-%d")
+    if first_new >= len(labels):
+        return list(events)
+    cutoff = labels[first_new]
+    shift_cutoff = labels[max(first_new - WINDOWS[aggregation] + 1, 0)]
+    kept = [e for e in events if e.timestamp < (shift_cutoff if e.type == "level_shift" else cutoff)]
+    fresh = detect(index, values, names, stores, aggregation, start=first_new)
+    # Same order as ``detect``: period, then series, then event type
+    rank = {key: i for i, key in enumerate(zip(names, stores))}
+    kinds = {t: i for i, t in enumerate(TYPES)}
+    return sorted([*kept, *fresh], key=lambda e: (e.timestamp, rank.get((e.name, e.store), -1), kinds[e.type]))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from ..core.config import settings
+from . import timing
+
+
+T = TypeVar("T")
+
+
+class ComputeExecutor:
+    """Dedicated thread pool for the pandas work of async request handlers.
+
+    Cache hits and database lookups stay on the event loop; only the computation is sent here, so a burst of
+    slow analyses queues behind ``COMPUTE_MAX_WORKERS`` threads instead of occupying the default threadpool
+    that the remaining sync endpoints (uploads, exports) run on.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.active = 0
+        self.submitted = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+            return self._executor
+
+    def _call(self, submitted: float, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        timing.record("queue", time.perf_counter() - submitted)
+        with self._lock:
+            self.active += 1
+        try:
+            with timing.span(stage):
+                return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, stage: str = "compute", **kwargs: Any) -> T:
+        pool = self._pool()
+        with self._lock:
+            self.submitted += 1
+        # The copied context carries the request's timing/profile into the worker thread
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, self._call, time.perf_counter(), stage, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"max_workers": self.max_workers, "active": self.active, "submitted": self.submitted}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+compute_executor = ComputeExecutor(settings.compute_max_workers)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+import pandas as pd
+
+from ..core.config import settings
+
+
+def _size(obj: Any) -> int:
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    return int(obj.nbytes)
+
+
+def _view(obj: Any) -> Any:
+    return obj.copy(deep=False) if isinstance(obj, pd.DataFrame) else obj
+
+
+class FrameCache:
+    """Byte-bounded LRU of parsed DataFrames shared by the request threadpool.
+
+    Entries are keyed by ``(dataset_id, signature, variant)``; a new signature for a
+    dataset (file replaced/appended) drops its older entries. Concurrent misses for the
+    same key wait on a single in-flight load instead of parsing the file again.
+    Callers get a shallow copy of DataFrames, so column assignment never leaks into the
+    cache; other cached objects (e.g. sketches) expose ``nbytes`` and are shared read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._inflight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, dataset_id: int, signature: Hashable, loader: Callable[[], Any], variant: Hashable = None) -> Any:
+        key = (dataset_id, signature, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _view(entry[0])
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                self.misses += 1
+                fut = Future()
+                self._inflight[key] = fut
+            else:
+                self.coalesced += 1
+        if not owner:
+            return _view(fut.result())
+
+        try:
+            df = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+        size = _size(df)
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._put(key, df, size)
+        fut.set_result(df)
+        return _view(df)
+
+    def _put(self, key: tuple, df: Any, size: int) -> None:
+        for stale in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+            self._drop(stale)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (df, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: tuple) -> None:
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, dataset_id: int) -> None:
+        """Drop every cached entry of a dataset (e.g. after an append changed its files)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == dataset_id]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def footprint(self) -> dict[int, dict[str, Any]]:
+        """Cached bytes per dataset, with each entry's variant, and per-column dtypes/bytes for DataFrames."""
+        with self._lock:
+            entries = [(k, obj, size) for k, (obj, size) in self._entries.items()]
+        out: dict[int, dict[str, Any]] = {}
+        for (dataset_id, _, variant), obj, size in entries:
+            ds = out.setdefault(dataset_id, {"bytes": 0, "entries": []})
+            ds["bytes"] += size
+            entry: dict[str, Any] = {"variant": repr(variant), "bytes": size}
+            if isinstance(obj, pd.DataFrame):
+                usage = obj.memory_usage(deep=True, index=False)
+                entry["rows"] = len(obj)
+                entry["columns"] = {str(c): {"dtype": str(obj[c].dtype), "bytes": int(usage[c])} for c in obj.columns}
+            ds["entries"].append(entry)
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+
+frame_cache = FrameCache(settings.frame_cache_max_mb * 1024 * 1024)
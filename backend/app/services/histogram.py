@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ..models.dataset import Dataset
+from ..schemas.analysis import MAX_BINS, quantile_key
+from . import storage
+
+
+SAMPLE_SIZE = 100_000
+SUMMARY_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+@dataclass
+class Moments:
+    """Count/mean/M2/min/max that can be updated per chunk and merged (Chan et al.)."""
+
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    @classmethod
+    def of(cls, x: np.ndarray) -> "Moments":
+        if x.size == 0:
+            return cls()
+        mean = float(x.mean())
+        return cls(n=int(x.size), mean=mean, m2=float(((x - mean) ** 2).sum()), min=float(x.min()), max=float(x.max()))
+
+    def merge(self, other: "Moments") -> "Moments":
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            return other
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        return Moments(
+            n=n,
+            mean=self.mean + delta * other.n / n,
+            m2=self.m2 + other.m2 + delta * delta * self.n * other.n / n,
+            min=min(self.min, other.min),
+            max=max(self.max, other.max),
+        )
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.n) if self.n else math.nan
+
+
+@dataclass
+class Sample:
+    """Uniform sample without replacement kept as the k smallest random priorities seen so far."""
+
+    k: int = SAMPLE_SIZE
+    rng: np.random.Generator = field(default_factory=lambda: np.random.default_rng(0))
+    values: np.ndarray = field(default_factory=lambda: np.empty(0))
+    keys: np.ndarray = field(default_factory=lambda: np.empty(0))
+
+    def update(self, x: np.ndarray) -> None:
+        values = np.concatenate([self.values, x])
+        keys = np.concatenate([self.keys, self.rng.random(x.size)])
+        if values.size > self.k:
+            keep = np.argpartition(keys, self.k)[: self.k]
+            values, keys = values[keep], keys[keep]
+        self.values, self.keys = values, keys
+
+
+@dataclass
+class HistogramResult:
+    edges: np.ndarray
+    counts: np.ndarray
+    moments: Moments
+    log_moments: Moments
+    sample: np.ndarray
+    exact_quantiles: bool
+
+
+def column_chunks(ds: Dataset, column: str, batch_rows: int) -> Callable[[], Iterator[np.ndarray]]:
+    def chunks() -> Iterator[np.ndarray]:
+        for frame in storage.iter_frames(ds, [column], batch_rows=batch_rows):
+            values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            yield values[np.isfinite(values)]
+    return chunks
+
+
+def _edges(strategy: str, bins: int, value_range: Optional[Sequence[float]], m: Moments, sample: np.ndarray) -> np.ndarray:
+    if value_range is not None:
+        lo, hi = float(value_range[0]), float(value_range[1])
+    elif m.n:
+        lo, hi = m.min, m.max
+    else:
+        lo, hi = 0.0, 1.0
+    if strategy == "quantile" and sample.size:
+        edges = np.unique(np.quantile(sample, np.linspace(0.0, 1.0, bins + 1)))
+        edges[0], edges[-1] = min(edges[0], lo), max(edges[-1], hi)
+        return edges if edges.size > 1 else np.histogram_bin_edges(np.empty(0), bins=1, range=(lo, hi))
+    if strategy in ("auto", "fd") and m.n > 1 and hi > lo:
+        q75, q25 = np.quantile(sample, [0.75, 0.25])
+        fd = 2.0 * (q75 - q25) * m.n ** (-1.0 / 3.0)
+        sturges = (hi - lo) / (math.log2(m.n) + 1.0)
+        width = fd if fd > 0 else sturges
+        if strategy == "auto":
+            width = min(width, sturges)
+        bins = int(min(MAX_BINS, max(1, math.ceil((hi - lo) / width))))
+    return np.histogram_bin_edges(np.empty(0), bins=bins, range=(lo, hi))
+
+
+def compute(
+    chunks: Callable[[], Iterable[np.ndarray]],
+    bins: int = 20,
+    strategy: str = "fixed",
+    value_range: Optional[Sequence[float]] = None,
+) -> HistogramResult:
+    m, log_m, sample = Moments(), Moments(), Sample()
+    edges = _edges("fixed", bins, value_range, m, sample.values) if strategy == "fixed" and value_range is not None else None
+    counts = np.zeros(len(edges) - 1, dtype=np.int64) if edges is not None else None
+    # Pass 1: moments, log-moments and the quantile sample (and the counts too when the range is fixed upfront)
+    for x in chunks():
+        if not x.size:
+            continue
+        m = m.merge(Moments.of(x))
+        positive = x[x > 0]
+        log_m = log_m.merge(Moments.of(np.log(positive)))
+        sample.update(x)
+        if edges is not None:
+            counts += np.histogram(x, bins=edges)[0]
+    if edges is None:
+        edges = _edges(strategy, bins, value_range, m, sample.values)
+        counts = np.zeros(len(edges) - 1, dtype=np.int64)
+        for x in chunks():
+            if x.size:
+                counts += np.histogram(x, bins=edges)[0]
+    return HistogramResult(edges=edges, counts=counts, moments=m, log_moments=log_m, sample=sample.values, exact_quantiles=m.n <= sample.k)
+
+
+def fit_distributions(result: HistogramResult) -> list[dict]:
+    """Maximum-likelihood fits from the sufficient statistics gathered in pass 1, best AIC first."""
+    m, log_m = result.moments, result.log_moments
+    fits: list[dict] = []
+    if m.n > 1 and m.std > 0:
+        ll = -0.5 * m.n * (math.log(2 * math.pi * m.std ** 2) + 1)
+        fits.append({"distribution": "normal", "params": {"mu": m.mean, "sigma": m.std}, "log_likelihood": ll})
+    # Lognormal and gamma only apply when every value is positive
+    if log_m.n == m.n and m.n > 1 and log_m.std > 0:
+        sum_log = log_m.mean * log_m.n
+        ll = -0.5 * m.n * (math.log(2 * math.pi * log_m.std ** 2) + 1) - sum_log
+        fits.append({"distribution": "lognormal", "params": {"mu": log_m.mean, "sigma": log_m.std}, "log_likelihood": ll})
+        s = math.log(m.mean) - log_m.mean
+        if s > 0:
+            shape = (3 - s + math.sqrt((s - 3) ** 2 + 24 * s)) / (12 * s)
+            scale = m.mean / shape
+            ll = (shape - 1) * sum_log - m.n * m.mean / scale - m.n * shape * math.log(scale) - m.n * math.lgamma(shape)
+            fits.append({"distribution": "gamma", "params": {"shape": shape, "scale": scale}, "log_likelihood": ll})
+    for f in fits:
+        f["aic"] = 2 * len(f["params"]) - 2 * f["log_likelihood"]
+    return sorted(fits, key=lambda f: f["aic"])
+
+
+def summary(result: HistogramResult) -> dict:
+    m = result.moments
+    out: dict = {"count": m.n}
+    if m.n:
+        qs = np.quantile(result.sample, SUMMARY_QUANTILES)
+        out.update({
+            "mean": m.mean,
+            "std": m.std,
+            "min": m.min,
+            "max": m.max,
+            "quantiles": {quantile_key(q): float(v) for q, v in zip(SUMMARY_QUANTILES, qs)},
+            "quantiles_exact": result.exact_quantiles,
+        })
+    return out
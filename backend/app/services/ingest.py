@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from pandas.tseries.api import guess_datetime_format
+
+from ..core.config import settings
+from ..models.dataset import Dataset
+from ..utils.dataframe import DATE_FORMATS, detect_date_and_store
+from . import cube
+from . import partitioned
+from . import sketches
+from . import storage
+
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+PREVIEW_ROWS = 5
+# Small row groups in the date-sort runs let each merge window read little more than its own rows
+RUN_ROW_GROUP_ROWS = 8192
+
+_ARROW_TYPES = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "str": pa.string()}
+_PANDAS_TYPES = {"int": "int64", "float": "float64", "bool": "bool", "str": str}
+
+_append_locks: dict[int, threading.Lock] = {}
+_append_locks_guard = threading.Lock()
+
+
+def spool(src: BinaryIO, dest_path: str) -> int:
+    with open(dest_path, "wb") as out:
+        shutil.copyfileobj(src, out, SPOOL_CHUNK_BYTES)
+        return out.tell()
+
+
+def sheet_path_for(source_path: str, index: int) -> str:
+    return f"{os.path.splitext(source_path)[0]}.sheet-{index}.parquet"
+
+
+def discard(path: str) -> None:
+    for p in (path, storage.columnar_path_for(path), sketches.sketch_path_for(path), *glob.glob(glob.escape(os.path.splitext(path)[0]) + ".sheet-*.parquet")):
+        if os.path.exists(p):
+            os.remove(p)
+    shutil.rmtree(partitioned.layout_path_for(path), ignore_errors=True)
+
+
+def _kind(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(dtype):
+        return "float"
+    return "str"
+
+
+def _resolve(kinds: set[str]) -> str:
+    if kinds <= {"int"}:
+        return "int"
+    if kinds <= {"int", "float"}:
+        return "float"
+    if kinds <= {"bool"}:
+        return "bool"
+    return "str"
+
+
+def _summary(rows: int, columns: list[str], preview: pd.DataFrame, columnar: dict) -> dict[str, Any]:
+    return {"rows": rows, "columns": columns, "preview": preview.astype(object).where(preview.notna(), None).to_dict(orient="records"), "columnar": columnar}
+
+
+def _ingest_csv(path: str) -> dict[str, Any]:
+    chunk_rows = settings.ingest_chunk_rows
+    rows = 0
+    columns: list[str] = []
+    preview = pd.DataFrame()
+    kinds: dict[str, set[str]] = {}
+    # Pass 1: row count, columns, preview and a dtype that is valid for every chunk
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        if not columns:
+            columns = list(map(str, chunk.columns))
+            preview = chunk.head(PREVIEW_ROWS)
+        rows += len(chunk)
+        for col, dtype in zip(columns, chunk.dtypes):
+            kinds.setdefault(col, set()).add(_kind(dtype))
+
+    resolved = {col: _resolve(kinds.get(col, {"float"})) for col in columns}
+    schema = pa.schema([(col, _ARROW_TYPES[resolved[col]]) for col in columns])
+    columnar_path = storage.columnar_path_for(path)
+    # Pass 2: typed rewrite to Parquet, one row group per chunk
+    with pq.ParquetWriter(columnar_path, schema) as writer:
+        if rows:
+            dtypes = {col: _PANDAS_TYPES[kind] for col, kind in resolved.items()}
+            for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes):
+                chunk.columns = columns
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    columnar = {"path": columnar_path, "format": "parquet", "schema": {f.name: str(f.type) for f in schema}}
+    return _summary(rows, columns, preview, columnar)
+
+
+def _ingest_excel(path: str, sheet_name: Optional[str]) -> dict[str, Any]:
+    df = pd.read_excel(path, sheet_name=sheet_name or 0)
+    columnar = storage.write_columnar(df, path)
+    return _summary(int(len(df)), list(map(str, df.columns.tolist())), df.head(PREVIEW_ROWS), columnar)
+
+
+def parse_dates(values: pd.Series) -> tuple[pd.Series, Optional[str]]:
+    """``pd.to_datetime(values, errors="coerce")`` with the format inferred from the first value made explicit.
+
+    Formats pandas cannot infer (e.g. ``2024年1月5日``) are matched against ``DATE_FORMATS``.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, "datetime"
+    first = values.dropna().iloc[0] if values.notna().any() else None
+    if not isinstance(first, str):
+        return pd.to_datetime(values, errors="coerce"), None
+    fmt = guess_datetime_format(first) or next((f for f in DATE_FORMATS if _matches(first, f)), None)
+    return pd.to_datetime(values, format=fmt or "mixed", errors="coerce"), fmt
+
+
+def _matches(value: str, fmt: str) -> bool:
+    try:
+        datetime.strptime(value.strip(), fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def _numeric_dtypes(schema: pa.Schema) -> dict[str, str]:
+    return {f.name: str(f.type) for f in schema if f.name != storage.PARSED_DATE and (pa.types.is_integer(f.type) or pa.types.is_floating(f.type))}
+
+
+def _dated_runs(pf: pq.ParquetFile, date_col: str, runs_dir: str, stats: dict[str, Any]) -> tuple[list[str], dict[int, int], Optional[str]]:
+    """Pass 1 of the date sort: each row group with its parsed dates, sorted (stable, unparseable dates last) into
+    its own run file. Returns the runs, the row count per day and the date format; ``stats`` also gets the date range."""
+    runs: list[str] = []
+    days: dict[int, int] = {}
+    fmt: Optional[str] = None
+    batches = pf.iter_batches(batch_size=settings.ingest_chunk_rows)
+    for i, table in enumerate(pa.Table.from_batches([b]) for b in batches):
+        _collect(table, stats)
+        values = table.column(date_col).to_pandas()
+        if i and fmt and fmt != "datetime":
+            dates = pd.to_datetime(values, format=fmt, errors="coerce")
+        else:
+            dates, found = parse_dates(values)
+            fmt = fmt if i else found
+        dated = dates.dropna()
+        if len(dated):
+            low, high = stats.get("date_range") or (dated.min(), dated.max())
+            stats["date_range"] = (min(low, dated.min()), max(high, dated.max()))
+        day, count = np.unique(dated.to_numpy(dtype="datetime64[D]").astype(np.int64), return_counts=True)
+        for d, c in zip(day.tolist(), count.tolist()):
+            days[d] = days.get(d, 0) + c
+        table = table.append_column(storage.PARSED_DATE, pa.Array.from_pandas(dates)).sort_by([(storage.PARSED_DATE, "ascending")], null_placement="at_end")
+        runs.append(os.path.join(runs_dir, f"run-{i:05d}.parquet"))
+        pq.write_table(table, runs[-1], row_group_size=RUN_ROW_GROUP_ROWS)
+    if not runs:
+        runs.append(os.path.join(runs_dir, "run-00000.parquet"))
+        empty = pf.schema_arrow.empty_table()
+        pq.write_table(empty.append_column(storage.PARSED_DATE, pa.array([], pa.timestamp("ns"))), runs[-1])
+    return runs, days, fmt
+
+
+def _merge_runs(runs: list[str], days: dict[int, int], dest: str) -> None:
+    """Pass 2: rewrite the runs in date order, one window of whole days (about a chunk of rows) at a time.
+
+    The runs are sorted, so their row-group statistics limit each window to the row groups it overlaps; scanning
+    the runs in order and sorting stably keeps rows of the same date in file order.
+    """
+    data = pads.dataset(runs, format="parquet")
+    key = pc.field(storage.PARSED_DATE)
+    bounds, rows = [], 0
+    ordered = sorted(days)
+    for i, d in enumerate(ordered):
+        rows += days[d]
+        if rows >= settings.ingest_chunk_rows or i == len(ordered) - 1:
+            bounds.append(d + 1)
+            rows = 0
+    lo = ordered[0] if ordered else 0
+    windows = []
+    unit = data.schema.field(storage.PARSED_DATE).type
+    for hi in bounds:
+        start, end = (pa.scalar(np.datetime64(v, "D").astype("datetime64[ns]")).cast(unit) for v in (lo, hi))
+        windows.append((key >= start) & (key < end))
+        lo = hi
+    windows.append(key.is_null())
+    with pq.ParquetWriter(dest, data.schema) as writer:
+        for flt in windows:
+            table = data.to_table(filter=flt, use_threads=False)
+            if table.num_rows:
+                writer.write_table(table.sort_by([(storage.PARSED_DATE, "ascending")]), row_group_size=settings.ingest_chunk_rows)
+
+
+def _collect(table: pa.Table, stats: dict[str, Any]) -> None:
+    stats["rows"] += table.num_rows
+    for name in table.schema.names:
+        stats["nulls"][name] = stats["nulls"].get(name, 0) + table.column(name).null_count
+    if stats["store_column"]:
+        stats["stores"].update(map(str, table.column(stats["store_column"]).drop_null().unique().to_pylist()))
+
+
+def profile_columnar(path: str) -> dict[str, Any]:
+    """Rewrite a fresh Parquet copy sorted by date (stable, unparseable dates last) with the parsed dates added as
+    ``storage.PARSED_DATE``, and return its profile, which requests use instead of detecting and parsing again.
+
+    The sort is external (sorted runs per row group, merged by date window), so memory stays bounded by the chunk size.
+    """
+    pf = pq.ParquetFile(path)
+    date_col, store_col = detect_date_and_store(pf.schema_arrow.names)
+    profile: dict[str, Any] = {"date_column": date_col, "store_column": store_col, "date_format": None, "date_range": None, "sorted": False}
+    stats: dict[str, Any] = {"rows": 0, "nulls": {}, "stores": set(), "store_column": store_col}
+    schema = pf.schema_arrow
+    if date_col:
+        runs_dir = f"{os.path.splitext(path)[0]}.runs"
+        tmp = f"{path}.sorted"
+        os.makedirs(runs_dir, exist_ok=True)
+        try:
+            runs, days, profile["date_format"] = _dated_runs(pf, date_col, runs_dir, stats)
+            _merge_runs(runs, days, tmp)
+            os.replace(tmp, path)
+        finally:
+            shutil.rmtree(runs_dir, ignore_errors=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        schema = pq.read_schema(path)
+        if stats.get("date_range"):
+            profile["date_range"] = [d.strftime("%Y-%m-%d") for d in stats["date_range"]]
+        profile["sorted"] = True
+    else:
+        for batch in pf.iter_batches(batch_size=settings.ingest_chunk_rows):
+            _collect(pa.Table.from_batches([batch]), stats)
+    return {
+        **profile,
+        "rows": stats["rows"],
+        "stores": sorted(stats["stores"]) if store_col else None,
+        "dtypes": _numeric_dtypes(schema),
+        "nulls": {name: stats["nulls"].get(name, 0) for name in schema.names if name != storage.PARSED_DATE},
+    }
+
+
+def merge_profiles(a: dict[str, Any], b: dict[str, Any], schema: pa.Schema) -> dict[str, Any]:
+    """Profile of ``a``'s rows followed by ``b``'s; still sorted only if ``b`` starts on a later day than ``a`` ends."""
+    ranges = [r for r in (a["date_range"], b["date_range"]) if r]
+    stores = None if a["stores"] is None else sorted(set(a["stores"]) | set(b["stores"] or []))
+    return {
+        **a,
+        "date_format": a["date_format"] if a["date_format"] == b["date_format"] else None,
+        "date_range": [min(r[0] for r in ranges), max(r[1] for r in ranges)] if ranges else None,
+        "sorted": a["sorted"] and b["sorted"] and (not a["date_range"] or not b["date_range"] or a["date_range"][1] < b["date_range"][0]),
+        "rows": a["rows"] + b["rows"],
+        "stores": stores,
+        "dtypes": _numeric_dtypes(schema),
+        "nulls": {c: a["nulls"].get(c, 0) + b["nulls"].get(c, 0) for c in a["nulls"]},
+    }
+
+
+def _extent(profile: dict[str, Any]) -> dict[str, Any]:
+    """What a partition touches: its rows, date span and stores (used to invalidate cached results)."""
+    return {"rows": profile["rows"], "date_range": profile["date_range"], "stores": profile["stores"]}
+
+
+def ingest_file(path: str, sheet_name: Optional[str] = None, layout: bool = True) -> dict[str, Any]:
+    summary = _ingest_csv(path) if path.lower().endswith(".csv") else _ingest_excel(path, sheet_name)
+    summary["profile"] = profile_columnar(summary["columnar"]["path"])
+    summary["sketches"] = sketches.write_for_columnar([summary["columnar"]["path"]], path)
+    if layout:
+        summary["layout"] = partitioned.write_for_columnar([summary["columnar"]["path"]], path)
+    return summary
+
+
+def workbook_sheets(path: str) -> list[str]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _read_sheet(path: str, sheet: str, dest: str) -> dict[str, Any]:
+    # Runs in a worker process: pandas' openpyxl engine opens the workbook read-only and streams the one sheet
+    df = pd.read_excel(path, sheet_name=sheet, engine="openpyxl")
+    columnar = storage.write_columnar(df, path, dest)
+    summary = _summary(int(len(df)), list(map(str, df.columns.tolist())), df.head(PREVIEW_ROWS), columnar)
+    return {"sheet": sheet, **summary, "profile": profile_columnar(dest)}
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _workers() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process holds threads (compute pool, write-behind) that fork would copy mid-flight
+            _pool = ProcessPoolExecutor(max_workers=settings.ingest_max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def ingest_workbook(path: str, sheets: Optional[Sequence[str]] = None) -> dict[str, Any]:
+    """Parse the selected sheets (default: all) in parallel, one Parquet file per sheet.
+
+    The first sheet becomes the dataset's base file and the others its partitions, so requests read Parquet only.
+    """
+    available = workbook_sheets(path)
+    sheets = list(dict.fromkeys(sheets)) if sheets else available
+    missing = [s for s in sheets if s not in available]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Sheets not found in workbook: {', '.join(missing)}")
+    jobs = [(path, sheet, sheet_path_for(path, i)) for i, sheet in enumerate(sheets)]
+    if len(jobs) == 1:
+        parsed = [_read_sheet(*jobs[0])]
+    else:
+        parsed = list(_workers().map(_read_sheet, *zip(*jobs)))
+
+    first = parsed[0]
+    for part in parsed[1:]:
+        if set(part["columns"]) != set(first["columns"]):
+            raise HTTPException(status_code=400, detail=f"Sheet '{part['sheet']}' columns do not match sheet '{first['sheet']}'")
+    paths = [p["columnar"]["path"] for p in parsed]
+    try:
+        unified = pa.unify_schemas([pq.read_schema(p) for p in paths], promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        raise HTTPException(status_code=400, detail="Sheet column types do not match")
+
+    columnar = {**first["columnar"], "schema": {c: str(unified.field(c).type) for c in first["columns"]}}
+    profile = first["profile"]
+    for part in parsed[1:]:
+        profile = merge_profiles(profile, part["profile"], unified)
+    return {
+        "rows": sum(p["rows"] for p in parsed),
+        "columns": first["columns"],
+        "preview": first["preview"],
+        "columnar": columnar,
+        "profile": profile,
+        "sheets": [{"name": p["sheet"], **_extent(p["profile"])} for p in parsed],
+        "partitions": [{"path": path, "sheet": p["sheet"], "columnar": p["columnar"], **_extent(p["profile"])} for p in parsed[1:]],
+        "sketches": sketches.write_for_columnar(paths, path),
+        "layout": partitioned.write_for_columnar(paths, path),
+    }
+
+
+def append_lock(dataset_id: int) -> threading.Lock:
+    """The lock that serializes appends to one dataset (ingest, derived files and the meta commit)."""
+    with _append_locks_guard:
+        return _append_locks.setdefault(dataset_id, threading.Lock())
+
+
+def _publish(tmp: str, dest: str, based_on: Optional[int]) -> None:
+    # A derived file rewritten since it was staged was rebuilt from the committed partitions and is kept
+    try:
+        if based_on is not None and os.path.exists(dest) and os.stat(dest).st_mtime_ns == based_on:
+            os.replace(tmp, dest)
+    except OSError:
+        pass  # left stale; rebuilt on next use
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def append_partition(
+    ds: Dataset,
+    path: str,
+    commit: Callable[[dict[str, Any], dict[str, Any]], Any],
+    sheet_name: Optional[str] = None,
+) -> tuple[dict[str, Any], dict[str, Any], Any]:
+    """Ingest ``path`` as a new partition of ``ds`` and fold it into the derived cube, sketches and store/month layout.
+
+    The derived files are written next to the originals and swapped in only after ``commit(meta, profile)`` has
+    stored the new meta, so a failed append leaves them describing the committed partitions. Callers hold
+    ``append_lock(ds.id)`` with ``ds`` freshly loaded. Returns the new meta, the partition's ingest summary and
+    whatever ``commit`` returned.
+    """
+    meta = storage.dataset_meta(ds)
+    # The partition's rows are added to the dataset's store/month layout below instead of a layout of their own
+    summary = ingest_file(path, sheet_name, layout=False)
+    if set(summary["columns"]) != set(meta.get("columns") or storage.dataset_columns(ds)):
+        raise HTTPException(status_code=400, detail="Appended file columns do not match the dataset")
+    if not meta.get("columnar"):
+        meta["columnar"] = storage.write_columnar(pd.concat(list(storage.iter_frames(ds)), ignore_index=True), ds.path)
+        ds.meta_json = json.dumps(meta, ensure_ascii=False)
+    part_path = summary["columnar"]["path"]
+    try:
+        unified = pa.unify_schemas([pq.read_schema(meta["columnar"]["path"]), pq.read_schema(part_path)], promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        raise HTTPException(status_code=400, detail="Appended file column types do not match the dataset")
+
+    fresh_after = storage.signature(ds)[1]
+    token = uuid.uuid4().hex
+    files = [(f"{dest}.{token}.tmp", dest) for dest in (cube.cube_path_for(ds.path), sketches.sketch_path_for(ds.path))]
+    staging = f"{partitioned.layout_path_for(ds.path)}.stage-{token}"
+    try:
+        batches = pq.ParquetFile(part_path).iter_batches(batch_size=settings.ingest_chunk_rows)
+        based_on = [
+            cube.append_cube(ds, (batch.to_pandas() for batch in batches), fresh_after, files[0][0]),
+            sketches.append_sketches(ds, summary.pop("sketches")["path"], fresh_after, files[1][0]),
+        ]
+        layout_based_on = partitioned.stage_append(ds, part_path, f"a{len(meta.get('partitions', [])) + 1}", fresh_after, staging)
+        profile = _extent(summary["profile"])
+        meta["columnar"]["schema"] = {f.name: str(f.type) for f in pa.schema([unified.field(c) for c in meta["columns"]])}
+        if meta.get("profile"):
+            meta["profile"] = merge_profiles(meta["profile"], summary["profile"], unified)
+        meta.setdefault("partitions", []).append({"path": path, "columnar": summary["columnar"], **profile})
+        committed = commit(meta, profile)
+    except BaseException:
+        for tmp, _ in files:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    for (tmp, dest), based in zip(files, based_on):
+        _publish(tmp, dest, based)
+    if layout_based_on is not None:
+        partitioned.publish_append(ds, staging, layout_based_on)
+    return meta, summary, committed
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import functools
+import operator
+import os
+import shutil
+import threading
+import uuid
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+from ..models.dataset import Dataset
+from ..utils.dataframe import detect_date_and_store
+from . import storage
+from .frame_cache import frame_cache
+
+
+# Hive layout <stem>.parts/__store=<store>/*.parquet holding the raw rows plus __month, a typed __date and the
+# original row number __row. Rows are written in date order, so each store's files are split into row groups
+# that cover contiguous months. Filtered reads prune store directories by path and row groups by the
+# __month/__date statistics; rows come back in file order so results match a full-scan filter.
+PART_STORE = "__store"
+PART_MONTH = "__month"
+PART_DATE = "__date"
+PART_ROW = "__row"
+_MARKER = "_COMPLETE"
+_KEYS = pa.schema([(PART_STORE, pa.string())])
+_PARTITIONING = pads.partitioning(_KEYS, flavor="hive")
+MAX_PARTITIONS = 1 << 20
+ROW_GROUP_ROWS = 8192
+
+_build_lock = threading.Lock()
+_datasets: dict[str, tuple[int, pads.Dataset]] = {}
+
+
+def layout_path_for(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".parts"
+
+
+def _with_keys(batch: pa.RecordBatch, date_col: Optional[str], store_col: Optional[str], first_row: int) -> pa.RecordBatch:
+    n = batch.num_rows
+    if date_col and storage.PARSED_DATE in batch.schema.names:
+        dates = batch.column(storage.PARSED_DATE).to_pandas()
+    elif date_col:
+        dates = pd.to_datetime(batch.column(date_col).to_pandas(), errors="coerce")
+    else:
+        dates = pd.Series(pd.NaT, index=range(n), dtype="datetime64[ns]")
+    stores = batch.column(store_col).to_pandas() if store_col else pd.Series([None] * n, dtype=object)
+    arrays = [
+        *batch.columns,
+        pa.array(np.where(stores.notna(), stores.astype(str), None), type=pa.string()),
+        pa.array(dates.dt.strftime("%Y-%m"), type=pa.string(), from_pandas=True),
+        pa.array(dates.dt.floor("D"), from_pandas=True).cast(pa.date32()),
+        pa.array(np.arange(first_row, first_row + n), type=pa.int64()),
+    ]
+    names = [*batch.schema.names, PART_STORE, PART_MONTH, PART_DATE, PART_ROW]
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _write(sources: Sequence[str], dest: str, date_col: Optional[str], store_col: Optional[str], tag: str, first_row: int) -> None:
+    schema = pa.unify_schemas([pq.read_schema(p) for p in sources], promote_options="permissive")
+    out_schema = schema.append(pa.field(PART_STORE, pa.string())).append(pa.field(PART_MONTH, pa.string()))
+    out_schema = out_schema.append(pa.field(PART_DATE, pa.date32())).append(pa.field(PART_ROW, pa.int64()))
+    order = [(PART_STORE, "ascending"), (PART_DATE, "ascending"), (PART_ROW, "ascending")]
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        row = first_row
+        for path in sources:
+            for batch in pq.ParquetFile(path).iter_batches():
+                keyed = _with_keys(batch, date_col, store_col, row)
+                row += batch.num_rows
+                table = pa.Table.from_batches([keyed]).select(out_schema.names).cast(out_schema)
+                yield from table.sort_by(order).to_batches()
+
+    pads.write_dataset(
+        batches(), dest, schema=out_schema, format="parquet", partitioning=_PARTITIONING,
+        basename_template=f"{tag}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore",
+        max_partitions=MAX_PARTITIONS, max_rows_per_group=ROW_GROUP_ROWS, min_rows_per_group=ROW_GROUP_ROWS // 8,
+    )
+
+
+def _keys_for(ds: Dataset) -> tuple[Optional[str], Optional[str]]:
+    return storage.date_and_store(ds)
+
+
+def _fresh(dest: str, after: int) -> bool:
+    marker = os.path.join(dest, _MARKER)
+    return os.path.exists(marker) and os.stat(marker).st_mtime_ns >= after
+
+
+def write_for_columnar(columnar_paths: Sequence[str], source_path: str) -> Optional[dict]:
+    """Lay out freshly ingested Parquet copies (rows in the given order) by store and month."""
+    date_col, store_col = detect_date_and_store(pq.read_schema(columnar_paths[0]).names)
+    if not (date_col or store_col):
+        return None
+    dest = layout_path_for(source_path)
+    _write(columnar_paths, dest, date_col, store_col, "p0", 0)
+    open(os.path.join(dest, _MARKER), "w").close()
+    return {"path": dest, "partitioning": [PART_STORE], "row_groups": [PART_MONTH, PART_DATE]}
+
+
+def ensure(ds: Dataset) -> Optional[str]:
+    """Path of the dataset's layout, (re)built from its Parquet copies when missing or stale."""
+    sources = storage.source_paths(ds)
+    date_col, store_col = _keys_for(ds)
+    if sources[0] == ds.path or not (date_col or store_col):
+        return None
+    dest = layout_path_for(ds.path)
+    sig = storage.signature(ds)
+    if _fresh(dest, sig[1]):
+        return dest
+    with _build_lock:
+        if not _fresh(dest, sig[1]):
+            tmp = f"{dest}.tmp-{uuid.uuid4().hex}"
+            _write(sources, tmp, date_col, store_col, "p0", 0)
+            open(os.path.join(tmp, _MARKER), "w").close()
+            shutil.rmtree(dest, ignore_errors=True)
+            os.replace(tmp, dest)
+    return dest
+
+
+def stage_append(ds: Dataset, part_path: str, tag: str, fresh_after: int, staging: str) -> Optional[int]:
+    """Lay out an appended partition's rows in ``staging`` for ``publish_append``.
+
+    Returns the mtime of the layout's marker they extend, or None when the layout is stale (it is then rebuilt on
+    next use with every partition).
+    """
+    dest = layout_path_for(ds.path)
+    date_col, store_col = _keys_for(ds)
+    if not _fresh(dest, fresh_after):
+        return None
+    based_on = os.stat(os.path.join(dest, _MARKER)).st_mtime_ns
+    first_row = sum(pq.ParquetFile(p).metadata.num_rows for p in storage.source_paths(ds))
+    _write([part_path], staging, date_col, store_col, tag, first_row)
+    return based_on
+
+
+def publish_append(ds: Dataset, staging: str, based_on: int) -> None:
+    """Move staged partition files into the layout, unless it was rebuilt (with the partition) since staging."""
+    dest = layout_path_for(ds.path)
+    marker = os.path.join(dest, _MARKER)
+    try:
+        with _build_lock:
+            if os.path.exists(marker) and os.stat(marker).st_mtime_ns == based_on:
+                for root, _, files in os.walk(staging):
+                    target = os.path.join(dest, os.path.relpath(root, staging))
+                    os.makedirs(target, exist_ok=True)
+                    for name in files:
+                        os.replace(os.path.join(root, name), os.path.join(target, name))
+                os.utime(marker)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _open(ds: Dataset, dest: str) -> pads.Dataset:
+    mtime = os.stat(os.path.join(dest, _MARKER)).st_mtime_ns
+    cached = _datasets.get(dest)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    schema = pa.unify_schemas([pq.read_schema(p) for p in storage.source_paths(ds)], promote_options="permissive")
+    schema = pa.unify_schemas([schema, pa.schema([(PART_MONTH, pa.string()), (PART_DATE, pa.date32()), (PART_ROW, pa.int64())]), _KEYS])
+    # Partition directories start with "__", so only dotfiles and the marker are ignored during discovery
+    dataset = pads.dataset(dest, format="parquet", partitioning=_PARTITIONING, schema=schema, ignore_prefixes=[".", _MARKER])
+    _datasets[dest] = (mtime, dataset)
+    return dataset
+
+
+def pushdown_filter(
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period: Optional[str] = None,
+) -> Optional[pc.Expression]:
+    """Partition/row-group predicate that selects a superset (at day granularity) of the matching rows."""
+    parts = []
+    if store:
+        parts.append(pc.field(PART_STORE) == store)
+    if start:
+        ts = pd.to_datetime(start)
+        parts += [pc.field(PART_MONTH) >= ts.strftime("%Y-%m"), pc.field(PART_DATE) >= pa.scalar(ts.date(), pa.date32())]
+    if end:
+        ts = pd.to_datetime(end)
+        parts += [pc.field(PART_MONTH) <= ts.strftime("%Y-%m"), pc.field(PART_DATE) <= pa.scalar(ts.date(), pa.date32())]
+    if period:
+        try:
+            month = pd.Period(period)
+            if month.freqstr.startswith("M"):
+                parts.append(pc.field(PART_MONTH) == month.strftime("%Y-%m"))
+        except Exception:
+            pass
+    return functools.reduce(operator.and_, parts) if parts else None
+
+
+def read(
+    ds: Dataset,
+    columns: Optional[Sequence[str]] = None,
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period: Optional[str] = None,
+) -> Optional[pd.DataFrame]:
+    """Rows that can match the filters, read from the relevant partitions only; None when nothing can be pushed down."""
+    date_col, store_col = _keys_for(ds)
+    flt = pushdown_filter(store if store_col else None, start if date_col else None, end if date_col else None, period if date_col else None)
+    if flt is None:
+        return None
+    dest = ensure(ds)
+    if dest is None:
+        return None
+    names = storage.stored_columns(ds)
+    cols = [c for c in dict.fromkeys(columns) if c in names] if columns is not None else names
+
+    def loader() -> pd.DataFrame:
+        table = _open(ds, dest).to_table(columns=[*cols, PART_ROW], filter=flt)
+        df = table.to_pandas()
+        df = df.sort_values(PART_ROW, kind="stable").drop(columns=PART_ROW).reset_index(drop=True)
+        return storage.compact(df, date_col)
+
+    return frame_cache.get_or_load(ds.id, storage.signature(ds), loader, variant=("slice", tuple(cols), store, start, end, period))
+
+
+def scan(
+    ds: Dataset,
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    batch_rows: int = 100_000,
+) -> Optional[Iterator[pd.DataFrame]]:
+    """Stream the partitions that can match, batch by batch (grouped by store rather than in file order).
+
+    Batches carry ``storage.PARSED_DATE`` for profiled datasets.
+    """
+    date_col, store_col = _keys_for(ds)
+    flt = pushdown_filter(store if store_col else None, start if date_col else None, end if date_col else None)
+    dest = ensure(ds) if flt is not None else None
+    if dest is None:
+        return None
+    names = storage.stored_columns(ds)
+    return (b.to_pandas() for b in _open(ds, dest).to_batches(columns=names, filter=flt, batch_size=batch_rows))
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from ..core.config import settings
+
+
+class Profile:
+    """Stack samples of the threads working on one request, kept as collapsed stacks (``a;b;c count``)."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.started = time.time()
+        self.duration = 0.0
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._threads: Counter[int] = Counter()
+        self._lock = threading.Lock()
+
+    def attach(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def detach(self) -> None:
+        with self._lock:
+            tid = threading.get_ident()
+            self._threads[tid] -= 1
+            if self._threads[tid] <= 0:
+                del self._threads[tid]
+
+    def threads(self) -> list[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {"id": self.id, "started": self.started, "duration_s": round(self.duration, 3), "samples": self.samples, "stacks": len(self.stacks)}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    """Opt-in sampling profiler: one daemon thread samples the attached threads of every active profile."""
+
+    def __init__(self, interval: float, keep: int):
+        self.interval = interval
+        self.keep = keep
+        self._active: dict[str, Profile] = {}
+        self._done: OrderedDict[str, Profile] = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> Optional[Profile]:
+        if not settings.profiling_enabled:
+            return None
+        profile = Profile()
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def stop(self, profile: Profile) -> None:
+        profile.duration = time.time() - profile.started
+        with self._lock:
+            self._active.pop(profile.id, None)
+            self._done[profile.id] = profile
+            while len(self._done) > self.keep:
+                self._done.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._done.get(profile_id) or self._active.get(profile_id)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._done.values())]
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            for profile in active:
+                for tid in profile.threads():
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        profile.stacks[_stack(frame)] += 1
+                        profile.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+
+sampler = Sampler(settings.profile_interval_ms / 1000, settings.profile_keep)
+
+
+def start() -> Optional[Profile]:
+    return sampler.start()
+
+
+def stop(profile: Profile) -> None:
+    sampler.stop(profile)
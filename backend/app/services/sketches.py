@@ -0,0 +1,529 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..core.config import settings
+from ..models.dataset import Dataset
+from ..schemas.analysis import quantile_key
+from ..utils.dataframe import detect_date_and_store
+from . import storage
+from .frame_cache import frame_cache
+
+
+# Mergeable column sketches at two resolutions: exact moments (count/mean/M2/min/max) per (store, day, column),
+# and per (store, month, column) a t-digest style centroid list plus a sparse fixed-resolution histogram over
+# the column's global range. A store/date slice merges the matching day moments exactly and the overlapping
+# month distributions weighted by the share of their rows inside the slice.
+HIST_BINS = 128
+DIGEST_DELTA = 100
+# Compression of the stored month cells (at most CELL_DELTA + 1 centroids each); slices merge them at DIGEST_DELTA
+CELL_DELTA = 32
+SUMMARY_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+FORMAT = 2
+_META_KEY = b"qstorm.sketch"
+
+
+@dataclass
+class DayMoments:
+    """One row per (store, day) cell, one column per sketched column; cells without values have ``n == 0``."""
+
+    stores: np.ndarray  # object, None when the dataset has no store column
+    days: np.ndarray  # datetime64[D], NaT for unparseable dates
+    n: np.ndarray  # (cells, columns)
+    mean: np.ndarray
+    m2: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.days.size)
+
+
+@dataclass
+class MonthDigests:
+    stores: np.ndarray
+    months: np.ndarray  # datetime64[M]
+    column: np.ndarray
+    n: np.ndarray
+    h_offsets: np.ndarray
+    h_bins: np.ndarray
+    h_counts: np.ndarray
+    d_offsets: np.ndarray
+    d_means: np.ndarray
+    d_weights: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.column.size)
+
+
+@dataclass
+class SketchSet:
+    columns: list[str]
+    ranges: np.ndarray  # (len(columns), 2) global [lo, hi] of each column's histogram
+    days: DayMoments
+    months: MonthDigests
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(part, f.name).nbytes for part in (self.days, self.months) for f in fields(part)) + self.ranges.nbytes
+
+
+def sketch_path_for(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".sketch.parquet"
+
+
+def _spans(offsets: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions of the list entries of ``rows`` and their lengths."""
+    starts, lengths = offsets[rows], offsets[rows + 1] - offsets[rows]
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), lengths
+    shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return shift + np.arange(total), lengths
+
+
+def _offsets(group: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    return np.searchsorted(group, np.append(keys, np.iinfo(np.int64).max)).astype(np.int64)
+
+
+def _keys(stores: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    s_codes, _ = pd.factorize(stores, use_na_sentinel=False)
+    p_codes, _ = pd.factorize(periods, use_na_sentinel=False)
+    return s_codes.astype(np.int64) * (int(p_codes.max(initial=0)) + 1) + p_codes
+
+
+def compress(g: np.ndarray, means: np.ndarray, weights: np.ndarray, delta: int = DIGEST_DELTA) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge centroids per group with the t-digest k1 scale, for every group at once.
+
+    Centroids are sorted by (group, mean); each one is assigned the k-bucket of its mid-quantile
+    within its group and equal buckets are merged. Small groups stay exact, tails keep the most detail.
+    """
+    if not g.size:
+        return g.astype(np.int64), means.astype(float), weights.astype(float)
+    order = np.lexsort((means, g))
+    g, means, weights = g[order].astype(np.int64), means[order], weights[order]
+    before = np.cumsum(weights) - weights
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(g)) + 1])
+    lengths = np.diff(np.append(starts, g.size))
+    base = np.repeat(before[starts], lengths)
+    total = np.repeat(np.add.reduceat(weights, starts), lengths)
+    q = np.clip((before - base + weights / 2) / total, 0.0, 1.0)
+    k = np.floor(delta * (np.arcsin(2 * q - 1) / np.pi + 0.5)).astype(np.int64)
+    uniq, inv = np.unique(g * (delta + 1) + k, return_inverse=True)
+    w = np.bincount(inv, weights)
+    return uniq // (delta + 1), np.bincount(inv, weights * means) / w, w
+
+
+def _empty_moments(cells: int, ncols: int) -> dict[str, np.ndarray]:
+    shape = (cells, ncols)
+    return {"n": np.zeros(shape, dtype=np.int64), "mean": np.zeros(shape), "m2": np.zeros(shape), "min": np.full(shape, np.inf), "max": np.full(shape, -np.inf)}
+
+
+def _moments(m: DayMoments, rows: np.ndarray, g: np.ndarray, columns: Optional[np.ndarray] = None) -> dict[str, np.ndarray]:
+    """Merge the cells ``rows`` by their group ids ``g`` (``0..groups-1``, every group present), optionally only ``columns``."""
+    order = np.argsort(g, kind="stable")
+    rows, g = rows[order], g[order]
+    cols = slice(None) if columns is None else columns
+    if not rows.size:
+        return _empty_moments(0, m.n[:, cols].shape[1])
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    n, mean = m.n[rows][:, cols], m.mean[rows][:, cols]
+    count = np.add.reduceat(n, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        merged = np.nan_to_num(np.add.reduceat(n * mean, starts, axis=0) / count)
+    group = np.cumsum(np.r_[True, g[1:] != g[:-1]]) - 1
+    return {
+        "n": count, "mean": merged, "m2": np.add.reduceat(m.m2[rows][:, cols] + n * (mean - merged[group]) ** 2, starts, axis=0),
+        "min": np.minimum.reduceat(m.min[rows][:, cols], starts, axis=0), "max": np.maximum.reduceat(m.max[rows][:, cols], starts, axis=0),
+    }
+
+
+def _distributions(d: MonthDigests, rows: np.ndarray, g: np.ndarray, groups: int, delta: int, scale: Optional[np.ndarray] = None) -> dict[str, np.ndarray]:
+    """Merge the histograms and centroids of the month rows ``rows`` into ``groups``, optionally weighting each row."""
+    keys = np.arange(groups)
+    pos, lengths = _spans(d.h_offsets, rows)
+    counts = d.h_counts[pos].astype(float) * (1.0 if scale is None else np.repeat(scale, lengths))
+    uniq, inv = np.unique(np.repeat(g, lengths) * HIST_BINS + d.h_bins[pos], return_inverse=True)
+    h_counts = np.bincount(inv, counts) if uniq.size else np.empty(0, dtype=float)
+    pos, lengths = _spans(d.d_offsets, rows)
+    weights = d.d_weights[pos] * (1.0 if scale is None else np.repeat(scale, lengths))
+    dg, dm, dw = compress(np.repeat(g, lengths), d.d_means[pos], weights, delta)
+    return {
+        "h_offsets": _offsets(uniq // HIST_BINS, keys), "h_bins": (uniq % HIST_BINS).astype(np.int16), "h_counts": h_counts,
+        "d_offsets": _offsets(dg, keys), "d_means": dm, "d_weights": dw,
+    }
+
+
+def _take(d: MonthDigests, rows: np.ndarray) -> MonthDigests:
+    h_pos, h_len = _spans(d.h_offsets, rows)
+    d_pos, d_len = _spans(d.d_offsets, rows)
+    return MonthDigests(
+        stores=d.stores[rows], months=d.months[rows], column=d.column[rows], n=d.n[rows],
+        h_offsets=np.concatenate([[0], np.cumsum(h_len)]).astype(np.int64), h_bins=d.h_bins[h_pos], h_counts=d.h_counts[h_pos],
+        d_offsets=np.concatenate([[0], np.cumsum(d_len)]).astype(np.int64), d_means=d.d_means[d_pos], d_weights=d.d_weights[d_pos],
+    )
+
+
+def _bin_index(v: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    if not hi > lo:
+        return np.zeros(v.size, dtype=np.int64)
+    return np.clip(((v - lo) / (hi - lo) * HIST_BINS).astype(np.int64), 0, HIST_BINS - 1)
+
+
+def _cells(stores: np.ndarray, periods: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    s_codes, s_uniq = pd.factorize(stores, use_na_sentinel=False)
+    p_codes, p_uniq = pd.factorize(periods, use_na_sentinel=False)
+    width = max(len(p_uniq), 1)
+    cells, cell = np.unique(s_codes.astype(np.int64) * width + p_codes, return_inverse=True)
+    return cell, np.asarray(s_uniq, dtype=object)[cells // width], np.asarray(p_uniq, dtype=periods.dtype)[cells % width]
+
+
+def _batch_sketch(frame: pd.DataFrame, date_col: Optional[str], store_col: Optional[str], columns: list[str], ranges: np.ndarray) -> SketchSet:
+    if date_col:
+        days = storage.parsed_dates(frame, date_col).to_numpy(dtype="datetime64[D]")
+    else:
+        days = np.full(len(frame), np.datetime64("NaT"), dtype="datetime64[D]")
+    if store_col:
+        stores = np.where(frame[store_col].notna(), frame[store_col].astype(str), None)
+    else:
+        stores = np.full(len(frame), None, dtype=object)
+    day_cell, day_stores, day_days = _cells(stores, days)
+    month_cell, month_stores, month_months = _cells(stores, days.astype("datetime64[M]"))
+    k, km = day_stores.size, month_stores.size
+    moments = _empty_moments(k, len(columns))
+    month_parts = []
+    for j, col in enumerate(columns):
+        v = pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        ok = np.isfinite(v)
+        c, cm, v = day_cell[ok], month_cell[ok], v[ok]
+        if not v.size:
+            continue
+        n = np.bincount(c, minlength=k)
+        mean = np.bincount(c, v, k) / np.maximum(n, 1)
+        moments["n"][:, j], moments["mean"][:, j] = n, mean
+        moments["m2"][:, j] = np.bincount(c, (v - mean[c]) ** 2, k)
+        np.minimum.at(moments["min"][:, j], c, v)
+        np.maximum.at(moments["max"][:, j], c, v)
+        nm = np.bincount(cm, minlength=km)
+        present = np.flatnonzero(nm)
+        uniq, h_counts = np.unique(cm * HIST_BINS + _bin_index(v, *ranges[j]), return_counts=True)
+        dg, dm, dw = compress(cm, v, np.ones(v.size), CELL_DELTA)
+        month_parts.append(MonthDigests(
+            stores=month_stores[present], months=month_months[present], column=np.full(present.size, j, dtype=np.int32), n=nm[present].astype(np.int64),
+            h_offsets=_offsets(uniq // HIST_BINS, present), h_bins=(uniq % HIST_BINS).astype(np.int16), h_counts=h_counts.astype(np.int64),
+            d_offsets=_offsets(dg, present), d_means=dm, d_weights=dw,
+        ))
+    return SketchSet(columns=columns, ranges=ranges, days=DayMoments(stores=day_stores, days=day_days, **moments), months=_concat_months(month_parts))
+
+
+def _concat_days(ncols: int, parts: Sequence[DayMoments]) -> DayMoments:
+    if not parts:
+        return DayMoments(stores=np.empty(0, dtype=object), days=np.empty(0, dtype="datetime64[D]"), **_empty_moments(0, ncols))
+    return DayMoments(**{f.name: np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(DayMoments)})
+
+
+def _concat_months(parts: Sequence[MonthDigests]) -> MonthDigests:
+    def cat(name: str, dtype) -> np.ndarray:
+        return np.concatenate([getattr(p, name) for p in parts]) if parts else np.empty(0, dtype=dtype)
+
+    def offsets(name: str, values: str) -> np.ndarray:
+        out, shift = [np.zeros(1, dtype=np.int64)], 0
+        for p in parts:
+            out.append(getattr(p, name)[1:] + shift)
+            shift += getattr(p, values).size
+        return np.concatenate(out)
+
+    return MonthDigests(
+        stores=cat("stores", object), months=cat("months", "datetime64[M]"), column=cat("column", np.int32), n=cat("n", np.int64),
+        h_offsets=offsets("h_offsets", "h_bins"), h_bins=cat("h_bins", np.int16), h_counts=cat("h_counts", np.int64),
+        d_offsets=offsets("d_offsets", "d_means"), d_means=cat("d_means", float), d_weights=cat("d_weights", float),
+    )
+
+
+def _concat(columns: list[str], ranges: np.ndarray, parts: Sequence[SketchSet]) -> SketchSet:
+    return SketchSet(columns=columns, ranges=ranges, days=_concat_days(len(columns), [p.days for p in parts]), months=_concat_months([p.months for p in parts]))
+
+
+def merge(sk: SketchSet) -> SketchSet:
+    """Collapse cells that share a (store, day) or (store, month, column) key, e.g. cells split across ingest batches.
+
+    Month cells without a duplicate are passed through as they are, so their centroids are not recompressed.
+    """
+    days = sk.days
+    uniq, first, g = np.unique(_keys(days.stores, days.days), return_index=True, return_inverse=True)
+    if uniq.size < len(days):
+        dup = np.bincount(g)[g] > 1
+        rows = np.flatnonzero(dup)
+        groups, g_dup = np.unique(g[rows], return_inverse=True)
+        lead, rest = first[groups], np.flatnonzero(~dup)
+        merged = _moments(days, rows, g_dup)
+        days = DayMoments(
+            stores=np.concatenate([days.stores[rest], days.stores[lead]]), days=np.concatenate([days.days[rest], days.days[lead]]),
+            **{name: np.concatenate([getattr(days, name)[rest], values]) for name, values in merged.items()},
+        )
+
+    months = sk.months
+    key = _keys(months.stores, months.months) * max(len(sk.columns), 1) + months.column
+    uniq, first, g = np.unique(key, return_index=True, return_inverse=True)
+    if uniq.size < len(months):
+        dup = np.bincount(g)[g] > 1
+        rows = np.flatnonzero(dup)
+        groups, g_dup = np.unique(g[rows], return_inverse=True)
+        lead = first[groups]
+        agg = _distributions(months, rows, g_dup, groups.size, CELL_DELTA)
+        merged = MonthDigests(
+            stores=months.stores[lead], months=months.months[lead], column=months.column[lead], n=np.bincount(g_dup, months.n[rows], groups.size).astype(np.int64),
+            **{**agg, "h_counts": agg["h_counts"].astype(np.int64)},
+        )
+        months = _concat_months([_take(months, np.flatnonzero(~dup)), merged])
+    return replace(sk, days=days, months=months)
+
+
+def _regrid(sk: SketchSet, columns: list[str], ranges: np.ndarray) -> SketchSet:
+    """Re-index ``sk`` onto ``columns`` and move its histogram counts onto the grid of ``ranges``."""
+    remap = np.array([columns.index(c) for c in sk.columns], dtype=np.int32)
+    d = sk.months
+    column = remap[d.column] if len(d) else d.column
+    rows = np.repeat(np.arange(len(d)), np.diff(d.h_offsets))
+    old, new = sk.ranges[d.column[rows]], ranges[column[rows]]
+    # Each old bin is assigned by its centre; exact when the grid is unchanged
+    centres = old[:, 0] + (d.h_bins + 0.5) * (old[:, 1] - old[:, 0]) / HIST_BINS
+    width = new[:, 1] - new[:, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bins = np.where(width > 0, np.clip(np.floor((centres - new[:, 0]) / width * HIST_BINS), 0, HIST_BINS - 1), 0).astype(np.int64)
+    uniq, inv = np.unique(rows * HIST_BINS + bins, return_inverse=True)
+    h_counts = np.bincount(inv, d.h_counts.astype(float)).astype(np.int64) if uniq.size else d.h_counts
+    months = replace(d, column=column, h_offsets=_offsets(uniq // HIST_BINS, np.arange(len(d))), h_bins=(uniq % HIST_BINS).astype(np.int16), h_counts=h_counts)
+    moments = _empty_moments(len(sk.days), len(columns))
+    for name, values in moments.items():
+        values[:, remap] = getattr(sk.days, name)
+    return SketchSet(columns=columns, ranges=ranges, days=DayMoments(stores=sk.days.stores, days=sk.days.days, **moments), months=months)
+
+
+def combine(a: SketchSet, b: SketchSet) -> SketchSet:
+    """Union of two sketch sets (e.g. a dataset and an appended partition) on a common histogram grid."""
+    columns = [*a.columns, *(c for c in b.columns if c not in a.columns)]
+    spans = [[sk.ranges[sk.columns.index(c)] for sk in (a, b) if c in sk.columns] for c in columns]
+    ranges = np.array([[min(r[0] for r in rs), max(r[1] for r in rs)] for rs in spans], dtype=float).reshape(-1, 2)
+    return merge(_concat(columns, ranges, [_regrid(a, columns, ranges), _regrid(b, columns, ranges)]))
+
+
+def build(frames: Callable[[], Iterable[pd.DataFrame]], date_col: Optional[str], store_col: Optional[str]) -> SketchSet:
+    # Pass 1: numeric columns and their global range, which fixes every cell's histogram grid
+    columns: Optional[list[str]] = None
+    bounds: dict[str, list[float]] = {}
+    for frame in frames():
+        numeric = [str(c) for c in frame.columns if c not in (date_col, store_col) and pd.api.types.is_numeric_dtype(frame[c]) and not pd.api.types.is_bool_dtype(frame[c])]
+        columns = numeric if columns is None else [c for c in columns if c in numeric]
+        for col in numeric:
+            v = frame[col].to_numpy(dtype=float, na_value=np.nan)
+            v = v[np.isfinite(v)]
+            if v.size:
+                lo, hi = bounds.setdefault(col, [np.inf, -np.inf])
+                bounds[col] = [min(lo, float(v.min())), max(hi, float(v.max()))]
+    columns = columns or []
+    ranges = np.array([bounds.get(c, [0.0, 0.0]) for c in columns], dtype=float).reshape(-1, 2)
+    # Pass 2: each batch's cells are folded into the running sketch, so memory is bounded by the sketch itself
+    sk = _concat(columns, ranges, [])
+    for frame in frames():
+        sk = merge(_concat(columns, ranges, [sk, _batch_sketch(frame, date_col, store_col, columns, ranges)]))
+    return sk
+
+
+def _list_array(offsets: np.ndarray, values: np.ndarray) -> pa.Array:
+    return pa.LargeListArray.from_arrays(pa.array(offsets, type=pa.int64()), pa.array(values))
+
+
+def save(sk: SketchSet, path: str) -> None:
+    # Day cells first (one moment list entry per column), then month cells with the distribution lists; the
+    # other level's lists are empty. The split point is in the metadata.
+    days, months = sk.days, sk.months
+    k, km, ncols = len(days), len(months), len(sk.columns)
+    meta = {"format": FORMAT, "columns": sk.columns, "ranges": sk.ranges.tolist(), "bins": HIST_BINS, "days": k}
+    moment_offsets = np.concatenate([np.arange(k + 1) * ncols, np.full(km, k * ncols)])
+    day_offsets = np.zeros(k, dtype=np.int64)
+
+    def month_lists(offsets: np.ndarray, values: np.ndarray) -> pa.Array:
+        return _list_array(np.concatenate([day_offsets, offsets]), values)
+
+    table = pa.table({
+        "store": pa.array(np.concatenate([days.stores, months.stores]), type=pa.string(), from_pandas=True),
+        "day": pa.array(np.concatenate([days.days, months.months.astype("datetime64[D]")]), type=pa.date32()),
+        "column": pa.array(np.concatenate([np.full(k, -1, dtype=np.int32), months.column]), type=pa.int32()),
+        "count": np.concatenate([np.zeros(k, dtype=np.int64), months.n]),
+        **{name: _list_array(moment_offsets, getattr(days, name).ravel()) for name in ("n", "mean", "m2", "min", "max")},
+        "h_bins": month_lists(months.h_offsets, months.h_bins),
+        "h_counts": month_lists(months.h_offsets, months.h_counts),
+        "d_means": month_lists(months.d_offsets, months.d_means),
+        "d_weights": month_lists(months.d_offsets, months.d_weights),
+    }).replace_schema_metadata({_META_KEY: json.dumps(meta, ensure_ascii=False)})
+    pq.write_table(table, path)
+
+
+def is_current(path: str) -> bool:
+    """Whether ``path`` holds sketches in the current format (older files are rebuilt)."""
+    metadata = pq.read_schema(path).metadata or {}
+    return _META_KEY in metadata and json.loads(metadata[_META_KEY]).get("format") == FORMAT
+
+
+def _lists(column: pa.ChunkedArray) -> tuple[np.ndarray, np.ndarray]:
+    arr = column.combine_chunks()
+    offsets = arr.offsets.to_numpy().astype(np.int64)
+    return offsets - offsets[0], arr.flatten().to_numpy()
+
+
+def load(path: str) -> SketchSet:
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[_META_KEY])
+    k, ncols = meta["days"], len(meta["columns"])
+    day, rest = table.slice(0, k), table.slice(k)
+    h_offsets, h_bins = _lists(rest["h_bins"])
+    _, h_counts = _lists(rest["h_counts"])
+    d_offsets, d_means = _lists(rest["d_means"])
+    _, d_weights = _lists(rest["d_weights"])
+    return SketchSet(
+        columns=meta["columns"], ranges=np.array(meta["ranges"], dtype=float).reshape(-1, 2),
+        days=DayMoments(
+            stores=day["store"].to_numpy().astype(object), days=day["day"].to_numpy().astype("datetime64[D]"),
+            **{name: _lists(day[name])[1].reshape(k, ncols) for name in ("n", "mean", "m2", "min", "max")},
+        ),
+        months=MonthDigests(
+            stores=rest["store"].to_numpy().astype(object), months=rest["day"].to_numpy().astype("datetime64[M]"),
+            column=rest["column"].to_numpy(), n=rest["count"].to_numpy(),
+            h_offsets=h_offsets, h_bins=h_bins.astype(np.int16), h_counts=h_counts, d_offsets=d_offsets, d_means=d_means, d_weights=d_weights,
+        ),
+    )
+
+
+def write_for_columnar(columnar_paths: Sequence[str], source_path: str) -> dict:
+    """Build and persist the sketches of freshly ingested Parquet copies (one per sheet for workbooks)."""
+    files = [pq.ParquetFile(p) for p in columnar_paths]
+    date_col, store_col = detect_date_and_store(files[0].schema_arrow.names)
+    frames = lambda: (b.to_pandas() for pf in files for b in pf.iter_batches(batch_size=settings.ingest_chunk_rows))
+    sk = build(frames, date_col, store_col)
+    path = sketch_path_for(source_path)
+    save(sk, path)
+    return {"path": path, "columns": sk.columns}
+
+
+def append_sketches(ds: Dataset, part_path: str, fresh_after: int, dest: str) -> Optional[int]:
+    """Write the dataset's sketches merged with those of an appended partition to ``dest``.
+
+    Returns the mtime of the sketch file they were derived from, or None when it is missing, stale or of an older
+    format (it is then rebuilt on next use). The partition's own sketch file is removed either way.
+    """
+    path = sketch_path_for(ds.path)
+    try:
+        if not (os.path.exists(path) and os.stat(path).st_mtime_ns >= fresh_after and is_current(path)):
+            return None
+        based_on = os.stat(path).st_mtime_ns
+        save(combine(load(path), load(part_path)), dest)
+        return based_on
+    finally:
+        os.remove(part_path)
+
+
+def get_sketches(ds: Dataset) -> SketchSet:
+    sig = storage.signature(ds)
+    path = sketch_path_for(ds.path)
+
+    def loader() -> SketchSet:
+        if os.path.exists(path) and os.stat(path).st_mtime_ns >= sig[1] and is_current(path):
+            return load(path)
+        date_col, store_col = storage.date_and_store(ds)
+        sk = build(lambda: storage.iter_frames(ds, batch_rows=settings.ingest_chunk_rows), date_col, store_col)
+        save(sk, path)
+        return sk
+
+    return frame_cache.get_or_load(ds.id, sig, loader, variant="sketch")
+
+
+def _round_counts(weights: np.ndarray) -> np.ndarray:
+    """Whole counts for weighted bins that still add up to the rounded total (largest remainder)."""
+    counts = np.floor(weights).astype(np.int64)
+    short = int(round(float(weights.sum()))) - int(counts.sum())
+    if short > 0:
+        counts[np.argsort(counts - weights, kind="stable")[:short]] += 1
+    return counts
+
+
+def summarize(
+    sk: SketchSet,
+    columns: Sequence[str],
+    store: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    quantiles: Sequence[float] = SUMMARY_QUANTILES,
+) -> list[dict]:
+    index = {c: i for i, c in enumerate(sk.columns)}
+    wanted = np.array([index[c] for c in columns], dtype=np.int32)
+    position = np.full(len(sk.columns), -1, dtype=np.int64)
+    position[wanted] = np.arange(wanted.size)
+    days, months = sk.days, sk.months
+
+    mask = np.ones(len(days), dtype=bool)
+    if store:
+        mask &= days.stores == store
+    if start or end:
+        mask &= ~np.isnat(days.days)
+    if start:
+        mask &= days.days >= np.datetime64(pd.to_datetime(start).date(), "D")
+    if end:
+        mask &= days.days <= np.datetime64(pd.to_datetime(end).date(), "D")
+    rows = np.flatnonzero(mask)
+    moments = _moments(days, rows, np.zeros(rows.size, dtype=np.int64), wanted)
+    if not rows.size:
+        moments = _empty_moments(1, wanted.size)
+
+    # Each overlapping month cell is weighted by the share of its rows that fall inside the slice
+    m_mask = np.isin(months.column, wanted)
+    if store:
+        m_mask &= months.stores == store
+    m_rows = np.flatnonzero(m_mask)
+    keys = _keys(np.concatenate([days.stores[rows], months.stores[m_rows]]), np.concatenate([days.days[rows].astype("datetime64[M]"), months.months[m_rows]]))
+    month_keys = keys[rows.size:]
+    covered = np.zeros(m_rows.size)
+    inside, inv = np.unique(keys[:rows.size], return_inverse=True)
+    if inside.size:
+        order = np.argsort(inv, kind="stable")
+        covered_n = np.add.reduceat(days.n[rows[order]][:, wanted], np.searchsorted(inv[order], np.arange(inside.size)), axis=0)
+        at = np.minimum(np.searchsorted(inside, month_keys), inside.size - 1)
+        hit = inside[at] == month_keys
+        covered[hit] = covered_n[at[hit], position[months.column[m_rows[hit]]]]
+    keep = covered > 0
+    m_rows, scale = m_rows[keep], covered[keep] / months.n[m_rows[keep]]
+    dist = _distributions(months, m_rows, position[months.column[m_rows]], wanted.size, DIGEST_DELTA, scale)
+
+    out = []
+    for i, col in enumerate(columns):
+        n = int(moments["n"][0, i])
+        item: dict = {"column": col, "count": n}
+        if n:
+            lo, hi = float(moments["min"][0, i]), float(moments["max"][0, i])
+            d = slice(dist["d_offsets"][i], dist["d_offsets"][i + 1])
+            means, weights = dist["d_means"][d], dist["d_weights"][d]
+            total = float(weights.sum())
+            mids = np.cumsum(weights) - weights / 2
+            values = np.interp(np.asarray(quantiles, dtype=float) * total, np.concatenate([[0.0], mids, [total]]), np.concatenate([[lo], np.clip(means, lo, hi), [hi]]))
+            h = slice(dist["h_offsets"][i], dist["h_offsets"][i + 1])
+            counts = _round_counts(np.bincount(dist["h_bins"][h], dist["h_counts"][h], HIST_BINS))
+            used = np.flatnonzero(counts)
+            edges = np.linspace(*sk.ranges[index[col]], HIST_BINS + 1)
+            item.update({
+                "mean": float(moments["mean"][0, i]),
+                "std": float(np.sqrt(moments["m2"][0, i] / n)),
+                "min": lo,
+                "max": hi,
+                "quantiles": {quantile_key(q): float(v) for q, v in zip(quantiles, values)},
+                "histogram": {"bins": edges[used[0]: used[-1] + 2].tolist(), "counts": counts[used[0]: used[-1] + 1].tolist()} if used.size else None,
+            })
+        out.append(item)
+    return out
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..models.dataset import Dataset
+from ..utils.dataframe import detect_date_and_store
+from .frame_cache import frame_cache
+
+
+# Profiled datasets are stored sorted by date with the date column parsed once at ingest into this column
+PARSED_DATE = "__parsed_date"
+# Text columns with at most this share of distinct values are loaded as categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+_convert_lock = threading.Lock()
+
+
+def dataset_meta(ds: Dataset) -> dict:
+    return json.loads(ds.meta_json) if ds.meta_json else {}
+
+
+def dataset_columns(ds: Dataset) -> list[str]:
+    meta = dataset_meta(ds)
+    columnar = meta.get("columnar") or {}
+    return list(columnar.get("schema") or meta.get("columns") or [])
+
+
+def dataset_profile(ds: Dataset) -> dict:
+    return dataset_meta(ds).get("profile") or {}
+
+
+def date_and_store(ds: Dataset) -> tuple[Optional[str], Optional[str]]:
+    profile = dataset_profile(ds)
+    if profile:
+        return profile["date_column"], profile["store_column"]
+    return detect_date_and_store(dataset_columns(ds))
+
+
+def stored_columns(ds: Dataset) -> list[str]:
+    """The dataset's columns plus, for profiled datasets, the parsed-date column."""
+    names = dataset_columns(ds)
+    return [*names, PARSED_DATE] if dataset_profile(ds).get("date_column") else names
+
+
+def parsed_dates(frame: pd.DataFrame, date_col: str) -> pd.Series:
+    if PARSED_DATE in frame.columns:
+        return frame[PARSED_DATE]
+    if pd.api.types.is_datetime64_any_dtype(frame[date_col]):
+        return frame[date_col]
+    return pd.to_datetime(frame[date_col], errors="coerce")
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    df = df.copy(deep=False)
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Mixed-type object columns (e.g. numbers and text in one Excel column) are kept as text
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def columnar_path_for(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + ".parquet"
+
+
+def write_columnar(df: pd.DataFrame, source_path: str, path: Optional[str] = None) -> dict:
+    path = path or columnar_path_for(source_path)
+    table = to_arrow(df)
+    pq.write_table(table, path)
+    return {"path": path, "format": "parquet", "schema": {f.name: str(f.type) for f in table.schema}}
+
+
+def _read_source(path: str, sheet_name: Optional[str]) -> pd.DataFrame:
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path)
+    return pd.read_excel(path, sheet_name=sheet_name or 0)
+
+
+def _converted(ds: Dataset) -> Optional[str]:
+    # Excel datasets uploaded before Parquet copies existed are converted once, so openpyxl never runs per request
+    if ds.path.lower().endswith(".csv") or not os.path.exists(ds.path):
+        return None
+    path = columnar_path_for(ds.path)
+    with _convert_lock:
+        if not os.path.exists(path) or os.stat(path).st_mtime_ns < os.stat(ds.path).st_mtime_ns:
+            tmp = f"{path}.tmp"
+            write_columnar(_read_source(ds.path, dataset_meta(ds).get("sheet_name")), ds.path, tmp)
+            os.replace(tmp, path)
+    return path
+
+
+def source_path(ds: Dataset) -> str:
+    columnar = dataset_meta(ds).get("columnar")
+    if columnar and os.path.exists(columnar["path"]):
+        return columnar["path"]
+    return _converted(ds) or ds.path
+
+
+def source_paths(ds: Dataset) -> list[str]:
+    """The base file followed by the Parquet copy of every appended partition."""
+    return [source_path(ds), *(p["columnar"]["path"] for p in dataset_meta(ds).get("partitions", []))]
+
+
+def signature(ds: Dataset) -> tuple:
+    paths = source_paths(ds)
+    stats = [os.stat(p) for p in paths]
+    return (tuple(paths), max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats))
+
+
+def _read_parquet(paths: Sequence[str], columns: Optional[list[str]]) -> pd.DataFrame:
+    if len(paths) == 1:
+        return pd.read_parquet(paths[0], columns=columns)
+    # Partitions may have been typed differently at ingest (e.g. int vs float); concat promotes them
+    return pa.concat_tables([pq.read_table(p, columns=columns) for p in paths], promote_options="permissive").to_pandas()
+
+
+def compact(df: pd.DataFrame, date_col: Optional[str]) -> pd.DataFrame:
+    """Shrink a freshly loaded frame in place before it is cached.
+
+    The date column becomes datetime64 (the ingest-time parse when present), low-cardinality text columns
+    (stores, categories) become categoricals and integer columns are downcast to the smallest type that holds
+    their values. Float columns are kept: float32 would change the sums the analyses report.
+    """
+    if PARSED_DATE in df.columns:
+        parsed = df.pop(PARSED_DATE)
+        if date_col in df.columns:
+            df[date_col] = parsed
+    elif date_col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object and col != date_col:
+            distinct = values.nunique()
+            if distinct and distinct <= len(values) * CATEGORY_MAX_RATIO:
+                df[col] = values.astype("category")
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            df[col] = pd.to_numeric(values, downcast="integer")
+    return df
+
+
+def load_frame(ds: Dataset, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """The dataset (or the given columns) as a compacted frame from the shared cache; see ``compact``."""
+    meta = dataset_meta(ds)
+    sig = signature(ds)
+    paths = sig[0]
+    date_col = date_and_store(ds)[0]
+    if paths[0] != ds.path:
+        names = stored_columns(ds)
+        cols = [c for c in dict.fromkeys(columns) if c in names] if columns is not None else (names or None)
+        loader = lambda: compact(_read_parquet(paths, cols), date_col)
+        variant = tuple(cols) if cols is not None else None
+    else:
+        loader = lambda: compact(_read_source(paths[0], meta.get("sheet_name")), date_col)
+        variant = None
+    return frame_cache.get_or_load(ds.id, sig, loader, variant=variant)
+
+
+def iter_frames(ds: Dataset, columns: Optional[Sequence[str]] = None, batch_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Yield the dataset in row batches without materializing it (Excel sources without a Parquet copy excepted)."""
+    path = source_path(ds)
+    if path != ds.path:
+        for part in source_paths(ds):
+            pf = pq.ParquetFile(part)
+            cols = [c for c in dict.fromkeys(columns) if c in pf.schema_arrow.names] if columns is not None else None
+            for batch in pf.iter_batches(batch_size=batch_rows, columns=cols):
+                yield batch.to_pandas()
+    elif path.lower().endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=batch_rows, usecols=(lambda c: c in columns) if columns is not None else None)
+    else:
+        df = _read_source(path, dataset_meta(ds).get("sheet_name"))
+        yield df[[c for c in df.columns if c in columns]] if columns is not None else df
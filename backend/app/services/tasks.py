@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+from ..core.config import settings
+from ..db import SessionLocal
+from ..models.dataset import Dataset
+from ..repos import jobs as jobs_repo
+from ..schemas.analysis import HistogramRequest, ParetoRequest, TimeSeriesRequest
+from . import analytics
+
+
+COMPUTE = {
+    "timeseries": (TimeSeriesRequest, analytics.compute_timeseries),
+    "pareto": (ParetoRequest, analytics.compute_pareto),
+    "histogram": (HistogramRequest, analytics.compute_histogram),
+}
+
+
+def run_analysis(type_: str, dataset: dict, payload: dict) -> dict:
+    """Worker-process entry point; returns plain data so nothing unpicklable crosses the pool."""
+    request_cls, compute = COMPUTE[type_]
+    ds = Dataset(**dataset)
+    try:
+        resp = compute(ds, request_cls(**payload))
+    except HTTPException as e:
+        return {"ok": False, "status_code": e.status_code, "detail": e.detail}
+    return {"ok": True, "result_json": resp.model_dump_json()}
+
+
+@dataclass
+class Task:
+    id: str
+    type: str
+    session_id: int
+    dataset_id: int
+    params_json: str
+    status: str = "queued"  # queued | running | done | failed | cancelled
+    job_id: Optional[int] = None
+    result_json: Optional[str] = None
+    error: Optional[dict] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    finished_at: Optional[datetime] = None
+    cancel_requested: bool = False
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "task_id": self.id,
+            "type": self.type,
+            "dataset_id": self.dataset_id,
+            "status": self.status,
+            "job_id": self.job_id,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class TaskRunner:
+    """Local process-pool runner for analysis tasks.
+
+    Tasks wait in an in-process queue and are handed to the pool only when a worker is
+    free, so queued tasks can be cancelled outright; a running task cannot be interrupted
+    and its result is discarded instead. Finished results are written to the analysis cache.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, keep_finished: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: dict[str, Task] = {}
+        self._args: dict[str, tuple] = {}
+        self._queue: deque[str] = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Called with self._lock held: _pump runs on request threads and in done callbacks at once
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, type_: str, ds: Dataset, session_id: int, params_json: str, payload: dict) -> Task:
+        dataset = {"id": ds.id, "session_id": ds.session_id, "name": ds.name, "path": ds.path, "meta_json": ds.meta_json}
+        task = Task(id=uuid.uuid4().hex, type=type_, session_id=session_id, dataset_id=ds.id, params_json=params_json)
+        with self._lock:
+            pending = len(self._queue) + self._running
+            if pending >= self.max_pending:
+                raise HTTPException(status_code=429, detail="Too many analysis tasks queued; retry later")
+            self._tasks[task.id] = task
+            self._args[task.id] = (type_, dataset, payload)
+            self._queue.append(task.id)
+            self._trim()
+        self._pump()
+        return task
+
+    def completed(self, type_: str, ds_id: int, session_id: int, params_json: str, job_id: int, result_json: str) -> Task:
+        task = Task(id=uuid.uuid4().hex, type=type_, session_id=session_id, dataset_id=ds_id, params_json=params_json,
+                    status="done", job_id=job_id, result_json=result_json, finished_at=datetime.now(tz=timezone.utc))
+        with self._lock:
+            self._tasks[task.id] = task
+            self._trim()
+        return task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def cancel(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.status not in ("queued", "running"):
+                return task
+            task.cancel_requested = True
+            if task.status == "queued":
+                self._queue.remove(task_id)
+                self._args.pop(task_id, None)
+            task.status = "cancelled"
+            task.finished_at = datetime.now(tz=timezone.utc)
+            return task
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            counts: dict[str, int] = {}
+            for t in self._tasks.values():
+                counts[t.status] = counts.get(t.status, 0) + 1
+            return {"queued": len(self._queue), "running": self._running, "max_workers": self.max_workers, **{f"total_{k}": v for k, v in counts.items()}}
+
+    def _pump(self) -> None:
+        while True:
+            with self._lock:
+                if self._running >= self.max_workers or not self._queue:
+                    return
+                task_id = self._queue.popleft()
+                task = self._tasks[task_id]
+                args = self._args.pop(task_id)
+                task.status = "running"
+                self._running += 1
+                pool = self._pool()
+            fut = pool.submit(run_analysis, *args)
+            fut.add_done_callback(lambda f, t=task: self._finish(t, f))
+
+    def _finish(self, task: Task, fut: Future) -> None:
+        try:
+            out = fut.result()
+        except Exception as e:
+            out = {"ok": False, "status_code": 500, "detail": str(e)}
+        try:
+            if not task.cancel_requested:
+                if out["ok"]:
+                    db = SessionLocal()
+                    try:
+                        job = jobs_repo.create(db, task.session_id, task.dataset_id, task.type, task.params_json, out["result_json"])
+                        task.job_id = job.id
+                    finally:
+                        db.close()
+                    task.result_json = out["result_json"]
+                    task.status = "done"
+                else:
+                    task.error = {"status_code": out["status_code"], "detail": out["detail"]}
+                    task.status = "failed"
+                task.finished_at = datetime.now(tz=timezone.utc)
+        except Exception as e:
+            task.error = {"status_code": 500, "detail": str(e)}
+            task.status = "failed"
+            task.finished_at = datetime.now(tz=timezone.utc)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._pump()
+
+    def _trim(self) -> None:
+        finished = [t for t in self._tasks.values() if t.status in ("done", "failed", "cancelled")]
+        for t in sorted(finished, key=lambda t: t.created_at)[: max(0, len(finished) - self.keep_finished)]:
+            del self._tasks[t.id]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+task_runner = TaskRunner(settings.task_max_workers, settings.task_max_pending)
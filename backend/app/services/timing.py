@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from . import profiler
+
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestTiming:
+    """Stage durations of one request, summed per stage name (a stage may run several times, e.g. two loads)."""
+
+    def __init__(self, profile: Optional[profiler.Profile] = None):
+        self.spans: dict[str, float] = {}
+        self.profile = profile
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        with self._lock:
+            parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        return ", ".join([*parts, f"total;dur={total * 1000:.2f}"])
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("qstorm_request_timing", default=None)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a stage of the current request; the stage shows up in Server-Timing and the metrics endpoint.
+
+    Spans entered on worker threads also attach the thread to the request's profile (when one is running),
+    so the sampler sees the pandas work without picking up unrelated coroutines on the event loop thread.
+    """
+    rt = _current.get()
+    attach = rt is not None and rt.profile is not None and not _in_event_loop()
+    if attach:
+        rt.profile.attach()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+        if attach:
+            rt.profile.detach()
+
+
+def record(name: str, seconds: float) -> None:
+    rt = _current.get()
+    if rt is not None:
+        rt.add(name, seconds)
+    else:
+        metrics.observe_stage("-", name, seconds)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+class Metrics:
+    """Request counters and latency histograms (per route and per stage) rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: dict[tuple[str, str, str], int] = {}
+        self._latency: dict[tuple[str, str], Histogram] = {}
+        self._stages: dict[tuple[str, str], Histogram] = {}
+        self._collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, spans: dict[str, float]) -> None:
+        with self._lock:
+            key = (method, route, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._latency.setdefault((method, route), Histogram()).observe(seconds)
+            for stage, value in spans.items():
+                self._stages.setdefault((route, stage), Histogram()).observe(value)
+
+    def observe_stage(self, route: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages.setdefault((route, stage), Histogram()).observe(seconds)
+
+    def register(self, name: str, collect: Callable[[], dict[str, Any]]) -> None:
+        """Export the numeric fields of ``collect()`` as ``qstorm_<name>_<field>`` gauges on every scrape."""
+        self._collectors[name] = collect
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            requests = dict(self._requests)
+            latency = {k: (list(h.counts), h.sum) for k, h in self._latency.items()}
+            stages = {k: (list(h.counts), h.sum) for k, h in self._stages.items()}
+        lines += ["# HELP qstorm_http_requests_total HTTP requests by method, route and status.", "# TYPE qstorm_http_requests_total counter"]
+        lines += [f"qstorm_http_requests_total{_labels(method=m, route=r, status=s)} {n}" for (m, r, s), n in sorted(requests.items())]
+        lines += _histogram("qstorm_http_request_duration_seconds", "Request latency by method and route.", {_labels(method=m, route=r): v for (m, r), v in sorted(latency.items())})
+        lines += _histogram("qstorm_stage_duration_seconds", "Time spent per request stage (resolve, cache, load, parse, filter, compute, serialize, cache_write, ...).",
+                            {_labels(route=r, stage=s): v for (r, s), v in sorted(stages.items())})
+        for name, collect in self._collectors.items():
+            for field, value in _flatten(collect()):
+                metric = f"qstorm_{name}_{field}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _histogram(name: str, help_: str, series: dict[str, tuple[list[int], float]]) -> list[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} histogram"]
+    for labels, (counts, total) in series.items():
+        cumulative = 0
+        for bound, count in zip([*BUCKETS, "+Inf"], counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{labels[:-1]},le="{bound}"}} {cumulative}')
+        lines += [f"{name}_sum{labels} {total}", f"{name}_count{labels} {cumulative}"]
+    return lines
+
+
+def _flatten(stats: dict[str, Any], prefix: str = "") -> Iterator[tuple[str, float]]:
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}{key}", float(value)
+
+
+metrics = Metrics()
+
+
+class TimingMiddleware:
+    """Collects the spans of each HTTP request, sends them as ``Server-Timing`` and feeds ``metrics``.
+
+    A request carrying ``X-Profile: 1`` is also sampled by the profiler when ``PROFILING_ENABLED`` is set; the
+    response then carries ``X-Profile-Id``. Spans that finish after the response headers were sent (streamed
+    exports) only reach the metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = any(k == b"x-profile" and v.strip() not in (b"", b"0") for k, v in scope.get("headers", []))
+        rt = RequestTiming(profiler.start() if requested else None)
+        token = _current.set(rt)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", rt.header(time.perf_counter() - start))
+                if rt.profile is not None:
+                    headers.append("X-Profile-Id", rt.profile.id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if rt.profile is not None:
+                profiler.stop(rt.profile)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.observe_request(scope["method"], route, status, time.perf_counter() - start, rt.spans)
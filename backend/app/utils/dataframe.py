@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple, Dict
+from typing import Iterable, Optional, Tuple, Dict, Union
 
 import pandas as pd
 
 
 DATE_CANDIDATES = ["Date", "年月日", "date"]
 STORE_CANDIDATES = ["shop", "店舗名", "store", "Shop"]
+# Tried at ingest when pandas cannot infer the format of a date column
+DATE_FORMATS = ["%Y年%m月%d日", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d"]
 
 DISPLAY_NAME_MAP: Dict[str, str] = {
     "Mens_JACKETS&OUTER2": "メンズ ジャケット・アウター",
@@ -20,17 +22,18 @@ DISPLAY_NAME_MAP: Dict[str, str] = {
 }
 
 
-def detect_column(df: pd.DataFrame, candidates: list[str]) -> Optional[str]:
-    cols_lower = {c.lower(): c for c in df.columns}
+def detect_column(df: Union[pd.DataFrame, Iterable[str]], candidates: list[str]) -> Optional[str]:
+    columns = list(df.columns) if isinstance(df, pd.DataFrame) else list(df)
+    cols_lower = {str(c).lower(): c for c in columns}
     for cand in candidates:
-        if cand in df.columns:
+        if cand in columns:
             return cand
         if cand.lower() in cols_lower:
             return cols_lower[cand.lower()]
     return None
 
 
-def detect_date_and_store(df: pd.DataFrame) -> Tuple[Optional[str], Optional[str]]:
+def detect_date_and_store(df: Union[pd.DataFrame, Iterable[str]]) -> Tuple[Optional[str], Optional[str]]:
     return detect_column(df, DATE_CANDIDATES), detect_column(df, STORE_CANDIDATES)
 
 
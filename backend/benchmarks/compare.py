@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+
+def _index(report: dict) -> dict[tuple, dict]:
+    return {(r["name"], r["cache"], r.get("concurrency", 1)): r for r in report["results"]}
+
+
+def compare(base: dict, head: dict, metric: str = "p50_ms", threshold: float = 0.1) -> list[dict]:
+    """Per-scenario change of ``metric`` from ``base`` to ``head``; ``regressed`` when it grew by more than ``threshold``."""
+    old, new = _index(base), _index(head)
+    rows = []
+    for key in [k for k in new if k in old]:
+        a, b = old[key][metric], new[key][metric]
+        change = (b - a) / a if a else 0.0
+        rows.append({"name": key[0], "cache": key[1], "concurrency": key[2], "base": a, "head": b, "change": change, "regressed": change > threshold})
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--metric", default="p50_ms", help="result field to compare (e.g. p50_ms, p99_ms, peak_rss_mb)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative increase reported as a regression")
+    args = parser.parse_args(argv)
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+
+    rows = compare(base, head, args.metric, args.threshold)
+    print(f"{base['meta'].get('revision')} -> {head['meta'].get('revision')} ({args.metric})")
+    for r in rows:
+        flag = "  REGRESSION" if r["regressed"] else ""
+        print(f"{r['name']:<16} {r['cache']:<5} x{r['concurrency']:<3} {r['base']:>10.1f} -> {r['head']:>10.1f}  {r['change']:+7.1%}{flag}")
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
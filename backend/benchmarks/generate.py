@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+PRODUCT_COLUMNS = [
+    "Mens_JACKETS&OUTER2", "Mens_KNIT", "Mens_PANTS", "WOMEN'S_JACKETS2",
+    "WOMEN'S_TOPS", "WOMEN'S_ONEPIECE", "WOMEN'S_bottoms", "WOMEN'S_SCARF & STOLES",
+]
+START = "2022-01-01"
+
+
+def make_frame(
+    rows: int = 100_000,
+    stores: int = 50,
+    extra_columns: int = 0,
+    japanese: bool = False,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Store-sales rows (one per store and day, store-major) with the column names the API detects.
+
+    Each store gets a base level and a weekly cycle so time series, Pareto shares and histograms look like
+    real chains rather than uniform noise; ``extra_columns`` adds numeric ``metric_<i>`` columns.
+    """
+    rng = np.random.default_rng(seed)
+    days = max(1, math.ceil(rows / stores))
+    dates = pd.date_range(START, periods=days, freq="D")
+    store_idx = np.repeat(np.arange(stores), days)[:rows]
+    day_idx = np.tile(np.arange(days), stores)[:rows]
+    date_col, store_col = ("年月日", "店舗名") if japanese else ("Date", "shop")
+
+    level = rng.lognormal(mean=0.0, sigma=0.5, size=stores)[store_idx]
+    weekly = 1.0 + 0.3 * np.sin(2 * np.pi * (day_idx % 7) / 7)
+    weights = rng.dirichlet(np.ones(len(PRODUCT_COLUMNS)) * 0.8)
+    data: dict[str, np.ndarray] = {
+        date_col: dates.strftime("%Y-%m-%d").to_numpy()[day_idx],
+        store_col: np.array([f"Store_{i:04d}" for i in range(stores)])[store_idx],
+    }
+    total = np.zeros(rows)
+    for col, w in zip(PRODUCT_COLUMNS, weights):
+        values = rng.poisson(200 * w * level * weekly)
+        data[col] = values
+        total += values
+    data["Total_Sales"] = total * rng.uniform(0.9, 1.1, rows)
+    for i in range(extra_columns):
+        data[f"metric_{i}"] = rng.normal(100.0, 15.0, rows)
+    return pd.DataFrame(data)
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic store-sales CSV")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--japanese", action="store_true", help="use 年月日/店舗名 instead of Date/shop")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    df = make_frame(args.rows, args.stores, args.extra_columns, args.japanese, args.seed)
+    df.to_csv(args.output, index=False)
+    print(f"{args.output}: {len(df)} rows, {df.shape[1]} columns")
+
+
+if __name__ == "__main__":
+    main()
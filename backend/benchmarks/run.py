@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTERS = ["health", "auth", "analysis", "data", "export", "admin", "tasks"]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def build_app():
+    """The API routers mounted on a bare FastAPI app (without app.main's startup/shutdown side effects)."""
+    from fastapi import FastAPI
+
+    from app.services.timing import TimingMiddleware
+
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+    for name in ROUTERS:
+        try:
+            module = importlib.import_module(f"app.api.v1.{name}")
+        except ModuleNotFoundError:
+            continue
+        app.include_router(module.router, prefix=f"/api/v1/{name}")
+    return app
+
+
+def summarize(name: str, cache: str, timings: list[float], wall: Optional[float] = None, concurrency: int = 1) -> dict[str, Any]:
+    ms = np.asarray(timings) * 1000.0
+    return {
+        "name": name,
+        "cache": cache,
+        "n": int(ms.size),
+        "concurrency": concurrency,
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_rps": round(ms.size / (wall if wall is not None else ms.sum() / 1000.0), 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+class Bench:
+    def __init__(self, client, iterations: int, concurrency: int):
+        self.client = client
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.results: list[dict[str, Any]] = []
+
+    def _timed(self, call: Callable[[], Any]) -> float:
+        t = time.perf_counter()
+        resp = call()
+        elapsed = time.perf_counter() - t
+        status = getattr(resp, "status_code", 200)
+        if status >= 400:
+            raise RuntimeError(f"request failed with {status}: {resp.text[:200]}")
+        return elapsed
+
+    def cold(self, name: str, call: Callable[[], Any], reset: Callable[[], None], iterations: Optional[int] = None) -> None:
+        timings = []
+        for _ in range(iterations or self.iterations):
+            reset()
+            timings.append(self._timed(call))
+        self.results.append(summarize(name, "cold", timings))
+        self._log(self.results[-1])
+
+    def warm(self, name: str, call: Callable[[], Any]) -> None:
+        self._timed(call)
+        timings = [self._timed(call) for _ in range(self.iterations)]
+        self.results.append(summarize(name, "warm", timings))
+        self._log(self.results[-1])
+        if self.concurrency > 1:
+            t = time.perf_counter()
+            with ThreadPoolExecutor(self.concurrency) as pool:
+                timings = list(pool.map(lambda _: self._timed(call), range(self.iterations * self.concurrency)))
+            self.results.append(summarize(name, "warm", timings, time.perf_counter() - t, self.concurrency))
+            self._log(self.results[-1])
+
+    @staticmethod
+    def _log(r: dict[str, Any]) -> None:
+        print(f"{r['name']:<16} {r['cache']:<5} x{r['concurrency']:<3} p50 {r['p50_ms']:>10.1f}ms  p99 {r['p99_ms']:>10.1f}ms  "
+              f"{r['throughput_rps']:>9.1f} req/s  rss {r['peak_rss_mb']} MB", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="qstorm-bench-")
+    # Settings are read at import time, so the scratch database must be configured before importing the app
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete
+
+    from app.db import SessionLocal, init_db
+    from app.models.analysis_job import AnalysisJob
+    from app.repos import datasets as datasets_repo
+    from app.repos import jobs as jobs_repo
+    from app.services import partitioned, storage
+    from app.services.frame_cache import frame_cache
+
+    from benchmarks.generate import make_frame, to_csv_bytes
+
+    init_db()
+    df = make_frame(args.rows, args.stores, args.extra_columns, args.japanese, args.seed)
+    payload = to_csv_bytes(df)
+    date_col, store_col = df.columns[0], df.columns[1]
+    bench = Bench(TestClient(build_app()), args.iterations, args.concurrency)
+    client = bench.client
+    print(f"dataset: {len(df)} rows, {df.shape[1]} columns, {len(payload) / 1e6:.1f} MB CSV", file=sys.stderr)
+
+    def reset() -> None:
+        # Cold = empty in-process caches and no cached analysis results; derived files on disk are kept
+        jobs_repo.write_behind.flush()
+        frame_cache.clear()
+        partitioned._datasets.clear()
+        with SessionLocal() as db:
+            db.execute(delete(AnalysisJob))
+            db.commit()
+
+    uploads: list[dict] = []
+
+    def upload():
+        resp = client.post("/api/v1/data/upload", files={"file": ("bench.csv", payload, "text/csv")})
+        uploads.append(resp.json())
+        return resp
+
+    bench.cold("upload", upload, lambda: None, iterations=args.upload_iterations)
+    session_id, dataset_id = int(uploads[0]["session_id"]), int(uploads[0]["dataset_id"])
+    with SessionLocal() as db:
+        ds = datasets_repo.get(db, dataset_id)
+
+    store = str(df[store_col].iloc[0])
+    start, end = str(df[date_col].iloc[0]), str(df[date_col].iloc[min(len(df) - 1, 30)])
+    base = {"session_id": session_id, "dataset_id": dataset_id}
+    requests: dict[str, Callable[[], Any]] = {
+        "load_frame": lambda: storage.load_frame(ds),
+        "timeseries": lambda: client.post("/api/v1/analysis/timeseries", json={**base, "target_column": "Total_Sales"}),
+        "timeseries_store": lambda: client.post("/api/v1/analysis/timeseries", json={**base, "target_column": "Total_Sales", "store": store}),
+        "pareto": lambda: client.post("/api/v1/analysis/pareto", json=base),
+        "histogram": lambda: client.post("/api/v1/analysis/histogram", json={**base, "column": "Total_Sales", "bins": 50}),
+        "summary": lambda: client.post("/api/v1/analysis/summary", json={**base, "columns": ["Total_Sales"]}),
+        "export_dataset": lambda: client.get(f"/api/v1/export/dataset/{dataset_id}", params={"store": store, "start": start, "end": end}),
+    }
+    for name, call in requests.items():
+        if args.only and name not in args.only:
+            continue
+        bench.cold(name, call, reset)
+        bench.warm(name, call)
+
+    if not args.only or "export_job" in args.only:
+        batch = client.post("/api/v1/analysis/batch", json={**base, "specs": [{"type": "timeseries", "target_column": "Total_Sales"}]}).json()
+        job_id = batch["results"][0]["job_id"]
+        bench.warm("export_job", lambda: client.get(f"/api/v1/export/{job_id}"))
+
+    os.chdir(BACKEND)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "keep")},
+        },
+        "dataset": {"rows": len(df), "columns": int(df.shape[1]), "stores": args.stores, "csv_bytes": len(payload)},
+        "peak_rss_mb": _peak_rss_mb(),
+        "results": bench.results,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and analysis endpoints through a local TestClient")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--japanese", action="store_true", help="use 年月日/店舗名 column names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=10, help="timed requests per scenario and cache state")
+    parser.add_argument("--upload-iterations", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="also measure warm throughput with N client threads")
+    parser.add_argument("--only", nargs="*", help="scenario names to run (default: all)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database and uploads")
+    parser.add_argument("--output", "-o", help="write results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    # Pooled aiosqlite connections run on non-daemon threads
+    import asyncio
+    from app.db import async_engine
+    asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="qstorm-tests-")
+# Settings are read at import time, so the scratch database must be configured before importing the app
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+sys.path.insert(0, BACKEND)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.db import async_engine, init_db
+    from app.services import ingest
+    from benchmarks.run import build_app
+
+    # Uploads are stored under ./backend/storage
+    cwd = os.getcwd()
+    os.chdir(WORKDIR)
+    init_db()
+    try:
+        yield TestClient(build_app())
+    finally:
+        ingest.shutdown()
+        asyncio.run(async_engine.dispose())
+        os.chdir(cwd)
+
+
+def sales_frame(days: int = 120, stores=("渋谷", "新宿"), start: str = "2023-01-01", seed: int = 0, japanese_dates: bool = False) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq="D")
+    frames = []
+    for store in stores:
+        df = pd.DataFrame({
+            "年月日": [f"{d.year}年{d.month}月{d.day}日" for d in dates] if japanese_dates else dates.strftime("%Y-%m-%d"),
+            "店舗名": store,
+            "Mens_KNIT": rng.integers(0, 1000, days),
+            "Mens_PANTS": rng.integers(0, 1000, days),
+        })
+        df["Total_Sales"] = (df["Mens_KNIT"] + df["Mens_PANTS"]).astype(float) + rng.random(days)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def upload(client, df: pd.DataFrame, name: str = "sales.csv", **form) -> dict:
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    resp = client.post("/api/v1/data/upload", files={"file": (name, buf.getvalue(), "text/csv")}, data={k: str(v) for k, v in form.items()})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
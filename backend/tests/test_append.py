@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from conftest import sales_frame, upload
+
+SPECS = [
+    {"type": "timeseries", "target_column": "Total_Sales", "aggregation": "monthly", "date_range": ["2023-01-01", "2023-01-31"]},
+    {"type": "timeseries", "target_column": "Total_Sales", "aggregation": "monthly"},
+    {"type": "pareto", "analysis_type": "columns", "columns": ["Mens_KNIT", "Mens_PANTS"]},
+    {"type": "pareto", "analysis_type": "columns", "columns": ["Mens_KNIT", "Mens_PANTS"], "period": "2023-02"},
+    {"type": "pareto", "analysis_type": "columns", "columns": ["Mens_KNIT", "Mens_PANTS"], "store": "池袋"},
+]
+
+
+def _batch(client, ids: dict) -> list[dict]:
+    resp = client.post("/api/v1/analysis/batch", json={**ids, "specs": SPECS})
+    assert resp.status_code == 200, resp.text
+    results = resp.json()["results"]
+    assert all(r["status_code"] == 200 for r in results), results
+    return results
+
+
+def _check(results: list[dict], df: pd.DataFrame) -> None:
+    df = df.assign(month=pd.to_datetime(df["年月日"]).dt.to_period("M"))
+    monthly = df.groupby("month")["Total_Sales"].sum()
+    assert np.allclose(results[0]["result"]["series"][0]["values"], [monthly[pd.Period("2023-01")]])
+    assert np.allclose(results[1]["result"]["series"][0]["values"], monthly.to_numpy())
+    for result, rows in ((results[2], df), (results[3], df[df["month"] == pd.Period("2023-02")])):
+        values = {item["category"]: item["value"] for item in result["result"]["data"]}
+        assert values == {"Mens_KNIT": rows["Mens_KNIT"].sum(), "Mens_PANTS": rows["Mens_PANTS"].sum()}
+
+
+def test_append_updates_cube_and_invalidates_overlapping_jobs(client):
+    base = sales_frame(days=90)
+    j = upload(client, base)
+    ids = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}
+    before = _batch(client, ids)
+    _check(before, base)
+
+    part = sales_frame(days=30, start="2023-04-01", seed=1)
+    appended = upload(client, part, name="april.csv", append_to=ids["dataset_id"])
+    # The all-dates timeseries and Pareto change; January, February and a store absent from April do not.
+    # The timeseries is recomputed by the append itself.
+    assert (appended["invalidated_jobs"], appended["refreshed_jobs"]) == (2, 1)
+
+    after = _batch(client, ids)
+    assert [r["cached"] for r in after] == [True, True, False, True, True]
+    _check(after, pd.concat([base, part], ignore_index=True))
+
+
+def test_append_updates_cached_events(client, monkeypatch):
+    from app.services import events
+
+    base = sales_frame(days=150, stores=("渋谷", "新宿"))
+    base.loc[base["年月日"] == "2023-03-15", "Total_Sales"] *= 8
+    part = sales_frame(days=60, start="2023-05-31", stores=("渋谷", "新宿"), seed=1)
+    part.loc[part["年月日"] == "2023-07-10", "Total_Sales"] *= 8
+    spec = {"type": "timeseries", "target_column": "Total_Sales", "aggregation": "daily", "split_by_store": True}
+    j = upload(client, base)
+    ids = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}
+    client.post("/api/v1/analysis/batch", json={**ids, "specs": [spec]})
+
+    calls = []
+    update = events.update
+    monkeypatch.setattr(events, "update", lambda *args: calls.append(args[-1]) or update(*args))
+    assert upload(client, part, name="june.csv", append_to=ids["dataset_id"])["refreshed_jobs"] == 1
+    # Events are re-detected from the first appended day only
+    assert calls == [150]
+    refreshed = client.post("/api/v1/analysis/batch", json={**ids, "specs": [spec]}).json()["results"][0]
+    assert refreshed["cached"]
+
+    j = upload(client, pd.concat([base, part], ignore_index=True), name="all.csv")
+    full = client.post("/api/v1/analysis/batch", json={"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"]), "specs": [spec]}).json()["results"][0]
+    assert refreshed["result"] == full["result"]
+    assert {("spike", "2023-03-15"), ("spike", "2023-07-10")} <= {(e["type"], e["timestamp"]) for e in full["result"]["events"]}
+
+
+def _derived(dataset_id: int) -> dict:
+    from app.db import SessionLocal
+    from app.repos import datasets as datasets_repo
+    from app.services import cube, partitioned, sketches
+
+    with SessionLocal() as db:
+        path = datasets_repo.get(db, dataset_id).path
+    layout = partitioned.layout_path_for(path)
+    files = [cube.cube_path_for(path), sketches.sketch_path_for(path)]
+    files += [os.path.join(root, name) for root, _, names in os.walk(layout) for name in names]
+    return {f: os.stat(f).st_mtime_ns for f in files}
+
+
+def test_concurrent_appends_keep_every_partition(client):
+    base = sales_frame(days=90)
+    j = upload(client, base)
+    ids = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}
+    _batch(client, ids)
+    parts = [sales_frame(days=30, start=start, seed=seed) for seed, start in ((1, "2023-04-01"), (2, "2023-05-01"))]
+    with ThreadPoolExecutor(2) as pool:
+        out = list(pool.map(lambda df: upload(client, df, name="more.csv", append_to=ids["dataset_id"]), parts))
+    assert sorted(o["partition"] for o in out) == [1, 2]
+    after = _batch(client, ids)
+    _check(after, pd.concat([base, *parts], ignore_index=True))
+
+
+def test_failed_commit_leaves_derived_files(client, monkeypatch):
+    from app.repos import datasets as datasets_repo
+
+    base = sales_frame(days=90)
+    j = upload(client, base)
+    ids = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}
+    _batch(client, ids)
+    derived = _derived(ids["dataset_id"])
+    siblings = set(os.listdir(os.path.dirname(next(iter(derived)))))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(datasets_repo, "update_meta", fail)
+    resp = client.post("/api/v1/data/upload", files={"file": ("april.csv", sales_frame(days=30, start="2023-04-01").to_csv(index=False), "text/csv")}, data={"append_to": str(ids["dataset_id"])})
+    assert resp.status_code == 500
+    monkeypatch.undo()
+    assert _derived(ids["dataset_id"]) == derived
+    assert set(os.listdir(os.path.dirname(next(iter(derived))))) == siblings
+    after = _batch(client, ids)
+    assert all(r["cached"] for r in after)
+    _check(after, base)
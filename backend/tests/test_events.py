@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from conftest import sales_frame, upload
+
+
+def test_planted_spike_and_level_shift(client):
+    df = sales_frame(days=200, stores=("渋谷",))
+    df["Total_Sales"] = 1000.0 + (df.index % 7) * 10
+    df.loc[df["年月日"] >= "2023-05-01", "Total_Sales"] += 500
+    df.loc[df["年月日"] == "2023-03-15", "Total_Sales"] = 5000.0
+    j = upload(client, df)
+    body = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"]), "target_column": "Total_Sales", "aggregation": "daily"}
+    resp = client.post("/api/v1/analysis/timeseries", json=body)
+    assert resp.status_code == 200, resp.text
+    events = {(e["type"], e["timestamp"]) for e in resp.json()["events"]}
+    assert ("spike", "2023-03-15") in events
+    assert ("level_shift", "2023-05-01") in events
+    assert not any(t == "drop" for t, _ in events)
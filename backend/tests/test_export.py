@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+
+from conftest import sales_frame, upload
+
+
+def _export(client, dataset_id: str, **params) -> pd.DataFrame:
+    resp = client.get(f"/api/v1/export/dataset/{dataset_id}", params=params)
+    assert resp.status_code == 200, resp.text
+    return pd.read_csv(io.StringIO(resp.text))
+
+
+def test_date_filter_on_japanese_dates(client):
+    df = sales_frame(japanese_dates=True)
+    dataset_id = upload(client, df)["dataset_id"]
+    out = _export(client, dataset_id, store="渋谷", start="2023-02-01", end="2023-02-28")
+    assert len(out) == 28
+    assert list(out.columns) == list(df.columns)
+    assert set(out["店舗名"]) == {"渋谷"}
+    assert out["年月日"].iloc[0] == "2023年2月1日"
+
+
+def test_date_filter_without_store(client):
+    df = sales_frame(japanese_dates=True)
+    dataset_id = upload(client, df)["dataset_id"]
+    out = _export(client, dataset_id, start="2023-03-01")
+    assert len(out) == 2 * (120 - 59)
+    assert "__parsed_date" not in out.columns
+
+
+def test_unfiltered_export_keeps_all_rows(client):
+    df = sales_frame()
+    out = _export(client, upload(client, df)["dataset_id"])
+    assert len(out) == len(df)
+    assert list(out.columns) == list(df.columns)
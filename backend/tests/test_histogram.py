@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import sales_frame, upload
+
+
+@pytest.fixture(scope="module")
+def dataset(client):
+    j = upload(client, sales_frame())
+    return {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}
+
+
+def test_fixed_range_histogram(client, dataset):
+    resp = client.post("/api/v1/analysis/histogram", json={**dataset, "column": "Mens_KNIT", "bins": 10, "range": [0, 1000]})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert len(body["bins"]) == 11
+    assert sum(body["counts"]) == 240
+
+
+@pytest.mark.parametrize("params", [
+    {"bins": 0},
+    {"bins": -5},
+    {"bins": 10_001},
+    {"range": [10, 10]},
+    {"range": [10, 0]},
+    {"range": [0, "inf"]},
+    {"range": ["nan", 1]},
+])
+def test_invalid_input_is_rejected(client, dataset, params):
+    resp = client.post("/api/v1/analysis/histogram", json={**dataset, "column": "Mens_KNIT", **params})
+    assert resp.status_code == 422, resp.text
+
+
+def test_invalid_batch_spec_is_rejected(client, dataset):
+    specs = [{"type": "histogram", "column": "Mens_KNIT"}, {"type": "histogram", "column": "Mens_KNIT", "range": [5, 1]}]
+    resp = client.post("/api/v1/analysis/batch", json={**dataset, "specs": specs})
+    assert resp.status_code == 422, resp.text
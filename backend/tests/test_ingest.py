@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from conftest import sales_frame
+
+
+def test_profile_sorts_across_runs(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.services import ingest, storage
+
+    # Small chunks so the sort spans many runs and merge windows
+    monkeypatch.setattr(settings, "ingest_chunk_rows", 50)
+    df = sales_frame(days=90, stores=("渋谷", "新宿", "池袋"), japanese_dates=True)
+    df = df.sample(frac=1, random_state=0).reset_index(drop=True)
+    df.loc[[3, 100, 200], "年月日"] = "不明"
+    df["row"] = np.arange(len(df))
+    path = str(tmp_path / "sales.parquet")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=50)
+
+    profile = ingest.profile_columnar(path)
+
+    dates = pd.to_datetime(df["年月日"], format="%Y年%m月%d日", errors="coerce")
+    expected = df["row"].to_numpy()[np.argsort(dates.to_numpy(dtype="datetime64[ns]"), kind="stable")]
+    out = pq.read_table(path).to_pandas()
+    assert out["row"].tolist() == expected.tolist()
+    assert out[storage.PARSED_DATE].iloc[-3:].isna().all()
+    assert profile["date_format"] == "%Y年%m月%d日"
+    assert profile["date_range"] == ["2023-01-01", "2023-03-31"]
+    assert profile["rows"] == len(df)
+    assert profile["stores"] == ["新宿", "池袋", "渋谷"]
+    assert profile["nulls"]["年月日"] == 0
+    assert os.listdir(tmp_path) == ["sales.parquet"]
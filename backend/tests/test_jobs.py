@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+
+from sqlalchemy import func, select
+
+from conftest import sales_frame, upload
+
+
+def test_eviction_counts_upserts_not_ids(client, monkeypatch):
+    from app.core.config import settings
+    from app.db import SessionLocal
+    from app.models.analysis_job import AnalysisJob
+    from app.repos import jobs
+
+    j = upload(client, sales_frame(days=10))
+    session_id, dataset_id = int(j["session_id"]), int(j["dataset_id"])
+    monkeypatch.setattr(settings, "analysis_cache_max_entries", 3)
+    monkeypatch.setattr(jobs, "EVICT_EVERY", 5)
+    monkeypatch.setattr(jobs, "_written", 0)
+    with SessionLocal() as db:
+        for i in range(4):
+            jobs.create(db, session_id, dataset_id, "histogram", json.dumps({"i": i}), "{}")
+        assert db.execute(select(func.count()).select_from(AnalysisJob)).scalar() >= 4
+        # Re-storing an existing key keeps its id; the fifth write still triggers eviction
+        last = jobs.create(db, session_id, dataset_id, "histogram", json.dumps({"i": 3}), "{}")
+        assert db.execute(select(func.count()).select_from(AnalysisJob)).scalar() == 3
+        assert jobs.get(db, last.id) is not None
+
+
+def test_old_analysis_jobs_table_is_migrated(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+
+    from app.db import migrate_analysis_jobs
+    from app.repos import jobs
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE analysis_jobs (id INTEGER PRIMARY KEY, session_id INTEGER, dataset_id INTEGER, "
+                          "type VARCHAR(32), params_json VARCHAR, result_json VARCHAR, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO analysis_jobs (session_id, dataset_id, type, params_json, result_json) VALUES (1, 1, :type, :params, :result)"),
+                     [{"type": "pareto", "params": '{"a":1}', "result": "old"}, {"type": "pareto", "params": '{"a":1}', "result": "new"},
+                      {"type": "histogram", "params": "{}", "result": "h"}])
+    migrate_analysis_jobs(engine)
+    migrate_analysis_jobs(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT type, params_json, result_json, cache_key FROM analysis_jobs ORDER BY id")).all()
+    assert [(r.result_json, r.cache_key) for r in rows] == [(r.result_json, jobs.cache_key(r.type, r.params_json)) for r in rows]
+    assert [r.result_json for r in rows] == ["new", "h"]
+    index = next(ix for ix in inspect(engine).get_indexes("analysis_jobs") if ix["name"] == "ix_analysis_jobs_cache")
+    assert index["unique"] and index["column_names"] == ["dataset_id", "type", "cache_key"]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import sales_frame, upload
+
+COLUMNS = ["Mens_KNIT", "Total_Sales"]
+
+
+@pytest.fixture(scope="module")
+def dataset(client):
+    df = sales_frame(days=200, stores=("渋谷", "新宿", "池袋"), seed=2)
+    j = upload(client, df)
+    return {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"])}, df
+
+
+@pytest.mark.parametrize("params, tolerance", [
+    ({}, 0.01),
+    ({"store": "新宿"}, 0.01),
+    # Starts and ends mid-month: the partly covered months contribute their whole distribution, weighted
+    ({"store": "渋谷", "date_range": ["2023-02-10", "2023-05-20"]}, 0.05),
+])
+def test_summary_matches_describe(client, dataset, params, tolerance):
+    ids, df = dataset
+    resp = client.post("/api/v1/analysis/summary", json={**ids, "columns": COLUMNS, "quantiles": [0.25, 0.5, 0.75], **params})
+    assert resp.status_code == 200, resp.text
+    rows = df
+    if "store" in params:
+        rows = rows[rows["店舗名"] == params["store"]]
+    if "date_range" in params:
+        rows = rows[rows["年月日"].between(*params["date_range"])]
+    described = rows[COLUMNS].describe()
+    for item in resp.json()["columns"]:
+        expected = described[item["column"]]
+        n = int(expected["count"])
+        assert item["count"] == n
+        assert item["mean"] == pytest.approx(expected["mean"])
+        # The sketches report the population standard deviation
+        assert item["std"] == pytest.approx(expected["std"] * np.sqrt((n - 1) / n))
+        assert (item["min"], item["max"]) == pytest.approx((expected["min"], expected["max"]))
+        for key, q in (("p25", "25%"), ("p50", "50%"), ("p75", "75%")):
+            assert abs(item["quantiles"][key] - expected[q]) <= tolerance * (expected["max"] - expected["min"])
+        assert sum(item["histogram"]["counts"]) == pytest.approx(n, abs=2)
+
+
+def test_fractional_quantiles_keep_their_own_keys(client, dataset):
+    ids, df = dataset
+    resp = client.post("/api/v1/analysis/summary", json={**ids, "columns": ["Mens_KNIT"], "quantiles": [0, 0.001, 0.05, 0.995, 0.999, 1]})
+    assert resp.status_code == 200, resp.text
+    quantiles = resp.json()["columns"][0]["quantiles"]
+    assert list(quantiles) == ["p00", "p0.1", "p05", "p99.5", "p99.9", "p100"]
+    assert quantiles["p00"] == df["Mens_KNIT"].min() and quantiles["p100"] == df["Mens_KNIT"].max()
+
+
+def test_duplicate_quantiles_are_rejected(client, dataset):
+    ids, _ = dataset
+    resp = client.post("/api/v1/analysis/summary", json={**ids, "quantiles": [0.5, 0.25, 0.5]})
+    assert resp.status_code == 422, resp.text
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+
+
+def test_concurrent_pumps_share_one_pool(monkeypatch):
+    from app.services import tasks
+
+    pools = []
+
+    class SlowPool:
+        def __init__(self, **kwargs):
+            time.sleep(0.05)
+            pools.append(self)
+
+        def submit(self, fn, *args):
+            return Future()
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(tasks, "ProcessPoolExecutor", SlowPool)
+    runner = tasks.TaskRunner(max_workers=8, max_pending=100)
+    for i in range(8):
+        task = tasks.Task(id=str(i), type="pareto", session_id=1, dataset_id=1, params_json="{}")
+        runner._tasks[task.id], runner._args[task.id] = task, ()
+        runner._queue.append(task.id)
+    threads = [threading.Thread(target=runner._pump) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(pools) == 1
+    assert runner.stats()["running"] == 8
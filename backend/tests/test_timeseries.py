@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from conftest import sales_frame, upload
+
+
+def test_target_column_and_target_columns_are_merged(client):
+    j = upload(client, sales_frame(days=60))
+    body = {"session_id": int(j["session_id"]), "dataset_id": int(j["dataset_id"]), "aggregation": "monthly",
+            "target_column": "Total_Sales", "target_columns": ["Mens_KNIT", "Total_Sales"]}
+    resp = client.post("/api/v1/analysis/timeseries", json=body)
+    assert resp.status_code == 200, resp.text
+    assert [s["name"] for s in resp.json()["series"]] == ["Total_Sales", "Mens_KNIT"]